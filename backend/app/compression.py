@@ -0,0 +1,328 @@
+import asyncio
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.metrics import queued
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional codec
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+# Bodies smaller than this go out as they are: the headers and a codec's
+# framing would cost about what compression saves
+MINIMUM_SIZE = 1024
+# Compressed bodies kept for unchanged responses, in bytes across all of them
+CACHE_BYTES = 32 * 1024 * 1024
+# Bodies or chunks at least this large are compressed on a worker thread, so
+# a full task list never stalls the event loop
+OFFLOAD_SIZE = 64 * 1024
+
+GZIP_LEVEL = 6
+# Middle settings: most of each codec's ratio on JSON at a fraction of its
+# top levels' CPU, which matters for responses too fresh to be cached
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+# Listed rather than every text/* type: server-sent events (text/event-stream)
+# stay uncompressed, so each event reaches the client as soon as it is sent
+# whatever buffering proxies do with compressed streams
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/json",
+        "application/x-ndjson",
+        "application/javascript",
+        "text/css",
+        "text/csv",
+        "text/html",
+        "text/javascript",
+        "text/plain",
+    }
+)
+
+
+class StreamCompressor(Protocol):
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress `chunk`, flushed so the client can decode all of it now."""
+
+    def finish(self) -> bytes:
+        """End the stream."""
+
+
+class _GzipStream:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def _gzip(data: bytes) -> bytes:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def _zstd(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+class Codec(NamedTuple):
+    name: str
+    compress: Callable[[bytes], bytes]
+    stream: Callable[[], StreamCompressor]
+
+
+# In the server's order of preference, for clients that accept several
+# equally: zstd and brotli beat gzip on both ratio and speed at these levels
+CODECS: dict[str, Codec] = {}
+if zstandard is not None:
+    CODECS["zstd"] = Codec("zstd", _zstd, _ZstdStream)
+if brotli is not None:
+    CODECS["br"] = Codec("br", _brotli, _BrotliStream)
+CODECS["gzip"] = Codec("gzip", _gzip, _GzipStream)
+
+
+def negotiate(accept_encoding: str) -> Optional[Codec]:
+    """The codec to answer an Accept-Encoding header with, or None for identity.
+
+    Highest q-value wins; ties go to the server's preference. `*` stands for
+    every codec the header does not name, and q=0 refuses one.
+    """
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for name, codec in CODECS.items():
+        weight = weights.get(name, wildcard)
+        if weight > best_weight:
+            best, best_weight = codec, weight
+    return best
+
+
+class CompressionCache:
+    """Compressed bodies by response identity, least recently used evicted first.
+
+    Keys hold the response's ETag, which names the storage epoch and revision
+    it was read at, so an entry goes stale by never matching again, not by
+    being invalidated: any write moves the revision and the next request
+    makes a new key. An ETag does not cover everything a handler puts in a
+    body, so keys also hold a digest of the body itself, and an entry is only
+    served for the bytes it was compressed from. The size is bounded in bytes
+    rather than entries, since one full task list can outweigh thousands of
+    single tasks.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+            return compressed
+
+    def put(self, key: tuple, compressed: bytes) -> None:
+        if len(compressed) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = compressed
+            self.size += len(compressed)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+def _compressible(status: int, headers: Headers) -> bool:
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    if "content-range" in headers:
+        return False
+    media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    return media_type in COMPRESSIBLE_TYPES
+
+
+def _body_digest(body: bytes) -> bytes:
+    """What the cache checks a body against: BLAKE2b, a fraction of compressing it."""
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+async def _run(call: Callable[[bytes], bytes], data: bytes) -> bytes:
+    if len(data) < OFFLOAD_SIZE:
+        return call(data)
+    return await asyncio.to_thread(queued("compression", call, data))
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies with the client's best codec.
+
+    JSON and text responses of at least `minimum_size` bytes are compressed
+    whole, and sent as they are if that does not make them smaller.
+    Streamed responses (exports) are compressed chunk by chunk, each flushed
+    so the client can decode rows as they arrive. Compressed GETs that carry
+    an ETag are cached, so polling an unchanged list costs one compression
+    plus a hash of the body per poll; the handler still runs, since its body
+    is what a cached entry must match.
+
+    A compressed response's ETag is made weak: its bytes differ from the
+    identity response's, but it still names the same revision for
+    If-None-Match.
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE, cache_bytes: int = CACHE_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = CompressionCache(cache_bytes)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codec = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        # None until the first body message decides; then "identity" or "stream"
+        mode: Optional[str] = None
+        stream: Optional[StreamCompressor] = None
+
+        async def compressing_send(message) -> None:
+            nonlocal start, mode, stream
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or mode == "identity":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if mode is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not _compressible(start["status"], headers):
+                    mode = "identity"
+                    await send(start)
+                    await send(message)
+                    return
+                if not more_body:
+                    await self._send_whole(scope, send, start, headers, codec, body)
+                    return
+                mode = "stream"
+                stream = codec.stream()
+                _mark_encoded(headers, codec)
+                del headers["content-length"]
+                await send(start)
+            data = await _run(stream.compress, body) if body else b""
+            if not more_body:
+                data += stream.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+    async def _send_whole(
+        self, scope, send, start: dict, headers: MutableHeaders, codec: Codec, body: bytes
+    ) -> None:
+        if len(body) < self.minimum_size:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+        key = _cache_key(scope, start["status"], headers, codec)
+        if key is not None:
+            key += (await _run(_body_digest, body),)
+        compressed = self.cache.get(key) if key is not None else None
+        if compressed is None:
+            compressed = await _run(codec.compress, body)
+            if key is not None:
+                self.cache.put(key, compressed)
+        if len(compressed) >= len(body):
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+        _mark_encoded(headers, codec)
+        headers["content-length"] = str(len(compressed))
+        await send(start)
+        await send({"type": "http.response.body", "body": compressed})
+
+
+def _mark_encoded(headers: MutableHeaders, codec: Codec) -> None:
+    headers["content-encoding"] = codec.name
+    headers.add_vary_header("Accept-Encoding")
+    etag = headers.get("etag")
+    if etag is not None and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+def _cache_key(scope, status: int, headers: Headers, codec: Codec) -> Optional[tuple]:
+    etag = headers.get("etag")
+    if etag is None or status != 200 or scope["method"] != "GET":
+        return None
+    # Two users' shards can never share an ETag in practice, but naming the
+    # user keeps one user's body from ever answering another's request
+    user = scope.get("state", {}).get("user")
+    return (user, scope["path"], scope["query_string"], etag, codec.name)
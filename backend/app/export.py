@@ -0,0 +1,86 @@
+import csv
+import io
+from datetime import datetime
+from typing import Any, Iterator, Literal
+
+from pydantic_core import to_json
+
+from app.storage import Storage, TaskQuery
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES: dict[ExportFormat, str] = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Tasks (or activity rows) read from storage per chunk of output
+EXPORT_BATCH_SIZE = 1000
+
+CSV_COLUMNS = [
+    "type",
+    "id",
+    "task_id",
+    "title",
+    "completed",
+    "created_at",
+    "updated_at",
+    "action",
+    "timestamp",
+    "old_value",
+    "new_value",
+]
+
+Record = dict[str, Any]
+
+
+def _records(storage: Storage, batch_size: int) -> Iterator[list[Record]]:
+    """Batches of every task, then live activity, then deleted tasks' activity.
+
+    Each record carries its kind under "type". Storage is read one batch at a
+    time as the consumer asks for more, so this is not a point-in-time
+    snapshot: writes made during an export may or may not appear in it.
+    """
+    after = None
+    while True:
+        tasks, after = storage.query_tasks(TaskQuery(), batch_size, after)
+        if tasks:
+            yield [{"type": "task", **task._asdict()} for task in tasks]
+        if after is None:
+            break
+    for archived, record_type in ((False, "activity"), (True, "deleted_activity")):
+        for logs in storage.iter_activity(archived, batch_size):
+            yield [{"type": record_type, **log.model_dump()} for log in logs]
+
+
+def export_ndjson(storage: Storage, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """One JSON object per line, encoded like the API encodes them."""
+    for batch in _records(storage, batch_size):
+        yield b"".join(to_json(record) + b"\n" for record in batch)
+
+
+def export_csv(storage: Storage, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """One row per record under CSV_COLUMNS; columns a type lacks are left empty."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    yield _drain(buffer)
+    for batch in _records(storage, batch_size):
+        writer.writerows(_csv_row(record) for record in batch)
+        yield _drain(buffer)
+
+
+def _csv_row(record: Record) -> Record:
+    # Same spellings as the JSON: ISO timestamps and lowercase booleans
+    row = {}
+    for name, value in record.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, bool):
+            value = "true" if value else "false"
+        row[name] = value
+    return row
+
+
+def _drain(buffer: io.StringIO) -> str:
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return text
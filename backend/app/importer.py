@@ -0,0 +1,117 @@
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from pydantic_core import to_json
+
+from app.schemas import TaskCreate
+from app.storage import AsyncStorage
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Valid rows created per AsyncStorage.create_tasks call
+IMPORT_BATCH_SIZE = 1000
+# Longer lines are reported as errors without being buffered whole
+MAX_IMPORT_LINE_BYTES = 64 * 1024
+# Rejected lines reported individually; later ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class _Batch:
+    """Lines read since the last flush: valid titles plus per-line errors."""
+
+    def __init__(self):
+        self.titles: list[str] = []
+        self.errors: list[tuple[int, str]] = []
+
+    def add(self, line_number: int, line: bytes) -> None:
+        if not line.strip():
+            return
+        try:
+            self.titles.append(TaskCreate.model_validate_json(line).title)
+        except ValidationError as exc:
+            self.errors.append((line_number, _describe(exc)))
+
+
+class ImportResponse(StreamingResponse):
+    """StreamingResponse whose body may still be reading the request.
+
+    StreamingResponse also listens on `receive` for a disconnect, which would
+    swallow the request body the import is consuming. A disconnect surfaces
+    as ClientDisconnect from the request stream instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        finally:
+            # Even after a disconnect, so a lease it holds is released
+            if self.background is not None:
+                await self.background()
+
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, error['loc']))}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in exc.errors()
+    )
+
+
+def _record(record_type: str, **fields) -> bytes:
+    return to_json({"type": record_type, **fields}) + b"\n"
+
+
+async def import_ndjson(
+    chunks: AsyncIterator[bytes], storage: AsyncStorage, batch_size: int = IMPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """Create a task per NDJSON line of `chunks`, reporting as it goes.
+
+    Lines are validated as TaskCreate while the body arrives, and valid ones
+    are created `batch_size` at a time, so memory is bounded by one batch and
+    one line however large the upload. Yields NDJSON records: an `error` per
+    rejected line (the first MAX_REPORTED_ERRORS), a `progress` after each
+    batch and a final `summary`. Blank lines are skipped but still counted in line numbers.
+    """
+    lines = imported = failed = 0
+    batch = _Batch()
+    pending = b""
+    oversized = False
+
+    async def flush() -> AsyncIterator[bytes]:
+        nonlocal batch, imported, failed
+        done, batch = batch, _Batch()
+        if done.titles:
+            await storage.create_tasks(done.titles)
+        imported += len(done.titles)
+        for line_number, detail in done.errors[: max(0, MAX_REPORTED_ERRORS - failed)]:
+            yield _record("error", line=line_number, detail=detail)
+        failed += len(done.errors)
+        yield _record("progress", lines=lines, imported=imported, failed=failed)
+
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            lines += 1
+            if oversized:
+                batch.errors.append((lines, f"line exceeds {MAX_IMPORT_LINE_BYTES} bytes"))
+                oversized = False
+            else:
+                batch.add(lines, line)
+            if len(batch.titles) + len(batch.errors) >= batch_size:
+                async for record in flush():
+                    yield record
+        if len(pending) > MAX_IMPORT_LINE_BYTES:
+            pending = b""
+            oversized = True
+
+    if pending or oversized:
+        lines += 1
+        if oversized:
+            batch.errors.append((lines, f"line exceeds {MAX_IMPORT_LINE_BYTES} bytes"))
+        else:
+            batch.add(lines, pending)
+    if batch.titles or batch.errors:
+        async for record in flush():
+            yield record
+    yield _record("summary", lines=lines, imported=imported, failed=failed)
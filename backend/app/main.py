@@ -1,7 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import auth, tasks
+from app.compression import CompressionMiddleware
+from app.metrics import MetricsMiddleware
+from app.routers import auth, metrics, profiling, tasks
 
 app = FastAPI(
     title="Task Management API",
@@ -9,6 +11,8 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Added first so it sits innermost: the metrics record the bytes actually sent
+app.add_middleware(CompressionMiddleware)
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -16,11 +20,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# Added last so it wraps the other middleware, whose time it then includes
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(tasks.router)
+app.include_router(tasks.activity_router)
 app.include_router(auth.router)
+app.include_router(metrics.router)
+app.include_router(profiling.router)
 
 
 @app.get("/")
@@ -0,0 +1,248 @@
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+# Seconds; spans a cached lookup to a long poll
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Bytes; spans an empty 204 to a full export
+SIZE_BUCKETS = (0, 64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_T = TypeVar("_T")
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Observations counted into fixed buckets, one series per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Labels, buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per series: a count per bucket (the last one past every bound), then the sum
+        self._series: dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self) -> int:
+        """Observations made, over every series."""
+        with self._lock:
+            return sum(sum(series[:-1]) for series in self._series.values())
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(snapshot):
+            cumulative = 0
+            for bound, count in zip((*map(_number, self.buckets), "+Inf"), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_label_text(self.labels, labels, le)} {cumulative}"
+            label_text = _label_text(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {_number(series[-1])}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Gauge:
+    """Current values, either set directly or read from `collect` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Labels = (),
+        collect: Optional[Callable[[], Iterable[tuple[Labels, float]]]] = None,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect
+        self._values: dict[Labels, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def samples(self) -> Iterator[str]:
+        values = self.collect() if self.collect is not None else list(self._values.items())
+        for labels, value in sorted(values):
+            yield f"{self.name}{_label_text(self.labels, labels)} {_number(value)}"
+
+
+class Registry:
+    """Metrics rendered together in the Prometheus text format.
+
+    Recording needs no dependencies: a histogram observation is a bisect and
+    two additions under an uncontended lock, cheap enough to leave on in
+    production. Gauges that would otherwise be maintained on every write
+    (storage sizes, threadpool occupancy) are read when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Histogram | Gauge] = {}
+
+    def register(self, metric: _T) -> _T:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from receiving a request to sending the last byte of its response.",
+        ("method", "route", "status"),
+        LATENCY_BUCKETS,
+    )
+)
+REQUEST_BYTES = registry.register(
+    Histogram(
+        "http_request_size_bytes",
+        "Request body bytes read by the app.",
+        ("method", "route"),
+        SIZE_BUCKETS,
+    )
+)
+RESPONSE_BYTES = registry.register(
+    Histogram(
+        "http_response_size_bytes",
+        "Response body bytes sent.",
+        ("method", "route"),
+        SIZE_BUCKETS,
+    )
+)
+THREADPOOL_WAIT_SECONDS = registry.register(
+    Histogram(
+        "threadpool_queue_wait_seconds",
+        "Time work handed to a thread pool waited for a thread.",
+        ("pool",),
+        LATENCY_BUCKETS,
+    )
+)
+THREADPOOL_THREADS_BUSY = registry.register(
+    Gauge("threadpool_threads_busy", "Threads of the pool running work.", ("pool",))
+)
+THREADPOOL_TASKS_WAITING = registry.register(
+    Gauge("threadpool_tasks_waiting", "Work queued for a thread of the pool.", ("pool",))
+)
+STORAGE_CALL_SECONDS = registry.register(
+    Histogram(
+        "storage_call_duration_seconds",
+        "Time a request spent in each storage call, including waiting for durability.",
+        ("backend", "method"),
+        LATENCY_BUCKETS,
+    )
+)
+
+
+def queued(pool: str, call: Callable[..., _T], *args) -> Callable[[], _T]:
+    """`call(*args)` for a thread pool, recording how long it waits for a thread."""
+    submitted = perf_counter()
+
+    def run() -> _T:
+        THREADPOOL_WAIT_SECONDS.observe(perf_counter() - submitted, pool)
+        return call(*args)
+
+    return run
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording each HTTP request's latency and body sizes.
+
+    Requests are labelled with their route's path template, never the raw
+    path, so task ids do not each become a series; requests no route
+    matched share the route label "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Endpoint function -> path template, built on the first request
+        self._routes: Optional[dict] = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = perf_counter()
+        received = sent = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message) -> None:
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            method = scope["method"]
+            route = self._route(scope)
+            REQUEST_SECONDS.observe(perf_counter() - start, method, route, str(status))
+            REQUEST_BYTES.observe(received, method, route)
+            RESPONSE_BYTES.observe(sent, method, route)
+
+    def _route(self, scope) -> str:
+        # The router leaves the matched endpoint in the scope it was given
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            self._routes = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+        return self._routes.get(endpoint, "unmatched")
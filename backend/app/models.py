@@ -19,6 +19,21 @@ class ActivityLog(BaseModel):
     new_value: str | None = None
 
 
+class TaskEvent(BaseModel):
+    revision: int
+    action: str  # activity action of the change
+    task_id: str
+    timestamp: datetime
+    old_value: str | None = None
+    new_value: str | None = None
+    task: Task | None = None  # current state of the task; None once deleted
+
+
+class TaskEventPage(BaseModel):
+    cursor: str  # pass back as ?after= to receive only later events
+    events: list[TaskEvent]
+
+
 class TaskStats(BaseModel):
     total: int
     completed: int
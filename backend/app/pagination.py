@@ -0,0 +1,81 @@
+import base64
+import binascii
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+
+def _encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> tuple[str, str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    value, task_id = raw.split("|", 1)
+    return value, task_id
+
+
+def encode_cursor(key: tuple[datetime, str]) -> str:
+    """Encode a (timestamp, id) ordering key as an opaque URL-safe cursor."""
+    value, task_id = key
+    return _encode(f"{value.isoformat()}|{task_id}")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if malformed."""
+    try:
+        value, task_id = _decode(cursor)
+        return datetime.fromisoformat(value), task_id
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def encode_rank_cursor(key: tuple[float, str]) -> str:
+    """Encode a (score, id) search ranking key as an opaque URL-safe cursor."""
+    score, task_id = key
+    return _encode(f"{score!r}|{task_id}")
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, str]:
+    """Decode a cursor produced by encode_rank_cursor. Raises ValueError if malformed."""
+    try:
+        value, task_id = _decode(cursor)
+        return float(value), task_id
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def encode_activity_cursor(seq: int) -> str:
+    """Encode an activity entry's sequence number as an opaque URL-safe cursor."""
+    return _encode(f"{seq}|")
+
+
+def decode_activity_cursor(cursor: str) -> int:
+    """Decode a cursor produced by encode_activity_cursor. Raises ValueError if malformed."""
+    try:
+        value, _ = _decode(cursor)
+        seq = int(value)
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if seq < 0:
+        raise ValueError("invalid cursor")
+    return seq
+
+
+def encode_event_cursor(revision: int, epoch: str) -> str:
+    """Encode a change feed position, and the storage epoch it belongs to, as a cursor."""
+    return _encode(f"{revision}|{epoch}")
+
+
+def decode_event_cursor(cursor: str) -> tuple[int, str]:
+    """Decode a cursor produced by encode_event_cursor. Raises ValueError if malformed."""
+    try:
+        value, epoch = _decode(cursor)
+        revision = int(value)
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if revision < 0:
+        raise ValueError("invalid cursor")
+    return revision, epoch
@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+from typing import Optional
+
+# Seconds between samples: 100 per second per thread, cheap enough to run
+# against live traffic
+SAMPLE_INTERVAL = 0.01
+
+_DELIMITERS = str.maketrans(" ;", "__")
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+
+
+def collapse(thread_name: str, frame: Optional[FrameType]) -> str:
+    """One sample of a thread's stack in collapsed form: thread;outermost;...;innermost.
+
+    Spaces and semicolons, which delimit the format, become underscores
+    (`<frozen runpy>`, thread names).
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(label.translate(_DELIMITERS) for label in reversed(labels))
+
+
+class SamplingProfiler:
+    """Wall-clock sampler of every thread's Python stack.
+
+    A daemon thread reads sys._current_frames() every `interval` seconds, so
+    the profiled code runs unmodified: handlers on the event loop and work on
+    threadpool threads alike. Nothing is installed while it is not running.
+    Threads waiting (an idle worker, the loop in select) are sampled too, in
+    their waiting frames, which is where a stalled request shows up.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Samples as `stack count` lines, the input flamegraph.pl and speedscope read."""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self._stacks.items()))
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._stacks[collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
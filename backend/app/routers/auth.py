@@ -1,41 +1,122 @@
+import logging
+import os
 from urllib.parse import parse_qs
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from app.schemas import LoginRequest, LoginResponse
+from app.tokens import CachedTokenVerifier, HMACTokenVerifier, InvalidTokenError
 
 router = APIRouter(prefix="/auth", tags=["auth"])
+logger = logging.getLogger(__name__)
 
 # Mock credentials for demo purposes
 MOCK_USERNAME = "admin"
 MOCK_PASSWORD = "password"
-MOCK_TOKEN = "mock-jwt-token-12345"
 AUTH_COOKIE_NAME = "auth_token"
 
+# Key tokens are signed with; every worker (and every restart) must share it
+AUTH_SECRET_ENV = "AUTH_SECRET"
+DEV_AUTH_SECRET = "dev-secret-change-me"
+# Set to 1 to sign with DEV_AUTH_SECRET when AUTH_SECRET is unset; never in production
+AUTH_DEV_MODE_ENV = "AUTH_DEV_MODE"
+# Lifetime of issued tokens
+AUTH_TOKEN_TTL_ENV = "AUTH_TOKEN_TTL_SECONDS"
+DEFAULT_TOKEN_TTL = 3600
+# Comma-separated users allowed the admin endpoints (profiling)
+ADMIN_USERS_ENV = "ADMIN_USERS"
+
+admin_users = frozenset(
+    name.strip() for name in os.environ.get(ADMIN_USERS_ENV, MOCK_USERNAME).split(",")
+    if name.strip()
+)
+
+
+def signing_key() -> bytes:
+    """The key from $AUTH_SECRET, or the published DEV_AUTH_SECRET if $AUTH_DEV_MODE=1."""
+    secret = os.environ.get(AUTH_SECRET_ENV)
+    if secret:
+        return secret.encode("utf-8")
+    if os.environ.get(AUTH_DEV_MODE_ENV) != "1":
+        # Anyone could forge tokens signed with a key that ships in the source
+        raise ValueError(
+            f"{AUTH_SECRET_ENV} is not set; set it, or {AUTH_DEV_MODE_ENV}=1 for development"
+        )
+    logger.warning(
+        "%s is not set: signing tokens with the public development key. "
+        "Anyone can forge tokens; never run this way outside development.",
+        AUTH_SECRET_ENV,
+    )
+    return DEV_AUTH_SECRET.encode("utf-8")
+
+
+token_signer = HMACTokenVerifier(
+    signing_key(),
+    ttl=int(os.environ.get(AUTH_TOKEN_TTL_ENV, DEFAULT_TOKEN_TTL)),
+)
+# What require_auth checks tokens with. Any TokenVerifier can be wrapped here
+# in place of token_signer, e.g. one validating tokens from an identity provider.
+token_verifier = CachedTokenVerifier(token_signer)
+
 # Auth dependency
 security = HTTPBearer(auto_error=False)
 
 
-def require_auth(
+def issue_token(username: str) -> str:
+    return token_signer.issue(username)
+
+
+def _request_token(
+    request: Request, credentials: HTTPAuthorizationCredentials | None
+) -> str | None:
+    return credentials.credentials if credentials else request.cookies.get(AUTH_COOKIE_NAME)
+
+
+async def require_auth(
     request: Request,
     credentials: HTTPAuthorizationCredentials | None = Depends(security),
 ) -> str:
-    """Validate auth via Bearer token header OR cookie and return token if valid."""
-    token = credentials.credentials if credentials else request.cookies.get(AUTH_COOKIE_NAME)
+    """Validate auth via Bearer token header OR cookie and return token if valid.
+
+    A coroutine, like current_user, so async routes check tokens on the event
+    loop instead of a threadpool hop each.
+    """
+    token = _request_token(request, credentials)
     if not token:
         # Preserve FastAPI HTTPBearer default behavior for missing auth
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
 
-    if token != MOCK_TOKEN:
+    try:
+        claims = token_verifier.verify(token)
+    except InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
         )
+    request.state.user = claims.get("sub")
     return token
 
 
+async def current_user(request: Request, token: str = Depends(require_auth)) -> str:
+    """The authenticated user (the token's `sub` claim), who owns the tasks they create."""
+    user = request.state.user
+    if not isinstance(user, str) or not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+        )
+    return user
+
+
+async def require_admin(user: str = Depends(current_user)) -> str:
+    """The authenticated user, if they are one of $ADMIN_USERS."""
+    if user not in admin_users:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return user
+
+
 @router.get("/login", response_class=HTMLResponse)
 def login_page(next: str = "/tasks") -> HTMLResponse:
     """Simple browser login form that sets an auth cookie via /auth/session."""
@@ -110,7 +191,7 @@ async def create_session(request: Request) -> RedirectResponse:
     response = RedirectResponse(url=next_url, status_code=status.HTTP_303_SEE_OTHER)
     response.set_cookie(
         key=AUTH_COOKIE_NAME,
-        value=MOCK_TOKEN,
+        value=issue_token(username),
         httponly=True,
         samesite="lax",
         path="/",
@@ -119,8 +200,11 @@ async def create_session(request: Request) -> RedirectResponse:
 
 
 @router.get("/logout")
-def logout(next: str = "/auth/login") -> RedirectResponse:
-    """Clear the auth cookie for browser usage."""
+def logout(request: Request, next: str = "/auth/login") -> RedirectResponse:
+    """Revoke the session's token and clear the auth cookie for browser usage."""
+    token = request.cookies.get(AUTH_COOKIE_NAME)
+    if token:
+        token_verifier.revoke(token)
     response = RedirectResponse(url=next, status_code=status.HTTP_303_SEE_OTHER)
     response.delete_cookie(key=AUTH_COOKIE_NAME, path="/")
     return response
@@ -133,4 +217,11 @@ def login(credentials: LoginRequest) -> LoginResponse:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
         )
-    return LoginResponse(token=MOCK_TOKEN, message="Login successful")
+    return LoginResponse(token=issue_token(credentials.username), message="Login successful")
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_token(token: str = Depends(require_auth)) -> Response:
+    """Revoke the bearer (or cookie) token; later requests with it get 401."""
+    token_verifier.revoke(token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,66 @@
+import anyio
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+
+from app.metrics import (
+    PROMETHEUS_MEDIA_TYPE,
+    THREADPOOL_TASKS_WAITING,
+    THREADPOOL_THREADS_BUSY,
+    Gauge,
+    Labels,
+    registry,
+)
+from app.storage import shards
+
+router = APIRouter(tags=["metrics"])
+
+
+def _storage_sizes() -> list[tuple[Labels, int]]:
+    """Entry counts summed over every shard, by the structure they count."""
+    totals: dict[str, int] = {}
+    for owner in shards.owners():
+        # Leased, so an idle shard is not closed while it is counted
+        shard = shards.try_acquire(owner)
+        if shard is None:
+            continue
+        try:
+            sizes = shard.sizes()
+        finally:
+            shards.release(owner)
+        for structure, size in sizes.items():
+            totals[structure] = totals.get(structure, 0) + size
+    return [((structure,), size) for structure, size in totals.items()]
+
+
+registry.register(
+    Gauge(
+        "storage_entries",
+        "Entries in each storage structure (tasks, activity_logs, deleted_activity_logs).",
+        ("structure",),
+        collect=_storage_sizes,
+    )
+)
+registry.register(
+    Gauge(
+        "storage_shards",
+        "Shards (owners) opened.",
+        collect=lambda: [((), len(shards.owners()))],
+    )
+)
+
+
+@router.get("/metrics", response_class=Response)
+async def metrics() -> Response:
+    """Request, storage and threadpool metrics in the Prometheus text format.
+
+    Unauthenticated, like most scrape targets; put it behind the network
+    boundary rather than a token.
+    """
+    # The limiter is only reachable from the event loop; rendering may query
+    # SQLite shards for their sizes, so that runs on a thread
+    statistics = anyio.to_thread.current_default_thread_limiter().statistics()
+    THREADPOOL_THREADS_BUSY.set(statistics.borrowed_tokens, "anyio")
+    THREADPOOL_TASKS_WAITING.set(statistics.tasks_waiting, "anyio")
+    body = await run_in_threadpool(registry.render)
+    return Response(content=body, media_type=PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.metrics import REQUEST_SECONDS
+from app.profiling import SamplingProfiler
+from app.routers.auth import require_admin
+
+router = APIRouter(prefix="/debug", tags=["debug"], dependencies=[Depends(require_admin)])
+
+DEFAULT_PROFILE_SECONDS = 30.0
+MAX_PROFILE_SECONDS = 300.0
+# How often a profile checks whether its requests have finished
+POLL_INTERVAL = 0.05
+
+# The profile running now; one at a time, so samples are never shared
+_active: Optional[SamplingProfiler] = None
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    requests: Optional[int] = Query(default=None, ge=1),
+    seconds: float = Query(default=DEFAULT_PROFILE_SECONDS, gt=0, le=MAX_PROFILE_SECONDS),
+) -> PlainTextResponse:
+    """Sample every thread's stack until `requests` more requests finish, or for `seconds`.
+
+    Responds when profiling ends, with the samples as collapsed stacks (one
+    `thread;frame;...;frame count` line per distinct stack) for
+    flamegraph.pl or speedscope. Requests are counted as the metrics
+    middleware records them, so nothing runs per request while no profile
+    is.
+    """
+    global _active
+    if _active is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="A profile is already running"
+        )
+    profiler = _active = SamplingProfiler()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    # This request is still in flight, so it is not one of those counted
+    finished = REQUEST_SECONDS.count()
+    profiler.start()
+    try:
+        while loop.time() < deadline:
+            if requests is not None and REQUEST_SECONDS.count() - finished >= requests:
+                break
+            await asyncio.sleep(min(POLL_INTERVAL, deadline - loop.time()))
+    finally:
+        profiler.stop()
+        _active = None
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={
+            "X-Profile-Samples": str(profiler.samples),
+            "X-Profile-Requests": str(REQUEST_SECONDS.count() - finished),
+        },
+    )
@@ -1,32 +1,464 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import Response
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncIterator
 
-from app.models import ActivityLog, Task, TaskStats
-from app.routers.auth import require_auth
-from app.schemas import TaskCreate, TaskUpdate
-from app.storage import storage
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from starlette.background import BackgroundTask
+
+from app.export import EXPORT_BATCH_SIZE, MEDIA_TYPES, ExportFormat, export_csv, export_ndjson
+from app.importer import IMPORT_BATCH_SIZE, NDJSON_MEDIA_TYPE, ImportResponse, import_ndjson
+from app.models import ActivityLog, Task, TaskEvent, TaskEventPage, TaskStats
+from app.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    decode_activity_cursor,
+    decode_cursor,
+    decode_event_cursor,
+    decode_rank_cursor,
+    encode_activity_cursor,
+    encode_cursor,
+    encode_event_cursor,
+    encode_rank_cursor,
+)
+from app.routers.auth import current_user, require_auth
+from app.schemas import (
+    BulkCreateRequest,
+    BulkDeleteRequest,
+    BulkResult,
+    BulkUpdateRequest,
+    TaskCreate,
+    TaskUpdate,
+)
+from app.storage import (
+    ActivityQuery,
+    ActivitySeq,
+    AsyncStorage,
+    TaskQuery,
+    TaskRecord,
+    TaskSort,
+    shards,
+)
 
 router = APIRouter(prefix="/tasks", tags=["tasks"], dependencies=[Depends(require_auth)])
+activity_router = APIRouter(
+    prefix="/activity", tags=["activity"], dependencies=[Depends(require_auth)]
+)
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# How long /tasks/events may hold a connection open, in seconds
+DEFAULT_EVENTS_TIMEOUT = 25.0
+MAX_EVENTS_TIMEOUT = 300.0
+# Waiting clients poll the O(1) revision counter, never the event log; polling
+# rather than an in-process signal also sees writes from other workers
+EVENTS_POLL_INTERVAL = 0.1
+# Idle SSE streams send a comment this often so proxies keep them open
+SSE_KEEPALIVE_INTERVAL = 15.0
+SSE_RETRY_MS = 1000
+
+# List endpoints encode with pydantic-core directly instead of letting
+# response_model revalidate every item; response_model still documents them
+_ACTIVITY_LIST = TypeAdapter(list[ActivityLog])
+
+
+async def owner_storage(owner: str = Depends(current_user)) -> AsyncIterator[AsyncStorage]:
+    """The caller's shard; nothing in it is visible to other users.
+
+    Handlers are coroutines and use its async API, so a request waiting on
+    storage (an fsync, a SQLite query) holds no thread. Building a shard
+    opens, and may recover, its files, so that alone runs on a thread. The
+    shard is leased until the handler returns, so it is not closed under it.
+    """
+    shard = shards.try_acquire(owner) or await run_in_threadpool(shards.acquire, owner)
+    try:
+        yield shard.aio
+    finally:
+        shards.release(owner)
+
+
+def _streaming_lease(owner: str) -> BackgroundTask:
+    """Lease `owner`'s shard until a streamed body, sent after the handler returns, is done."""
+    shards.try_acquire(owner)
+    return BackgroundTask(shards.release, owner)
+
+
+def _etag(storage: AsyncStorage, revision: int) -> str:
+    return f'"{storage.epoch}-{revision}"'
+
+
+def _not_modified(
+    storage: AsyncStorage, request: Request, response: Response, revision: int
+) -> Response | None:
+    """Return a 304 if the client already holds this revision; otherwise tag `response`.
+
+    Callers read the revision before the data, so a tag is never newer than
+    the body it is sent with.
+    """
+    etag = _etag(storage, revision)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def _json_response(content: bytes, response: Response) -> Response:
+    """Send encoded JSON `content`, keeping the headers already set on `response`."""
+    return Response(content=content, media_type="application/json", headers=dict(response.headers))
+
+
+def _tasks_json(tasks: list[TaskRecord], response: Response) -> Response:
+    # Records encode field for field as Task does, without building the models
+    return _json_response(to_json([task._asdict() for task in tasks]), response)
 
 
 @router.get("", response_model=list[Task])
-def list_tasks() -> list[Task]:
-    return storage.get_all_tasks()
+async def list_tasks(
+    request: Request,
+    response: Response,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    completed: bool | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    updated_since: datetime | None = None,
+    sort: TaskSort = "created_at",
+    storage: AsyncStorage = Depends(owner_storage),
+) -> Response:
+    """List tasks, optionally filtered, sorted and one page at a time.
+
+    `sort` is `created_at` or `updated_at`, prefixed with `-` for descending.
+    Without `limit` or `cursor` every matching task is returned. Otherwise a
+    page is returned and, if more tasks remain, the cursor for the next page
+    is sent in the `X-Next-Cursor` response header. A cursor is only valid
+    with the `sort` it was issued for.
+    """
+    revision = await storage.revision()
+    if (cached := _not_modified(storage, request, response, revision)) is not None:
+        return cached
+
+    query = TaskQuery(
+        completed=completed,
+        created_after=_naive_utc(created_after),
+        created_before=_naive_utc(created_before),
+        updated_since=_naive_utc(updated_since),
+        sort=sort,
+    )
+    if limit is None and cursor is None:
+        if query == TaskQuery():
+            return _tasks_json(await storage.get_all_tasks(), response)
+        return _tasks_json((await storage.query_tasks(query))[0], response)
+
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+    tasks, next_key = await storage.query_tasks(query, limit or DEFAULT_PAGE_SIZE, after)
+    if next_key is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(next_key)
+    return _tasks_json(tasks, response)
+
+
+def _naive_utc(value: datetime | None) -> datetime | None:
+    """Storage keeps naive UTC timestamps; convert aware query values to match."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
 
 
 @router.post("", response_model=Task, status_code=status.HTTP_201_CREATED)
-def create_task(task_create: TaskCreate) -> Task:
-    return storage.create_task(task_create.title)
+async def create_task(
+    task_create: TaskCreate, storage: AsyncStorage = Depends(owner_storage)
+) -> Task:
+    return await storage.create_task(task_create.title)
 
 
 @router.get("/stats", response_model=TaskStats)
-def get_stats() -> TaskStats:
-    return storage.get_stats()
+async def get_stats(
+    request: Request, response: Response, storage: AsyncStorage = Depends(owner_storage)
+) -> TaskStats | Response:
+    revision = await storage.revision()
+    if (cached := _not_modified(storage, request, response, revision)) is not None:
+        return cached
+    return await storage.get_stats()
+
+
+# Fixed paths are declared before /{task_id} so they are not taken as an id
+@router.get(
+    "/events",
+    response_model=TaskEventPage,
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        410: {"description": "Events after `after` are no longer available; resync"},
+    },
+)
+async def task_events(
+    request: Request,
+    after: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    timeout: float = Query(default=DEFAULT_EVENTS_TIMEOUT, ge=0, le=MAX_EVENTS_TIMEOUT),
+    last_event_id: str | None = Header(default=None),
+    storage: AsyncStorage = Depends(owner_storage),
+    owner: str = Depends(current_user),
+) -> TaskEventPage | StreamingResponse:
+    """Change events (task created, updated, completed, deleted) after the cursor `after`.
+
+    With `Accept: text/event-stream` the events are streamed as server-sent
+    events for up to `timeout` seconds; a reconnecting client resumes from
+    its `Last-Event-ID`. Otherwise this is a long poll: it returns as soon as
+    there are events, or with none after `timeout` seconds, and the client
+    resumes with `?after=<cursor>`. Without `after`, only events from now
+    on are sent. A 410 means the requested events were discarded, or belong
+    to a storage whose revisions have since restarted, and the client must
+    reload its tasks and follow events from the current revision.
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    cursor = after if after is not None else last_event_id
+    if cursor is None:
+        revision = await storage.revision()
+    else:
+        try:
+            revision, epoch = decode_event_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            )
+        # Revision numbers from another epoch name unrelated changes
+        if epoch != storage.epoch:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Events after this cursor are no longer available",
+            )
+    events = await _wait_for_events(storage, revision, limit, deadline)
+    if events is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Events after this cursor are no longer available",
+        )
+    if "text/event-stream" not in request.headers.get("accept", ""):
+        last = events[-1].revision if events else revision
+        return TaskEventPage(cursor=encode_event_cursor(last, storage.epoch), events=events)
+    return StreamingResponse(
+        _event_stream(storage, request, events, revision, limit, deadline),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=_streaming_lease(owner),
+    )
+
+
+async def _wait_for_events(
+    storage: AsyncStorage, after: int, limit: int, deadline: float
+) -> list[TaskEvent] | None:
+    """Events after `after`, waiting until `deadline` for one if there are none yet."""
+    loop = asyncio.get_running_loop()
+    while True:
+        # Read the revision first: a write that lands during the query
+        # moves it on and is picked up by the next iteration
+        seen = await storage.revision()
+        events = await storage.events_since(after, limit)
+        if events is None or events:
+            return events
+        while await storage.revision() == seen:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return []
+            await asyncio.sleep(min(EVENTS_POLL_INTERVAL, remaining))
+
+
+async def _event_stream(
+    storage: AsyncStorage,
+    request: Request,
+    events: list[TaskEvent],
+    after: int,
+    limit: int,
+    deadline: float,
+) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    yield f"retry: {SSE_RETRY_MS}\n\n"
+    while True:
+        if events is None:
+            yield "event: reset\ndata: {}\n\n"
+            return
+        for position, event in enumerate(events):
+            following = events[position + 1] if position + 1 < len(events) else None
+            last_of_revision = following is None or following.revision != event.revision
+            yield _sse_message(storage, event, last_of_revision)
+        if events:
+            after = events[-1].revision
+        elif loop.time() < deadline:
+            yield ": keep-alive\n\n"
+        if loop.time() >= deadline or await request.is_disconnected():
+            return
+        wait_until = min(deadline, loop.time() + SSE_KEEPALIVE_INTERVAL)
+        events = await _wait_for_events(storage, after, limit, wait_until)
+
+
+def _sse_message(storage: AsyncStorage, event: TaskEvent, last_of_revision: bool) -> str:
+    # Only the last event of a revision carries its id, so a client that
+    # reconnects mid-revision is sent the whole revision again
+    event_id = (
+        f"id: {encode_event_cursor(event.revision, storage.epoch)}\n" if last_of_revision else ""
+    )
+    return f"{event_id}event: {event.action}\ndata: {event.model_dump_json()}\n\n"
+
+
+@router.get("/search", response_model=list[Task])
+async def search_tasks(
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    storage: AsyncStorage = Depends(owner_storage),
+) -> Response:
+    """Tasks whose title contains every word of `q` (words may be prefixes), best first.
+
+    The cursor for the next page is sent in the `X-Next-Cursor` response header.
+    """
+    try:
+        after = decode_rank_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+    tasks, next_key = await storage.search_tasks(q, limit, after)
+    if next_key is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_rank_cursor(next_key)
+    return _tasks_json(tasks, response)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media_type: {} for media_type in MEDIA_TYPES.values()}}},
+)
+async def export_tasks(
+    format: ExportFormat = "ndjson",
+    storage: AsyncStorage = Depends(owner_storage),
+    owner: str = Depends(current_user),
+) -> StreamingResponse:
+    """Stream the caller's tasks, then their activity logs, including deleted tasks'.
+
+    Records are read from storage in batches as the client consumes them, so
+    the response starts at once and server memory does not grow with the
+    number of tasks. Each record has a `type`: `task`, `activity` or
+    `deleted_activity`.
+    """
+    # The export generators read storage synchronously, from the threads
+    # StreamingResponse iterates sync bodies on
+    if format == "ndjson":
+        body = export_ndjson(storage.sync, EXPORT_BATCH_SIZE)
+    else:
+        body = export_csv(storage.sync, EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'},
+        background=_streaming_lease(owner),
+    )
+
+
+@router.post("/bulk", response_model=list[BulkResult], status_code=status.HTTP_201_CREATED)
+async def create_tasks_bulk(
+    items: BulkCreateRequest, storage: AsyncStorage = Depends(owner_storage)
+) -> list[BulkResult]:
+    tasks = await storage.create_tasks([item.title for item in items])
+    return [BulkResult(id=task.id, status=status.HTTP_201_CREATED, task=task) for task in tasks]
+
+
+@router.post(
+    "/import",
+    response_class=ImportResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                NDJSON_MEDIA_TYPE: {"schema": {"$ref": "#/components/schemas/TaskCreate"}}
+            },
+        }
+    },
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def import_tasks(
+    request: Request,
+    storage: AsyncStorage = Depends(owner_storage),
+    owner: str = Depends(current_user),
+) -> ImportResponse:
+    """Create one task per line of an NDJSON body of `{"title": ...}` objects.
+
+    The body is parsed and validated as it streams in, and tasks are created
+    in batches, so uploads of any size use bounded memory. The response is
+    NDJSON as well: an `error` record (with its `line`) per rejected line, a
+    `progress` record after each batch and a final `summary`. Valid lines are
+    imported even when others fail.
+    """
+    return ImportResponse(
+        import_ndjson(request.stream(), storage, IMPORT_BATCH_SIZE),
+        media_type=NDJSON_MEDIA_TYPE,
+        background=_streaming_lease(owner),
+    )
+
+
+@router.patch("/bulk", response_model=list[BulkResult])
+async def update_tasks_bulk(
+    items: BulkUpdateRequest, storage: AsyncStorage = Depends(owner_storage)
+) -> list[BulkResult]:
+    tasks = await storage.update_tasks([(item.id, item.title, item.completed) for item in items])
+    return [
+        BulkResult(id=item.id, status=status.HTTP_200_OK, task=task)
+        if task is not None
+        else _bulk_not_found(item.id)
+        for item, task in zip(items, tasks)
+    ]
+
+
+@router.delete("/bulk", response_model=list[BulkResult])
+async def delete_tasks_bulk(
+    task_ids: BulkDeleteRequest = Body(), storage: AsyncStorage = Depends(owner_storage)
+) -> list[BulkResult]:
+    deleted = await storage.delete_tasks(task_ids)
+    return [
+        BulkResult(id=task_id, status=status.HTTP_204_NO_CONTENT)
+        if ok
+        else _bulk_not_found(task_id)
+        for task_id, ok in zip(task_ids, deleted)
+    ]
+
+
+def _bulk_not_found(task_id: str) -> BulkResult:
+    return BulkResult(
+        id=task_id,
+        status=status.HTTP_404_NOT_FOUND,
+        detail=f"Task with id '{task_id}' not found",
+    )
 
 
 @router.get("/{task_id}", response_model=Task)
-def get_task(task_id: str) -> Task:
-    task = storage.get_task(task_id)
+async def get_task(
+    task_id: str,
+    request: Request,
+    response: Response,
+    storage: AsyncStorage = Depends(owner_storage),
+) -> Task | Response:
+    revision = await storage.task_revision(task_id)
+    if revision is not None:
+        if (cached := _not_modified(storage, request, response, revision)) is not None:
+            return cached
+    task = await storage.get_task(task_id)
     if task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -36,8 +468,10 @@ def get_task(task_id: str) -> Task:
 
 
 @router.put("/{task_id}/complete", response_model=Task)
-def complete_task(task_id: str) -> Task:
-    task = storage.complete_task(task_id)
+async def complete_task(
+    task_id: str, storage: AsyncStorage = Depends(owner_storage)
+) -> Task:
+    task = await storage.complete_task(task_id)
     if task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -47,8 +481,10 @@ def complete_task(task_id: str) -> Task:
 
 
 @router.patch("/{task_id}", response_model=Task)
-def update_task(task_id: str, update: TaskUpdate) -> Task:
-    task = storage.update_task(task_id, title=update.title, completed=update.completed)
+async def update_task(
+    task_id: str, update: TaskUpdate, storage: AsyncStorage = Depends(owner_storage)
+) -> Task:
+    task = await storage.update_task(task_id, title=update.title, completed=update.completed)
     if task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -58,8 +494,10 @@ def update_task(task_id: str, update: TaskUpdate) -> Task:
 
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(task_id: str) -> Response:
-    deleted = storage.delete_task(task_id)
+async def delete_task(
+    task_id: str, storage: AsyncStorage = Depends(owner_storage)
+) -> Response:
+    deleted = await storage.delete_task(task_id)
     if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -69,11 +507,83 @@ def delete_task(task_id: str) -> Response:
 
 
 @router.get("/{task_id}/activity", response_model=list[ActivityLog])
-def get_task_activity(task_id: str) -> list[ActivityLog]:
-    activity = storage.get_task_activity(task_id)
+async def get_task_activity(
+    task_id: str,
+    request: Request,
+    response: Response,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    storage: AsyncStorage = Depends(owner_storage),
+) -> Response:
+    """List a task's activity, oldest first, optionally by time range and action.
+
+    `since` is inclusive and `until` exclusive. Without `limit` or `cursor`
+    every matching entry is returned; otherwise paging works as for GET /tasks.
+    """
+    revision = await storage.task_revision(task_id)
+    if revision is not None:
+        if (cached := _not_modified(storage, request, response, revision)) is not None:
+            return cached
+    query = ActivityQuery(since=_naive_utc(since), until=_naive_utc(until), action=action)
+    if limit is None and cursor is None and query == ActivityQuery():
+        activity = await storage.get_task_activity(task_id)
+        next_seq = None
+    else:
+        page = await storage.query_task_activity(
+            task_id, query, *_activity_page(limit, cursor)
+        )
+        activity, next_seq = page if page is not None else (None, None)
     if activity is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Task with id '{task_id}' not found",
         )
-    return activity
+    return _activity_json(activity, next_seq, response)
+
+
+@activity_router.get("", response_model=list[ActivityLog])
+async def list_activity(
+    request: Request,
+    response: Response,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    storage: AsyncStorage = Depends(owner_storage),
+) -> Response:
+    """List activity across all of the caller's tasks, deleted ones included, oldest first.
+
+    Takes the same filters and paging as GET /tasks/{task_id}/activity.
+    """
+    revision = await storage.revision()
+    if (cached := _not_modified(storage, request, response, revision)) is not None:
+        return cached
+    query = ActivityQuery(since=_naive_utc(since), until=_naive_utc(until), action=action)
+    activity, next_seq = await storage.query_activity(query, *_activity_page(limit, cursor))
+    return _activity_json(activity, next_seq, response)
+
+
+def _activity_page(limit: int | None, cursor: str | None) -> tuple[int | None, ActivitySeq | None]:
+    """The (limit, after) to page activity by; no limit when neither is given."""
+    if limit is None and cursor is None:
+        return None, None
+    try:
+        after = decode_activity_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+    return limit or DEFAULT_PAGE_SIZE, after
+
+
+def _activity_json(
+    activity: list[ActivityLog], next_seq: ActivitySeq | None, response: Response
+) -> Response:
+    if next_seq is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_activity_cursor(next_seq)
+    return _json_response(_ACTIVITY_LIST.dump_json(activity), response)
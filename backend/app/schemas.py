@@ -1,4 +1,11 @@
-from pydantic import BaseModel, field_validator
+from typing import Annotated
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.models import Task
+
+# Upper bound on operations accepted by one /tasks/bulk request
+MAX_BULK_OPERATIONS = 5000
 
 
 class TaskCreate(BaseModel):
@@ -40,3 +47,25 @@ class TaskUpdate(BaseModel):
         if v is not None and not v.strip():
             raise ValueError("title must not be empty")
         return v.strip() if v else v
+
+
+class TaskBulkUpdate(TaskUpdate):
+    id: str
+
+
+BulkCreateRequest = Annotated[
+    list[TaskCreate], Field(min_length=1, max_length=MAX_BULK_OPERATIONS)
+]
+BulkUpdateRequest = Annotated[
+    list[TaskBulkUpdate], Field(min_length=1, max_length=MAX_BULK_OPERATIONS)
+]
+BulkDeleteRequest = Annotated[list[str], Field(min_length=1, max_length=MAX_BULK_OPERATIONS)]
+
+
+class BulkResult(BaseModel):
+    """Outcome of one operation in a bulk request, using HTTP status codes."""
+
+    id: str
+    status: int
+    task: Task | None = None
+    detail: str | None = None
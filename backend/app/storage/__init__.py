@@ -0,0 +1,124 @@
+import os
+from datetime import timedelta
+from typing import Optional
+
+from app.storage.base import (
+    ActivityQuery,
+    ActivityRetention,
+    ActivitySeq,
+    AsyncStorage,
+    ConsistencyError,
+    OrderKey,
+    Storage,
+    TaskQuery,
+    TaskRecord,
+    TaskSort,
+)
+from app.storage.durable import DurableMemoryStorage
+from app.storage.memory import InMemoryStorage
+from app.storage.sharded import ShardedStorage, shard_name
+from app.storage.sqlite import SQLiteStorage
+
+STORAGE_BACKEND_ENV = "STORAGE_BACKEND"
+SQLITE_PATH_ENV = "SQLITE_PATH"
+DEFAULT_SQLITE_PATH = "tasks.db"
+# Directory for the in-memory backend's log and snapshots; unset keeps it volatile
+MEMORY_DATA_DIR_ENV = "MEMORY_DATA_DIR"
+# Same variable uvicorn and gunicorn read for their default worker count
+WORKERS_ENV = "WEB_CONCURRENCY"
+# Shards without a request in flight kept open before the least recently used
+# are closed; only for backends that persist, which reopen them on demand
+SHARDS_MAX_IDLE_ENV = "SHARDS_MAX_IDLE"
+DEFAULT_SHARDS_MAX_IDLE = 64
+# Activity retention limits; 0 lifts a limit, unset keeps the default
+ACTIVITY_MAX_PER_TASK_ENV = "ACTIVITY_MAX_PER_TASK"
+ACTIVITY_MAX_AGE_DAYS_ENV = "ACTIVITY_MAX_AGE_DAYS"
+ACTIVITY_MAX_ARCHIVED_ENV = "ACTIVITY_MAX_ARCHIVED"
+
+
+def _limit(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return int(value) or None
+
+
+def activity_retention() -> ActivityRetention:
+    """Retention policy from $ACTIVITY_MAX_PER_TASK, _MAX_AGE_DAYS and _MAX_ARCHIVED."""
+    default = ActivityRetention()
+    max_age_days = _limit(ACTIVITY_MAX_AGE_DAYS_ENV, None)
+    return ActivityRetention(
+        max_per_task=_limit(ACTIVITY_MAX_PER_TASK_ENV, default.max_per_task),
+        max_age=timedelta(days=max_age_days) if max_age_days is not None else default.max_age,
+        max_archived=_limit(ACTIVITY_MAX_ARCHIVED_ENV, default.max_archived),
+    )
+
+
+def _backend() -> str:
+    """The backend named by $STORAGE_BACKEND, once its settings are checked."""
+    backend = os.environ.get(STORAGE_BACKEND_ENV, "memory").lower()
+    if backend not in ("memory", "sqlite"):
+        raise ValueError(
+            f"Unknown {STORAGE_BACKEND_ENV} {backend!r}; expected 'memory' or 'sqlite'"
+        )
+    if backend == "memory" and int(os.environ.get(WORKERS_ENV, "1")) > 1:
+        # Each worker process would get its own private dict
+        raise ValueError(
+            f"{WORKERS_ENV} > 1 requires shared state; set {STORAGE_BACKEND_ENV}=sqlite"
+        )
+    return backend
+
+
+def create_storage(owner: Optional[str] = None) -> Storage:
+    """Build the backend named by $STORAGE_BACKEND ("memory" or "sqlite").
+
+    With an `owner`, the backend keeps that owner's shard: its files get the
+    owner's shard_name, beside (SQLite) or under (durable memory) the
+    configured location.
+    """
+    backend = _backend()
+    if backend == "memory":
+        data_dir = os.environ.get(MEMORY_DATA_DIR_ENV)
+        if data_dir:
+            if owner is not None:
+                data_dir = os.path.join(data_dir, shard_name(owner))
+            return DurableMemoryStorage(data_dir, retention=activity_retention())
+        return InMemoryStorage(retention=activity_retention())
+    path = os.environ.get(SQLITE_PATH_ENV, DEFAULT_SQLITE_PATH)
+    if owner is not None:
+        base, extension = os.path.splitext(path)
+        path = f"{base}-{shard_name(owner)}{extension}"
+    return SQLiteStorage(path, retention=activity_retention())
+
+
+def max_idle_shards() -> Optional[int]:
+    """Idle shards kept open, from $SHARDS_MAX_IDLE; None when closing one would lose it."""
+    if _backend() == "memory" and not os.environ.get(MEMORY_DATA_DIR_ENV):
+        return None
+    return int(os.environ.get(SHARDS_MAX_IDLE_ENV, DEFAULT_SHARDS_MAX_IDLE))
+
+
+# Every owner's tasks, one shard each; settings are checked now, shards built on use
+shards = ShardedStorage(create_storage, max_idle=max_idle_shards())
+
+__all__ = [
+    "ActivityQuery",
+    "ActivityRetention",
+    "ActivitySeq",
+    "AsyncStorage",
+    "ConsistencyError",
+    "DurableMemoryStorage",
+    "InMemoryStorage",
+    "OrderKey",
+    "SQLiteStorage",
+    "ShardedStorage",
+    "Storage",
+    "TaskQuery",
+    "TaskRecord",
+    "TaskSort",
+    "activity_retention",
+    "create_storage",
+    "max_idle_shards",
+    "shard_name",
+    "shards",
+]
@@ -0,0 +1,306 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator, Literal, NamedTuple, Optional, Protocol
+
+from app.models import ActivityLog, Task, TaskEvent, TaskStats
+from app.storage.search import RankKey
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Ordering key used for cursor pagination: (value of the sort field, id)
+OrderKey = tuple[datetime, str]
+
+TaskSort = Literal["created_at", "-created_at", "updated_at", "-updated_at"]
+
+
+class TaskRecord(NamedTuple):
+    """A task as storage holds and lists it: a plain immutable tuple.
+
+    A Task model carries a __dict__ and a fields-set per instance, and
+    building one costs more than encoding it. List reads return records,
+    which the API encodes directly; Task models are only built for single
+    tasks.
+    """
+
+    id: str
+    title: str
+    completed: bool
+    created_at: datetime
+    updated_at: datetime
+
+    def to_task(self) -> Task:
+        # Fields were validated on the way in; skip revalidating them
+        return Task.model_construct(
+            id=self.id,
+            title=self.title,
+            completed=self.completed,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+        )
+
+
+class ConsistencyError(Exception):
+    """An incrementally maintained count disagrees with a recount (check_consistency)."""
+
+
+def to_micros(value: datetime) -> int:
+    """Naive UTC datetime -> integer microseconds since the epoch (sortable)."""
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+@dataclass(frozen=True)
+class ActivityRetention:
+    """How much activity history a backend keeps. None lifts a limit.
+
+    `max_per_task` and `max_age` drop a live task's oldest entries;
+    `max_archived` caps the entries kept for deleted tasks, oldest first.
+    Dropped entries are gone from the change feed too.
+    """
+
+    max_per_task: Optional[int] = 1000
+    max_age: Optional[timedelta] = None
+    max_archived: Optional[int] = 100_000
+
+
+# Position of an activity entry in its backend's append order; resuming
+# after it continues an activity page
+ActivitySeq = int
+
+
+@dataclass(frozen=True)
+class ActivityQuery:
+    """Filters for activity pages. Datetimes are naive UTC."""
+
+    since: Optional[datetime] = None  # inclusive
+    until: Optional[datetime] = None  # exclusive
+    action: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class TaskQuery:
+    """Filters and ordering for query_tasks. Datetimes are naive UTC."""
+
+    completed: Optional[bool] = None
+    created_after: Optional[datetime] = None  # exclusive
+    created_before: Optional[datetime] = None  # exclusive
+    updated_since: Optional[datetime] = None  # inclusive
+    sort: TaskSort = "created_at"
+
+    @property
+    def sort_field(self) -> str:
+        return self.sort.lstrip("-")
+
+    @property
+    def descending(self) -> bool:
+        return self.sort.startswith("-")
+
+    def matches(self, task: TaskRecord) -> bool:
+        return (
+            (self.completed is None or task.completed == self.completed)
+            and (self.created_after is None or task.created_at > self.created_after)
+            and (self.created_before is None or task.created_at < self.created_before)
+            and (self.updated_since is None or task.updated_at >= self.updated_since)
+        )
+
+    def key(self, task: TaskRecord) -> OrderKey:
+        return getattr(task, self.sort_field), task.id
+
+
+class Storage(Protocol):
+    """Interface every storage backend implements."""
+
+    check_consistency: bool
+    # Identifies this storage's revision sequence; changes if revisions restart
+    epoch: str
+    # The same storage for async callers
+    aio: "AsyncStorage"
+
+    def revision(self) -> int:
+        """Global revision, increased by every committed mutation."""
+        ...
+
+    def task_revision(self, task_id: str) -> Optional[int]:
+        """Revision of the last mutation of a task, or None if it does not exist."""
+        ...
+
+    def events_since(self, revision: int, limit: int) -> Optional[list[TaskEvent]]:
+        """Change events after `revision`, oldest first, about `limit` at a time.
+
+        Returns None if some of those events are no longer retained (or the
+        revision is from another epoch), in which case the caller must resync.
+        """
+        ...
+
+    def get_all_tasks(self) -> list[TaskRecord]: ...
+
+    def query_tasks(
+        self,
+        query: TaskQuery,
+        limit: Optional[int] = None,
+        after: Optional[OrderKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[OrderKey]]:
+        """Return tasks matching `query` in its sort order, resuming past `after`.
+
+        With a `limit` the second element is the key to resume from, or None
+        on the last page.
+        """
+        ...
+
+    def search_tasks(
+        self,
+        text: str,
+        limit: int,
+        after: Optional[RankKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[RankKey]]:
+        """Tasks whose titles match every word of `text`, best match first."""
+        ...
+
+    def get_task(self, task_id: str) -> Optional[Task]: ...
+
+    def create_task(self, title: str) -> Task: ...
+
+    def create_tasks(self, titles: list[str]) -> list[Task]: ...
+
+    def complete_task(self, task_id: str) -> Optional[Task]: ...
+
+    def update_task(
+        self,
+        task_id: str,
+        title: Optional[str] = None,
+        completed: Optional[bool] = None,
+    ) -> Optional[Task]: ...
+
+    def update_tasks(
+        self, updates: list[tuple[str, Optional[str], Optional[bool]]]
+    ) -> list[Optional[Task]]:
+        """Apply (task_id, title, completed) updates; None marks a missing task."""
+        ...
+
+    def delete_task(self, task_id: str) -> bool: ...
+
+    def delete_tasks(self, task_ids: list[str]) -> list[bool]: ...
+
+    def get_task_activity(self, task_id: str) -> Optional[list[ActivityLog]]: ...
+
+    def query_task_activity(
+        self,
+        task_id: str,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> Optional[tuple[list[ActivityLog], Optional[ActivitySeq]]]:
+        """A task's activity matching `query`, oldest first, resuming past `after`.
+
+        Returns None if the task does not exist. With a `limit` the second
+        element is where the next page starts, or None on the last page.
+        """
+        ...
+
+    def query_activity(
+        self,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]:
+        """Like query_task_activity across all tasks, deleted ones included."""
+        ...
+
+    def iter_activity(self, archived: bool, batch_size: int) -> Iterator[list[ActivityLog]]:
+        """Every activity log of live tasks, or with `archived` of deleted ones.
+
+        Logs are read `batch_size` (tasks or rows) at a time as the caller
+        consumes them, so memory does not grow with the number of logs.
+        """
+        ...
+
+    def get_stats(self) -> TaskStats: ...
+
+    def sizes(self) -> dict[str, int]:
+        """Entry counts of the backend's main structures (at least "tasks"), for metrics."""
+        ...
+
+    def clear(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class AsyncStorage(Protocol):
+    """Storage operations as coroutines, for async route handlers.
+
+    Each backend decides what runs on the event loop and what runs on a
+    thread; none of these block the loop on I/O. The methods mean what
+    their Storage namesakes do.
+    """
+
+    # The wrapped Storage, for code that iterates it from a worker thread
+    sync: Storage
+    epoch: str
+
+    async def revision(self) -> int: ...
+
+    async def task_revision(self, task_id: str) -> Optional[int]: ...
+
+    async def events_since(self, revision: int, limit: int) -> Optional[list[TaskEvent]]: ...
+
+    async def get_all_tasks(self) -> list[TaskRecord]: ...
+
+    async def query_tasks(
+        self,
+        query: TaskQuery,
+        limit: Optional[int] = None,
+        after: Optional[OrderKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[OrderKey]]: ...
+
+    async def search_tasks(
+        self,
+        text: str,
+        limit: int,
+        after: Optional[RankKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[RankKey]]: ...
+
+    async def get_task(self, task_id: str) -> Optional[Task]: ...
+
+    async def create_task(self, title: str) -> Task: ...
+
+    async def create_tasks(self, titles: list[str]) -> list[Task]: ...
+
+    async def complete_task(self, task_id: str) -> Optional[Task]: ...
+
+    async def update_task(
+        self,
+        task_id: str,
+        title: Optional[str] = None,
+        completed: Optional[bool] = None,
+    ) -> Optional[Task]: ...
+
+    async def update_tasks(
+        self, updates: list[tuple[str, Optional[str], Optional[bool]]]
+    ) -> list[Optional[Task]]: ...
+
+    async def delete_task(self, task_id: str) -> bool: ...
+
+    async def delete_tasks(self, task_ids: list[str]) -> list[bool]: ...
+
+    async def get_task_activity(self, task_id: str) -> Optional[list[ActivityLog]]: ...
+
+    async def query_task_activity(
+        self,
+        task_id: str,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> Optional[tuple[list[ActivityLog], Optional[ActivitySeq]]]: ...
+
+    async def query_activity(
+        self,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]: ...
+
+    async def get_stats(self) -> TaskStats: ...
@@ -0,0 +1,555 @@
+import gc
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from app.models import ActivityLog, Task, TaskStats
+from app.storage.base import (
+    ActivityQuery,
+    ActivityRetention,
+    ActivitySeq,
+    OrderKey,
+    TaskQuery,
+    TaskRecord,
+    to_micros,
+)
+from app.storage.memory import ActivityEntry, AsyncMemoryStorage, InMemoryStorage, _entry_seq
+from app.storage.snapshot import (
+    MappedSnapshot,
+    SnapshotLogs,
+    SnapshotRow,
+    SnapshotTasks,
+    _datetime,
+    encode_logs,
+    is_columnar,
+    write_columnar_snapshot,
+)
+from app.storage.search import RankKey
+from app.storage.timed import TimedStorage
+from app.storage.wal import (
+    WriteAheadLog,
+    list_files,
+    read_snapshot,
+    replay_segment,
+    segment_path,
+    snapshot_path,
+)
+
+# Log records: (_PUT, tasks, entries, revision), (_DELETE, task_id, entry,
+# revision) and (_CLEAR, revision), with tasks and entries as plain tuples and
+# datetimes as epoch microseconds. `revision` is the global revision once the
+# write was published; records logged before it was added lack it.
+_PUT, _DELETE, _CLEAR = 0, 1, 2
+# Where each kind of record keeps its revision
+_REVISION_FIELD = {_PUT: 3, _DELETE: 3, _CLEAR: 1}
+
+# Snapshots used to be marshal frames; recovery still reads them
+_FRAMED_FORMAT = 1
+# Log records between snapshots; recovery replays at most this many
+SNAPSHOT_EVERY = 100_000
+
+
+def _pack_task(task: TaskRecord) -> tuple:
+    created_at, updated_at = to_micros(task.created_at), to_micros(task.updated_at)
+    return (task.id, task.title, task.completed, created_at, updated_at)
+
+
+def _unpack_task(row: tuple) -> TaskRecord:
+    task_id, title, completed, created_at, updated_at = row
+    return TaskRecord(task_id, title, completed, _datetime(created_at), _datetime(updated_at))
+
+
+def _unpack_entry(row: tuple) -> ActivityEntry:
+    seq, log_id, task_id, action, *rest = row
+    return ActivityEntry(seq, log_id, task_id, sys.intern(action), *rest)
+
+
+def _record_revision(record: tuple) -> int:
+    field = _REVISION_FIELD[record[0]]
+    return record[field] if len(record) > field else 0
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """Suspend the cycle collector while building or copying the whole state.
+
+    That allocates millions of acyclic tuples and lists, and each full
+    collection it triggers rescans all of them: copying the logs of 200k
+    tasks takes 0.7s with collection on and 0.04s with it off.
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
+
+class DurableMemoryStorage(InMemoryStorage):
+    """InMemoryStorage that survives restarts: a write-ahead log plus snapshots.
+
+    Every write is appended to the log and acknowledged once it is fsynced;
+    concurrent writes share fsyncs (group commit). After `snapshot_every`
+    records a background thread pauses writers just long enough to copy the
+    state and start a new log segment, then writes the snapshot and deletes
+    the segments it covers. Reads never touch the log.
+
+    Snapshots are columnar files (see app.storage.snapshot) that startup
+    memory-maps instead of reading: a task, and its activity log, is decoded
+    the first time it is asked for. The secondary indexes are built from the
+    snapshot's columns on a background thread; until they are, requests that
+    need them (writes, listing, search, stats) wait, while lookups by id and
+    activity reads are served at once. The cross-task activity feed is
+    assembled on its first query.
+
+    Readers may briefly see a write that is not yet durable; it is only
+    acknowledged to its writer once it is. Through `aio`, writers await
+    durability without holding a thread (see AsyncDurableStorage).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        check_consistency: bool = False,
+        retention: ActivityRetention = ActivityRetention(),
+        snapshot_every: int = SNAPSHOT_EVERY,
+        sync: bool = True,
+    ):
+        super().__init__(check_consistency=check_consistency, retention=retention)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        # Snapshots opened by recovery, closed with the storage
+        self._mapped: list[MappedSnapshot] = []
+        self._indexed = threading.Event()
+        self._index_error: Optional[BaseException] = None
+        # The revision recovery restored: every task untouched since is at it
+        self._recovered_revision = 0
+        self._feed_loaded = False
+        with _gc_paused():
+            next_segment = self._recover()
+        self._wal = WriteAheadLog(directory, next_segment, sync=sync)
+        self._snapshot_wanted = threading.Event()
+        self._snapshot_lock = threading.Lock()
+        self._closing = False
+        self._indexer = threading.Thread(
+            target=self._build_indexes, name="indexer", daemon=True
+        )
+        self._indexer.start()
+        self._snapshotter = threading.Thread(
+            target=self._run_snapshots, name="snapshotter", daemon=True
+        )
+        self._snapshotter.start()
+        self.aio = TimedStorage(AsyncDurableStorage(self), "durable")
+
+    # -- recovery
+
+    def _recover(self) -> int:
+        """Open the newest snapshot and replay the log after it; return the next segment."""
+        segments, snapshots = list_files(self.directory)
+        snapshot = None
+        archived: dict[str, list[ActivityEntry]] = {}
+        seq = revision = 0
+        start = 0
+        if snapshots:
+            start = snapshots[-1]
+            path = snapshot_path(self.directory, start)
+            if is_columnar(path):
+                snapshot = MappedSnapshot(path)
+                self._mapped.append(snapshot)
+                seq = snapshot.seq
+                revision = snapshot.revision
+                for entry in snapshot.archived():
+                    archived.setdefault(entry.task_id, []).append(entry)
+        tasks = SnapshotTasks(snapshot)
+        live = SnapshotLogs(snapshot, self.retention.max_per_task)
+        if snapshots and snapshot is None:
+            seq = self._load_snapshot(path, tasks, live, archived)
+        replayed = [number for number in segments if number >= start]
+        for number in replayed:
+            path = segment_path(self.directory, number)
+            for record in replay_segment(path, last=number == replayed[-1]):
+                seq = max(seq, self._apply(record, tasks, live, archived))
+                revision = max(revision, _record_revision(record))
+        self._install(tasks, live, archived, seq, revision)
+        return max(segments + snapshots, default=0) + 1
+
+    def _load_snapshot(self, path, tasks, live, archived) -> int:
+        """Load a snapshot in the older framed format into the overlays."""
+        frames = read_snapshot(path)
+        _, version, seq = next(frames)
+        if version != _FRAMED_FORMAT:
+            raise ValueError(f"{path}: unsupported snapshot format {version}")
+        for kind, rows in frames:
+            if kind == "tasks":
+                tasks.update((row[0], _unpack_task(row)) for row in rows)
+            else:
+                # A task's entries are contiguous and in order, so grouping keeps
+                # archives in deletion order
+                target = live if kind == "logs" else archived
+                for row in rows:
+                    entry = _unpack_entry(row)
+                    target.setdefault(entry.task_id, []).append(entry)
+        return seq
+
+    @staticmethod
+    def _apply(record: tuple, tasks, live, archived) -> int:
+        """Replay one log record onto the recovered maps; return the highest seq it holds."""
+        op = record[0]
+        if op == _PUT:
+            _, rows, entries, *_ = record
+            tasks.update((row[0], _unpack_task(row)) for row in rows)
+            for row in entries:
+                entry = _unpack_entry(row)
+                live.setdefault(entry.task_id, []).append(entry)
+            return entries[-1][0] if entries else 0
+        if op == _DELETE:
+            _, task_id, row, *_ = record
+            tasks.pop(task_id, None)
+            logs = live.pop(task_id, [])
+            logs.append(_unpack_entry(row))
+            archived.pop(task_id, None)
+            archived[task_id] = logs
+            return row[0]
+        tasks.clear()
+        live.clear()
+        archived.clear()
+        return 0
+
+    def _install(
+        self, tasks: SnapshotTasks, live: SnapshotLogs, archived, seq: int, revision: int
+    ) -> None:
+        """Adopt recovered state, applying retention; indexes are built by _build_indexes.
+
+        Revisions carry on from `revision`, so they only ever go up across
+        restarts. The change events before it are not kept, so the feed
+        starts there.
+        """
+        max_per_task = self.retention.max_per_task
+        if max_per_task is not None:
+            # Logs still in the snapshot are trimmed as they are decoded
+            for logs in live.loaded.values():
+                del logs[: max(0, len(logs) - max_per_task)]
+        count = sum(len(logs) for logs in archived.values())
+        if self.retention.max_archived is not None:
+            while count > self.retention.max_archived:
+                count -= len(archived.pop(next(iter(archived))))
+        self.tasks = tasks
+        self.activity_logs = live
+        self.deleted_activity_logs = archived
+        self._archived_count = count
+        self._activity_seq = seq
+        with self._revision_lock:
+            self._revision = self._events_floor = self._recovered_revision = revision
+
+    def _build_indexes(self) -> None:
+        """Build the secondary indexes, reading untouched snapshot rows from their columns."""
+        try:
+            with _gc_paused():
+                self._index_recovered()
+        except BaseException as exc:
+            self._index_error = exc
+            raise
+        finally:
+            self._indexed.set()
+
+    def _index_recovered(self) -> None:
+        tasks = self.tasks
+        snapshot, loaded, removed, fresh = tasks.overlay()
+        order, updated_order, documents = [], [], []
+        completed_ids, pending_ids = set(), set()
+        if snapshot is not None:
+            for row in range(snapshot.count):
+                task_id = snapshot.task_id(row)
+                if task_id in removed or task_id in loaded:
+                    continue
+                order.append((_datetime(snapshot.created_micros(row)), task_id))
+                updated_order.append((_datetime(snapshot.updated_micros(row)), task_id))
+                if snapshot.completed_at(row):
+                    completed_ids.add(task_id)
+                else:
+                    pending_ids.add(task_id)
+                documents.append((task_id, snapshot.title_bytes(row).decode("utf-8")))
+        for task in (*loaded.values(), *fresh):
+            order.append((task.created_at, task.id))
+            updated_order.append((task.updated_at, task.id))
+            (completed_ids if task.completed else pending_ids).add(task.id)
+            documents.append((task.id, task.title))
+        # Snapshot rows are already in created order, so this sort is mostly merging
+        order.sort()
+        updated_order.sort()
+        self._search.add_many(documents)
+        with self._shared_lock:
+            self._order = order
+            self._updated_order = updated_order
+            self._completed_ids = completed_ids
+            self._pending_ids = pending_ids
+            self._task_count = len(order)
+            self._completed_count = len(completed_ids)
+
+    def _await_indexes(self) -> None:
+        self._indexed.wait()
+        if self._index_error is not None:
+            raise RuntimeError("building the task indexes failed") from self._index_error
+
+    def _load_feed(self) -> None:
+        """Assemble the cross-task feed from every log, on its first query."""
+        if self._feed_loaded:
+            return
+        with self._activity_lock, _gc_paused():
+            if self._feed_loaded:
+                return
+            # Entries written since startup are in _activity before their task
+            # log, so merge both rather than trusting either alone
+            entries = {entry.seq: entry for entry in self._activity}
+            for logs in (*self.activity_logs.values(), *self.deleted_activity_logs.values()):
+                entries.update((entry.seq, entry) for entry in logs)
+            self._activity = sorted(entries.values(), key=_entry_seq)
+            self._forgotten = 0
+            self._feed_loaded = True
+
+    # -- reads and writes that need the indexes
+
+    def query_tasks(
+        self,
+        query: TaskQuery,
+        limit: Optional[int] = None,
+        after: Optional[OrderKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[OrderKey]]:
+        self._await_indexes()
+        return super().query_tasks(query, limit, after)
+
+    def search_tasks(
+        self,
+        text: str,
+        limit: int,
+        after: Optional[RankKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[RankKey]]:
+        self._await_indexes()
+        return super().search_tasks(text, limit, after)
+
+    def get_stats(self) -> TaskStats:
+        self._await_indexes()
+        return super().get_stats()
+
+    def query_activity(
+        self,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]:
+        self._load_feed()
+        return super().query_activity(query, limit, after)
+
+    def task_revision(self, task_id: str) -> Optional[int]:
+        revision = super().task_revision(task_id)
+        # Tasks untouched since startup last changed at or before the
+        # recovered revision, and every later change is above it
+        if revision is None and task_id in self.tasks:
+            return self._recovered_revision
+        return revision
+
+    def _create(self, titles: list[str]) -> tuple[list[Task], Optional[int]]:
+        self._await_indexes()
+        return super()._create(titles)
+
+    def _complete(self, task_id: str) -> tuple[Optional[Task], Optional[int]]:
+        self._await_indexes()
+        return super()._complete(task_id)
+
+    def _update(
+        self, task_id: str, title: Optional[str], completed: Optional[bool]
+    ) -> tuple[Optional[Task], Optional[int]]:
+        self._await_indexes()
+        return super()._update(task_id, title, completed)
+
+    def _delete(self, task_id: str) -> tuple[bool, Optional[int]]:
+        self._await_indexes()
+        return super()._delete(task_id)
+
+    # -- logging
+
+    def _journal_put(self, tasks: list[TaskRecord], entries: list[ActivityEntry]) -> int:
+        ticket = self._wal.append(
+            (
+                _PUT,
+                [_pack_task(task) for task in tasks],
+                [tuple(entry) for entry in entries],
+                self._revision,
+            )
+        )
+        self._maybe_snapshot()
+        return ticket
+
+    def _journal_delete(self, task_id: str, entry: ActivityEntry) -> int:
+        ticket = self._wal.append((_DELETE, task_id, tuple(entry), self._revision))
+        self._maybe_snapshot()
+        return ticket
+
+    def _sync(self, ticket: Optional[int]) -> None:
+        if ticket is not None:
+            self._wal.wait(ticket)
+
+    def clear(self) -> None:
+        self._await_indexes()
+        with self._quiesced():
+            super().clear()
+            ticket = self._wal.append((_CLEAR, self._revision))
+        self._sync(ticket)
+
+    # -- snapshots
+
+    @contextmanager
+    def _quiesced(self) -> Iterator[None]:
+        """Hold every writer's lock, so no write is half applied or half logged."""
+        with self._create_lock:
+            for lock in self._stripes:
+                lock.acquire()
+            try:
+                yield
+            finally:
+                for lock in reversed(self._stripes):
+                    lock.release()
+
+    def _maybe_snapshot(self) -> None:
+        if self._wal.records >= self.snapshot_every:
+            self._snapshot_wanted.set()
+
+    def _run_snapshots(self) -> None:
+        while True:
+            self._snapshot_wanted.wait()
+            self._snapshot_wanted.clear()
+            if self._closing:
+                return
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        """Write a snapshot of the current state and drop the log it replaces."""
+        with self._snapshot_lock:
+            with self._quiesced(), _gc_paused():
+                base, loaded, removed, fresh = self.tasks.overlay()
+                # Live logs are trimmed in place, so copy them; archived ones never change
+                live = self.activity_logs.overlay()
+                archived = list(self.deleted_activity_logs.values())
+                seq = self._activity_seq
+                revision = self._revision
+                segment = self._wal.rotate()
+            with _gc_paused():
+                rows = _snapshot_rows(base, loaded, removed, fresh, live)
+                write_columnar_snapshot(
+                    snapshot_path(self.directory, segment),
+                    rows,
+                    [entry for entries in archived for entry in entries],
+                    seq,
+                    revision,
+                )
+            # The snapshot mapped at startup stays readable once its file is
+            # unlinked, and untouched tasks are still read from it
+            segments, snapshots = list_files(self.directory)
+            for number in segments:
+                if number < segment:
+                    os.remove(segment_path(self.directory, number))
+            for number in snapshots:
+                if number < segment:
+                    os.remove(snapshot_path(self.directory, number))
+
+    def close(self) -> None:
+        """Stop snapshotting, snapshot what the log holds and close it."""
+        if self._closing:
+            return
+        self._closing = True
+        self._snapshot_wanted.set()
+        self._snapshotter.join()
+        self._indexer.join()
+        if self._wal.records:
+            self.snapshot()
+        self._wal.close()
+        # Restarts without writes would otherwise leave empty segments behind
+        if not self._wal.records:
+            os.remove(segment_path(self.directory, self._wal.segment))
+        for snapshot in self._mapped:
+            snapshot.close()
+
+
+class AsyncDurableStorage(AsyncMemoryStorage):
+    """AsyncMemoryStorage whose writes await the log's fsync on the event loop.
+
+    A write is applied on a worker thread, then its coroutine suspends until
+    the log's flusher thread has made it durable, so a thousand writers in
+    flight share fsyncs without holding a thread each. Waiting for the startup indexes, and the
+    first feed query's assembly, run on a worker thread.
+    """
+
+    sync: DurableMemoryStorage
+
+    async def _ready(self) -> None:
+        if not self.sync._indexed.is_set():
+            await self._offload(self.sync._indexed.wait)
+        self.sync._await_indexes()
+
+    async def _settle(self, ticket: Optional[int]) -> None:
+        if ticket is not None:
+            await self.sync._wal.wait_async(ticket)
+
+    async def query_activity(
+        self,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]:
+        if not self.sync._feed_loaded:
+            await self._offload(self.sync._load_feed)
+        return await super().query_activity(query, limit, after)
+
+
+def _snapshot_rows(
+    base: Optional[MappedSnapshot],
+    loaded: dict[str, TaskRecord],
+    removed: set[str],
+    fresh: list[TaskRecord],
+    live: dict[str, list[ActivityEntry]],
+) -> list[SnapshotRow]:
+    """Every task as a snapshot row, sorted by (created_at, id).
+
+    Rows of the previous snapshot that were neither changed nor read are
+    copied over as stored, without being decoded.
+    """
+    rows = []
+    if base is not None:
+        for row in range(base.count):
+            stored = base.raw(row)
+            task_id = stored[0].decode("ascii")
+            if task_id in removed:
+                continue
+            task, logs = loaded.get(task_id), live.get(task_id)
+            if task is None and logs is None:
+                rows.append(stored)
+                continue
+            encoded = _snapshot_row(task) if task is not None else stored[:5]
+            rows.append((*encoded, encode_logs(logs) if logs is not None else stored[5]))
+    for task in fresh:
+        rows.append((*_snapshot_row(task), encode_logs(live.get(task.id, []))))
+    rows.sort(key=_row_order)
+    return rows
+
+
+# The inverse of _datetime, for the same reason
+_micros = lru_cache(maxsize=4096)(to_micros)
+
+
+def _snapshot_row(task: TaskRecord) -> tuple:
+    return (
+        task.id.encode("ascii"),
+        task.completed,
+        _micros(task.created_at),
+        _micros(task.updated_at),
+        task.title.encode("utf-8"),
+    )
+
+
+def _row_order(row: SnapshotRow) -> tuple[int, bytes]:
+    return row[2], row[0]
@@ -0,0 +1,913 @@
+import asyncio
+import sys
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from operator import itemgetter
+from typing import Callable, Iterator, NamedTuple, Optional, TypeVar
+from uuid import UUID, uuid4
+
+from app.metrics import queued
+from app.models import ActivityLog, Task, TaskEvent, TaskStats
+from app.storage.base import (
+    ActivityQuery,
+    AsyncStorage,
+    ActivityRetention,
+    ActivitySeq,
+    ConsistencyError,
+    OrderKey,
+    TaskQuery,
+    TaskRecord,
+    from_micros,
+    to_micros,
+)
+from app.storage.search import RankKey, SearchIndex, top_ranked
+from app.storage.timed import TimedStorage
+
+# Number of locks task writes are striped over; a power of two keeps the
+# hash -> stripe mapping a cheap mask.
+LOCK_STRIPES = 64
+
+# Sorts after every task id, so (dt, _MAX_ID) bounds all keys with value dt
+_MAX_ID = "\U0010ffff"
+
+# Keys copied out of an index per step when streaming a range
+_SCAN_CHUNK = 256
+
+# Change events kept for events_since; clients further behind must resync
+EVENT_HISTORY = 10_000
+
+_event_revision = itemgetter(0)
+
+_T = TypeVar("_T")
+
+
+class ActivityEntry(NamedTuple):
+    """How InMemoryStorage holds an activity log entry.
+
+    The id is kept as the uuid's 128-bit int, the timestamp as epoch
+    microseconds and the action interned, so an entry is one small tuple
+    rather than a model plus its uuid string and datetime. `seq` numbers
+    entries across all tasks; seq and timestamp increase together.
+    """
+
+    seq: ActivitySeq
+    id: int
+    task_id: str
+    action: str
+    timestamp: int
+    old_value: Optional[str]
+    new_value: Optional[str]
+
+    def to_log(self) -> ActivityLog:
+        return ActivityLog(
+            id=str(UUID(int=self.id)),
+            task_id=self.task_id,
+            action=self.action,
+            timestamp=from_micros(self.timestamp),
+            old_value=self.old_value,
+            new_value=self.new_value,
+        )
+
+
+_entry_seq = itemgetter(0)
+_entry_timestamp = itemgetter(4)
+
+
+def _last_ticket(results: list[tuple[object, Optional[int]]]) -> Optional[int]:
+    # Tickets only grow, so syncing the last one covers the whole batch
+    return max((ticket for _, ticket in results if ticket is not None), default=None)
+
+
+def _remove_key(index: list[OrderKey], key: OrderKey) -> None:
+    position = bisect_left(index, key)
+    if position < len(index) and index[position] == key:
+        del index[position]
+
+
+class InMemoryStorage:
+    """Dict-backed storage. Fast, but data lives only as long as the process.
+
+    Requests reach it on the event loop through `aio` and from worker threads
+    (exports, and the sync API), so writes are serialized per task by a
+    striped lock: writes to different tasks proceed in parallel, and reads
+    take no lock because stored task records are replaced, never mutated.
+    Structures shared by all tasks (the secondary indexes and counters) are
+    guarded by a separate short-lived lock.
+    """
+
+    def __init__(
+        self,
+        check_consistency: bool = False,
+        retention: ActivityRetention = ActivityRetention(),
+    ):
+        self.tasks: dict[str, TaskRecord] = {}
+        # Oldest first, trimmed to `retention` as entries are added
+        self.activity_logs: dict[str, list[ActivityEntry]] = {}
+        # In deletion order, so the oldest archive is dropped first
+        self.deleted_activity_logs: dict[str, list[ActivityEntry]] = {}
+        self.retention = retention
+        self._archived_count = 0
+        # Every entry in seq order, for the activity feed across tasks. Entries
+        # retention drops from a task's log stay here until _forgotten says
+        # enough of them have piled up to rebuild the list.
+        self._activity: list[ActivityEntry] = []
+        self._activity_seq = 0
+        self._forgotten = 0
+        self._activity_lock = threading.Lock()
+        # Sorted (created_at, id) and (updated_at, id) keys for ordered queries
+        self._order: list[OrderKey] = []
+        self._updated_order: list[OrderKey] = []
+        # Ids by status, so status filters need not scan self.tasks
+        self._completed_ids: set[str] = set()
+        self._pending_ids: set[str] = set()
+        # Inverted index over titles for search_tasks
+        self._search = SearchIndex()
+        # Maintained together under _shared_lock on every mutation, so
+        # get_stats never scans self.tasks and reads a consistent pair
+        self._task_count = 0
+        self._completed_count = 0
+        # When set, get_stats recounts from scratch and raises if the counters drifted
+        self.check_consistency = check_consistency
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        # Held by create_tasks while it applies, as a stripe is by other writes
+        self._create_lock = threading.Lock()
+        self._shared_lock = threading.Lock()
+        # Revisions restart with the process, so the epoch tells instances apart
+        self.epoch = uuid4().hex[:12]
+        self._revision = 0
+        self._task_revisions: dict[str, int] = {}
+        # (revision, activity) in revision order; events at or below
+        # _events_floor may have been dropped
+        self._events: list[tuple[int, ActivityEntry]] = []
+        self._events_floor = 0
+        self._revision_lock = threading.Lock()
+        self.aio: AsyncStorage = TimedStorage(AsyncMemoryStorage(self), "memory")
+
+    def _lock_for(self, task_id: str) -> threading.Lock:
+        return self._stripes[hash(task_id) & (LOCK_STRIPES - 1)]
+
+    def _update_indexes(self, old: Optional[TaskRecord], new: Optional[TaskRecord]) -> None:
+        """Move one task's entries in the secondary indexes. Caller holds _shared_lock."""
+        if old is None or new is None or old.title != new.title:
+            if old is not None:
+                self._search.remove(old.id, old.title)
+            if new is not None:
+                self._search.add(new.id, new.title)
+        if old is not None:
+            if new is None:
+                _remove_key(self._order, (old.created_at, old.id))
+                self._task_count -= 1
+            _remove_key(self._updated_order, (old.updated_at, old.id))
+            if old.completed:
+                self._completed_ids.discard(old.id)
+                self._completed_count -= 1
+            else:
+                self._pending_ids.discard(old.id)
+        if new is not None:
+            if old is None:
+                insort(self._order, (new.created_at, new.id))
+                self._task_count += 1
+            insort(self._updated_order, (new.updated_at, new.id))
+            if new.completed:
+                self._completed_ids.add(new.id)
+                self._completed_count += 1
+            else:
+                self._pending_ids.add(new.id)
+
+    # Journal hooks: each write calls one while holding its lock, once the
+    # change is applied, and passes the returned ticket to _sync after
+    # releasing it. DurableMemoryStorage logs through them.
+
+    def _journal_put(
+        self, tasks: list[TaskRecord], entries: list[ActivityEntry]
+    ) -> Optional[int]:
+        return None
+
+    def _journal_delete(self, task_id: str, entry: ActivityEntry) -> Optional[int]:
+        return None
+
+    def _sync(self, ticket: Optional[int]) -> None:
+        """Wait until the write that returned `ticket` is durable."""
+
+    def _replace(self, old: TaskRecord, new: TaskRecord) -> None:
+        with self._shared_lock:
+            self._update_indexes(old, new)
+        self.tasks[new.id] = new
+
+    def _publish(
+        self, task_ids: list[str], logs: list[ActivityEntry], deleted: bool = False
+    ) -> None:
+        """Bump the global revision for a finished mutation of `task_ids`.
+
+        Called only once the change is visible, so a reader that sees a
+        revision also sees every change that revision covers. The mutation's
+        activity `logs` become its change events.
+        """
+        with self._revision_lock:
+            self._revision += 1
+            for task_id in task_ids:
+                if deleted:
+                    self._task_revisions.pop(task_id, None)
+                else:
+                    self._task_revisions[task_id] = self._revision
+            self._events.extend((self._revision, log) for log in logs)
+            # Trim in batches so appends stay amortized O(1)
+            if len(self._events) > 2 * EVENT_HISTORY:
+                dropped = self._events[len(self._events) - EVENT_HISTORY - 1][0]
+                del self._events[: bisect_right(self._events, dropped, key=_event_revision)]
+                self._events_floor = dropped
+
+    def revision(self) -> int:
+        return self._revision
+
+    def task_revision(self, task_id: str) -> Optional[int]:
+        return self._task_revisions.get(task_id)
+
+    def events_since(self, revision: int, limit: int) -> Optional[list[TaskEvent]]:
+        with self._revision_lock:
+            if not self._events_floor <= revision <= self._revision:
+                return None
+            events = self._events
+            start = bisect_right(events, revision, key=_event_revision)
+            end = start + limit
+            if end < len(events):
+                # A page never splits a revision, so resuming after it is exact
+                end = bisect_right(events, events[end - 1][0], key=_event_revision)
+            page = events[start:end]
+        return [
+            TaskEvent(
+                revision=event_revision,
+                action=log.action,
+                task_id=log.task_id,
+                timestamp=from_micros(log.timestamp),
+                old_value=log.old_value,
+                new_value=log.new_value,
+                task=record.to_task() if (record := self.tasks.get(log.task_id)) else None,
+            )
+            for event_revision, log in page
+        ]
+
+    def _add_activity_log(
+        self,
+        task_id: str,
+        action: str,
+        old_value: Optional[str] = None,
+        new_value: Optional[str] = None,
+    ) -> ActivityEntry:
+        """Append an entry to the task's log, dropping what retention no longer allows.
+
+        Caller holds the task's lock, or the task is not yet visible.
+        """
+        log_id = uuid4().int
+        with self._activity_lock:
+            # Stamped under the lock so timestamps never go back along seq
+            self._activity_seq += 1
+            entry = ActivityEntry(
+                self._activity_seq,
+                log_id,
+                task_id,
+                sys.intern(action),
+                to_micros(datetime.utcnow()),
+                old_value,
+                new_value,
+            )
+            self._activity.append(entry)
+            cutoff = self._age_cutoff()
+            if cutoff is not None and self._activity[0].timestamp < cutoff:
+                expired = bisect_left(self._activity, cutoff, key=_entry_timestamp)
+                # Drop expired entries in chunks so the shift is amortized
+                if expired >= _SCAN_CHUNK:
+                    del self._activity[:expired]
+        logs = self.activity_logs.setdefault(task_id, [])
+        logs.append(entry)
+        dropped = 0
+        max_per_task = self.retention.max_per_task
+        if max_per_task is not None and len(logs) > max_per_task:
+            dropped = len(logs) - max_per_task
+            del logs[:dropped]
+        expired = self._expired_count(logs)
+        if expired:
+            del logs[:expired]
+        if dropped + expired:
+            self._forget(dropped + expired)
+        return entry
+
+    def _age_cutoff(self) -> Optional[int]:
+        """Entries stamped before this (in epoch microseconds) have expired."""
+        if self.retention.max_age is None:
+            return None
+        return to_micros(datetime.utcnow() - self.retention.max_age)
+
+    def _expired_count(self, logs: list[ActivityEntry]) -> int:
+        """How many of the oldest `logs` are past retention.max_age."""
+        cutoff = self._age_cutoff()
+        if cutoff is None or not logs or logs[0].timestamp >= cutoff:
+            return 0
+        return bisect_left(logs, cutoff, key=_entry_timestamp)
+
+    def _forget(self, count: int) -> None:
+        """Note `count` entries dropped from task logs; compact _activity once half are."""
+        with self._activity_lock:
+            self._forgotten += count
+            if self._forgotten * 2 > len(self._activity):
+                self._activity = [entry for entry in self._activity if self._retained(entry)]
+                self._forgotten = 0
+
+    def _retained(self, entry: ActivityEntry) -> bool:
+        """Whether retention still keeps `entry` in its task's (or archived) log."""
+        logs = self.activity_logs.get(entry.task_id)
+        if logs is None:
+            logs = self.deleted_activity_logs.get(entry.task_id)
+        # Entries are dropped oldest first, so the log's head tells
+        head = logs[:1] if logs is not None else []
+        return bool(head) and head[0].seq <= entry.seq
+
+    def _current_logs(self, logs: list[ActivityEntry]) -> list[ActivityLog]:
+        # Entries of idle tasks only expire here, when they are next read
+        return [entry.to_log() for entry in logs[self._expired_count(logs) :]]
+
+    def _archive(self, task_id: str, logs: list[ActivityEntry]) -> None:
+        """Keep a deleted task's log, dropping the oldest archives past the cap."""
+        max_archived = self.retention.max_archived
+        evicted = 0
+        with self._shared_lock:
+            self.deleted_activity_logs[task_id] = logs
+            self._archived_count += len(logs)
+            while max_archived is not None and self._archived_count > max_archived:
+                oldest = next(iter(self.deleted_activity_logs))
+                dropped = len(self.deleted_activity_logs.pop(oldest))
+                self._archived_count -= dropped
+                evicted += dropped
+        if evicted:
+            self._forget(evicted)
+
+    def _page_activity(
+        self,
+        entries: Callable[[], list[ActivityEntry]],
+        query: ActivityQuery,
+        limit: Optional[int],
+        after: Optional[ActivitySeq],
+        retained_only: bool,
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]:
+        """Page through a seq-ordered entry list, bisecting to the query's time range.
+
+        `entries` is called for each chunk, since the list may be trimmed or
+        replaced meanwhile; scanning resumes from the last seq seen.
+        """
+        bounds = [to_micros(query.since)] if query.since is not None else []
+        cutoff = self._age_cutoff()
+        if cutoff is not None:
+            bounds.append(cutoff)
+        lowest = max(bounds, default=None)
+        until = to_micros(query.until) if query.until is not None else None
+        wanted = None if limit is None else limit + 1
+        step = _SCAN_CHUNK if wanted is None else max(wanted, _SCAN_CHUNK)
+        found: list[ActivityEntry] = []
+        while wanted is None or len(found) < wanted:
+            current = entries()
+            start = bisect_right(current, after, key=_entry_seq) if after is not None else 0
+            if lowest is not None:
+                start = max(start, bisect_left(current, lowest, key=_entry_timestamp))
+            chunk = current[start : start + step]
+            if not chunk:
+                break
+            for entry in chunk:
+                if until is not None and entry.timestamp >= until:
+                    break
+                if query.action is not None and entry.action != query.action:
+                    continue
+                if retained_only and not self._retained(entry):
+                    continue
+                found.append(entry)
+                if wanted is not None and len(found) == wanted:
+                    break
+            else:
+                after = chunk[-1].seq
+                continue
+            break
+        if limit is not None and len(found) > limit:
+            return [entry.to_log() for entry in found[:limit]], found[limit - 1].seq
+        return [entry.to_log() for entry in found], None
+
+    def get_all_tasks(self) -> list[TaskRecord]:
+        return list(self.tasks.values())
+
+    def query_tasks(
+        self,
+        query: TaskQuery,
+        limit: Optional[int] = None,
+        after: Optional[OrderKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[OrderKey]]:
+        """Answer `query` from whichever index yields the fewest candidates.
+
+        Walking the index of the sort field streams results in order and stops
+        after `limit`; the other sources (the other timestamp index, or a
+        status id set) are only used when they are smaller, in which case
+        their candidates are filtered and sorted.
+        """
+        sort_index, lo, hi = self._index_range(query.sort_field, query)
+        if after is not None:
+            if query.descending:
+                hi = min(hi, bisect_left(sort_index, after))
+            else:
+                lo = max(lo, bisect_right(sort_index, after))
+
+        candidate_ids: Optional[list[str]] = None
+        best = hi - lo
+        other_field = "updated_at" if query.sort_field == "created_at" else "created_at"
+        other_index, other_lo, other_hi = self._index_range(other_field, query)
+        if other_hi - other_lo < best:
+            best = other_hi - other_lo
+            candidate_ids = [task_id for _, task_id in other_index[other_lo:other_hi]]
+        if query.completed is not None:
+            status_ids = self._completed_ids if query.completed else self._pending_ids
+            if len(status_ids) < best:
+                candidate_ids = list(status_ids)
+
+        if candidate_ids is None:
+            records = self._scan(sort_index, lo, hi, query, limit)
+        else:
+            records = self._filter_and_sort(candidate_ids, query, after)
+
+        if limit is not None and len(records) > limit:
+            return records[:limit], query.key(records[limit - 1])
+        return records, None
+
+    def _index_range(self, field: str, query: TaskQuery) -> tuple[list[OrderKey], int, int]:
+        """Sorted index for `field` and the [lo, hi) slice its range filters allow."""
+        if field == "created_at":
+            index = self._order
+            lo = (
+                bisect_right(index, (query.created_after, _MAX_ID))
+                if query.created_after is not None
+                else 0
+            )
+            hi = (
+                bisect_left(index, (query.created_before,))
+                if query.created_before is not None
+                else len(index)
+            )
+        else:
+            index = self._updated_order
+            lo = (
+                bisect_left(index, (query.updated_since,))
+                if query.updated_since is not None
+                else 0
+            )
+            hi = len(index)
+        return index, lo, max(lo, hi)
+
+    def _scan(
+        self,
+        index: list[OrderKey],
+        lo: int,
+        hi: int,
+        query: TaskQuery,
+        limit: Optional[int],
+    ) -> list[TaskRecord]:
+        """Walk index[lo:hi] in query order, collecting up to limit + 1 matches."""
+        wanted = None if limit is None else limit + 1
+        found: list[TaskRecord] = []
+        step = _SCAN_CHUNK if wanted is None else max(wanted, _SCAN_CHUNK)
+        position = hi if query.descending else lo
+        while lo < position if query.descending else position < hi:
+            if query.descending:
+                start = max(lo, position - step)
+                keys = reversed(index[start:position])
+                position = start
+            else:
+                end = min(hi, position + step)
+                keys = index[position:end]
+                position = end
+            for value, task_id in keys:
+                task = self.tasks.get(task_id)
+                # Skip keys that went stale under a concurrent write
+                if task is None or getattr(task, query.sort_field) != value:
+                    continue
+                if query.matches(task):
+                    found.append(task)
+                    if wanted is not None and len(found) == wanted:
+                        return found
+        return found
+
+    def _filter_and_sort(
+        self,
+        task_ids: list[str],
+        query: TaskQuery,
+        after: Optional[OrderKey],
+    ) -> list[TaskRecord]:
+        tasks = [
+            task
+            for task_id in task_ids
+            if (task := self.tasks.get(task_id)) is not None and query.matches(task)
+        ]
+        if after is not None:
+            if query.descending:
+                tasks = [task for task in tasks if query.key(task) < after]
+            else:
+                tasks = [task for task in tasks if query.key(task) > after]
+        tasks.sort(key=query.key, reverse=query.descending)
+        return tasks
+
+    def search_tasks(
+        self,
+        text: str,
+        limit: int,
+        after: Optional[RankKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[RankKey]]:
+        ranked = top_ranked(self._search.search(text), limit + 1, after)
+        tasks = [
+            task for _, task_id in ranked[:limit] if (task := self.tasks.get(task_id)) is not None
+        ]
+        next_key = ranked[limit - 1] if len(ranked) > limit else None
+        return tasks, next_key
+
+    def get_task(self, task_id: str) -> Optional[Task]:
+        record = self.tasks.get(task_id)
+        return record.to_task() if record is not None else None
+
+    def create_task(self, title: str) -> Task:
+        return self.create_tasks([title])[0]
+
+    def create_tasks(self, titles: list[str]) -> list[Task]:
+        created, ticket = self._create(titles)
+        self._sync(ticket)
+        return created
+
+    def _create(self, titles: list[str]) -> tuple[list[Task], Optional[int]]:
+        with self._create_lock:
+            now = datetime.utcnow()
+            created = []
+            logs = []
+            for title in titles:
+                task_id = str(uuid4())
+                task = TaskRecord(task_id, title, False, now, now)
+                logs.append(self._add_activity_log(task_id, "created"))
+                created.append(task)
+            with self._shared_lock:
+                for task in created:
+                    self._update_indexes(None, task)
+            self.tasks.update((task.id, task) for task in created)
+            self._publish([task.id for task in created], logs)
+            ticket = self._journal_put(created, logs)
+        return [task.to_task() for task in created], ticket
+
+    def complete_task(self, task_id: str) -> Optional[Task]:
+        task, ticket = self._complete(task_id)
+        self._sync(ticket)
+        return task
+
+    def _complete(self, task_id: str) -> tuple[Optional[Task], Optional[int]]:
+        with self._lock_for(task_id):
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None, None
+            old_status = "completed" if task.completed else "pending"
+            updated_task = task._replace(completed=True, updated_at=datetime.utcnow())
+            self._replace(task, updated_task)
+            log = self._add_activity_log(
+                task_id, "completed", old_value=old_status, new_value="completed"
+            )
+            self._publish([task_id], [log])
+            ticket = self._journal_put([updated_task], [log])
+        return updated_task.to_task(), ticket
+
+    def update_task(
+        self,
+        task_id: str,
+        title: Optional[str] = None,
+        completed: Optional[bool] = None,
+    ) -> Optional[Task]:
+        task, ticket = self._update(task_id, title, completed)
+        self._sync(ticket)
+        return task
+
+    def _update(
+        self, task_id: str, title: Optional[str], completed: Optional[bool]
+    ) -> tuple[Optional[Task], Optional[int]]:
+        with self._lock_for(task_id):
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None, None
+            if (title is None or title == task.title) and (
+                completed is None or completed == task.completed
+            ):
+                # Nothing changes, not even updated_at, so the revision stays
+                return task.to_task(), None
+
+            updates = {"updated_at": datetime.utcnow()}
+            logs = []
+
+            if title is not None and title != task.title:
+                old_title = task.title
+                updates["title"] = title
+                logs.append(
+                    self._add_activity_log(task_id, "updated", old_value=old_title, new_value=title)
+                )
+
+            if completed is not None and completed != task.completed:
+                old_status = "completed" if task.completed else "pending"
+                new_status = "completed" if completed else "pending"
+                updates["completed"] = completed
+                logs.append(
+                    self._add_activity_log(
+                        task_id, "status_changed", old_value=old_status, new_value=new_status
+                    )
+                )
+
+            updated_task = task._replace(**updates)
+            self._replace(task, updated_task)
+            self._publish([task_id], logs)
+            ticket = self._journal_put([updated_task], logs)
+            return updated_task.to_task(), ticket
+
+    def delete_task(self, task_id: str) -> bool:
+        deleted, ticket = self._delete(task_id)
+        self._sync(ticket)
+        return deleted
+
+    def _delete(self, task_id: str) -> tuple[bool, Optional[int]]:
+        with self._lock_for(task_id):
+            if task_id not in self.tasks:
+                return False, None
+            log = self._add_activity_log(task_id, "deleted")
+            # Archive activity logs before deleting
+            if task_id in self.activity_logs:
+                self._archive(task_id, self.activity_logs.pop(task_id))
+            task = self.tasks.pop(task_id)
+            with self._shared_lock:
+                self._update_indexes(task, None)
+            self._publish([task_id], [log], deleted=True)
+            return True, self._journal_delete(task_id, log)
+
+    def update_tasks(
+        self, updates: list[tuple[str, Optional[str], Optional[bool]]]
+    ) -> list[Optional[Task]]:
+        results = [
+            self._update(task_id, title, completed) for task_id, title, completed in updates
+        ]
+        self._sync(_last_ticket(results))
+        return [task for task, _ in results]
+
+    def delete_tasks(self, task_ids: list[str]) -> list[bool]:
+        results = [self._delete(task_id) for task_id in task_ids]
+        self._sync(_last_ticket(results))
+        return [deleted for deleted, _ in results]
+
+    def get_task_activity(self, task_id: str) -> Optional[list[ActivityLog]]:
+        if task_id not in self.tasks:
+            return None
+        return self._current_logs(self.activity_logs.get(task_id, []))
+
+    def query_task_activity(
+        self,
+        task_id: str,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> Optional[tuple[list[ActivityLog], Optional[ActivitySeq]]]:
+        if task_id not in self.tasks:
+            return None
+        logs = self.activity_logs.get(task_id, [])
+        return self._page_activity(lambda: logs, query, limit, after, retained_only=False)
+
+    def query_activity(
+        self,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]:
+        return self._page_activity(
+            lambda: self._activity, query, limit, after, retained_only=True
+        )
+
+    def iter_activity(self, archived: bool, batch_size: int) -> Iterator[list[ActivityLog]]:
+        if archived:
+            # Archived logs have no index to resume from, so snapshot their ids
+            task_ids = list(self.deleted_activity_logs)
+            for start in range(0, len(task_ids), batch_size):
+                logs = [
+                    log
+                    for task_id in task_ids[start : start + batch_size]
+                    for log in self._current_logs(self.deleted_activity_logs.get(task_id, []))
+                ]
+                if logs:
+                    yield logs
+            return
+        after = None
+        while True:
+            tasks, after = self.query_tasks(TaskQuery(), batch_size, after)
+            logs = [
+                log
+                for task in tasks
+                for log in self._current_logs(self.activity_logs.get(task.id, []))
+            ]
+            if logs:
+                yield logs
+            if after is None:
+                return
+
+    def get_stats(self) -> TaskStats:
+        with self._shared_lock:
+            total = self._task_count
+            completed = self._completed_count
+        return self._stats(total, completed)
+
+    def _stats(self, total: int, completed: int) -> TaskStats:
+        """Stats from counters read together under _shared_lock."""
+        if self.check_consistency:
+            recounted = (len(self.tasks), self._recount_completed())
+            if (total, completed) != recounted or completed != len(self._completed_ids):
+                raise ConsistencyError(
+                    f"task counters drifted: counters={(total, completed)}, "
+                    f"recount={recounted}, index={len(self._completed_ids)}"
+                )
+        pending = total - completed
+        return TaskStats(total=total, completed=completed, pending=pending)
+
+    def _recount_completed(self) -> int:
+        """Full scan used to validate the incremental counter."""
+        return sum(1 for task in self.tasks.values() if task.completed)
+
+    def clear(self) -> None:
+        """Clear all data - useful for testing."""
+        self.tasks.clear()
+        self.activity_logs.clear()
+        with self._shared_lock:
+            self.deleted_activity_logs.clear()
+            self._archived_count = 0
+        with self._activity_lock:
+            self._activity = []
+            self._forgotten = 0
+        with self._shared_lock:
+            self._order.clear()
+            self._updated_order.clear()
+            self._completed_ids.clear()
+            self._pending_ids.clear()
+            self._search.clear()
+            self._task_count = 0
+            self._completed_count = 0
+        # Revisions keep counting so ETags issued before the clear never match,
+        # and clients following events from before it are told to resync
+        with self._revision_lock:
+            self._revision += 1
+            self._task_revisions.clear()
+            self._events.clear()
+            self._events_floor = self._revision
+
+    def sizes(self) -> dict[str, int]:
+        return {
+            "tasks": len(self.tasks),
+            "activity_logs": len(self.activity_logs),
+            "deleted_activity_logs": len(self.deleted_activity_logs),
+        }
+
+    def close(self) -> None:
+        """Nothing to release for the in-memory backend."""
+
+
+class AsyncMemoryStorage:
+    """AsyncStorage over an InMemoryStorage.
+
+    Nothing here waits on I/O, so lock-free reads bounded by a page run
+    inline on the event loop: a thread hop would cost more than the call.
+    Unbounded ones (every task, every matching task or log, a search) run on
+    a worker thread so a large result never stalls other requests. So do
+    writes, since their locks can be held for long stretches by a search or
+    a snapshot, and blocking on one inline would freeze every request; they
+    then await `_settle`, which subclasses with a journal use to wait for
+    durability without holding a thread. Stats read their counters inline
+    when the lock over them is free, and on a thread when it is not.
+    """
+
+    def __init__(self, storage: InMemoryStorage):
+        self.sync = storage
+        self.epoch = storage.epoch
+
+    async def _offload(self, call: Callable[..., _T], *args) -> _T:
+        return await asyncio.to_thread(queued("storage", call, *args))
+
+    async def _ready(self) -> None:
+        """Wait until the storage can answer queries and take writes."""
+
+    async def _settle(self, ticket: Optional[int]) -> None:
+        """Wait until the write that returned `ticket` is durable."""
+
+    def _update_all(
+        self, updates: list[tuple[str, Optional[str], Optional[bool]]]
+    ) -> list[tuple[Optional[Task], Optional[int]]]:
+        return [
+            self.sync._update(task_id, title, completed) for task_id, title, completed in updates
+        ]
+
+    def _delete_all(self, task_ids: list[str]) -> list[tuple[bool, Optional[int]]]:
+        return [self.sync._delete(task_id) for task_id in task_ids]
+
+    async def revision(self) -> int:
+        return self.sync.revision()
+
+    async def task_revision(self, task_id: str) -> Optional[int]:
+        return self.sync.task_revision(task_id)
+
+    async def events_since(self, revision: int, limit: int) -> Optional[list[TaskEvent]]:
+        return self.sync.events_since(revision, limit)
+
+    async def get_all_tasks(self) -> list[TaskRecord]:
+        return await self._offload(self.sync.get_all_tasks)
+
+    async def query_tasks(
+        self,
+        query: TaskQuery,
+        limit: Optional[int] = None,
+        after: Optional[OrderKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[OrderKey]]:
+        await self._ready()
+        if limit is None:
+            return await self._offload(self.sync.query_tasks, query, limit, after)
+        return self.sync.query_tasks(query, limit, after)
+
+    async def search_tasks(
+        self,
+        text: str,
+        limit: int,
+        after: Optional[RankKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[RankKey]]:
+        await self._ready()
+        return await self._offload(self.sync.search_tasks, text, limit, after)
+
+    async def get_task(self, task_id: str) -> Optional[Task]:
+        return self.sync.get_task(task_id)
+
+    async def create_task(self, title: str) -> Task:
+        return (await self.create_tasks([title]))[0]
+
+    async def create_tasks(self, titles: list[str]) -> list[Task]:
+        await self._ready()
+        created, ticket = await self._offload(self.sync._create, titles)
+        await self._settle(ticket)
+        return created
+
+    async def complete_task(self, task_id: str) -> Optional[Task]:
+        await self._ready()
+        task, ticket = await self._offload(self.sync._complete, task_id)
+        await self._settle(ticket)
+        return task
+
+    async def update_task(
+        self,
+        task_id: str,
+        title: Optional[str] = None,
+        completed: Optional[bool] = None,
+    ) -> Optional[Task]:
+        return (await self.update_tasks([(task_id, title, completed)]))[0]
+
+    async def update_tasks(
+        self, updates: list[tuple[str, Optional[str], Optional[bool]]]
+    ) -> list[Optional[Task]]:
+        await self._ready()
+        results = await self._offload(self._update_all, updates)
+        await self._settle(_last_ticket(results))
+        return [task for task, _ in results]
+
+    async def delete_task(self, task_id: str) -> bool:
+        return (await self.delete_tasks([task_id]))[0]
+
+    async def delete_tasks(self, task_ids: list[str]) -> list[bool]:
+        await self._ready()
+        results = await self._offload(self._delete_all, task_ids)
+        await self._settle(_last_ticket(results))
+        return [deleted for deleted, _ in results]
+
+    async def get_task_activity(self, task_id: str) -> Optional[list[ActivityLog]]:
+        return self.sync.get_task_activity(task_id)
+
+    async def query_task_activity(
+        self,
+        task_id: str,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> Optional[tuple[list[ActivityLog], Optional[ActivitySeq]]]:
+        return self.sync.query_task_activity(task_id, query, limit, after)
+
+    async def query_activity(
+        self,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]:
+        if limit is None:
+            return await self._offload(self.sync.query_activity, query, limit, after)
+        return self.sync.query_activity(query, limit, after)
+
+    async def get_stats(self) -> TaskStats:
+        await self._ready()
+        lock = self.sync._shared_lock
+        if not lock.acquire(blocking=False):
+            return await self._offload(self.sync.get_stats)
+        try:
+            total, completed = self.sync._task_count, self.sync._completed_count
+        finally:
+            lock.release()
+        return self.sync._stats(total, completed)
@@ -0,0 +1,168 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Iterable, Optional
+
+_TOKEN = re.compile(r"\w+")
+
+# Query terms shorter than this only match whole tokens; expanding a single
+# character to every token it prefixes would touch most of the index.
+MIN_PREFIX_LENGTH = 2
+
+# A prefix match counts for less than matching the whole token
+PREFIX_WEIGHT = 0.5
+# Most tokens one prefix expands to, taken in vocabulary order; a short prefix
+# would otherwise reach most of a large index
+MAX_PREFIX_MATCHES = 64
+
+# Ranking key for search results: (score, id), higher scores first
+RankKey = tuple[float, str]
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into case-folded word tokens."""
+    return _TOKEN.findall(text.casefold())
+
+
+def top_ranked(scores: dict[str, float], limit: int, after: Optional[RankKey] = None) -> list[RankKey]:
+    """Best `limit` (score, id) pairs ranked after `after`: score descending, then id."""
+    ranked = ((score, task_id) for task_id, score in scores.items())
+    if after is not None:
+        after_score, after_id = after
+        ranked = (
+            (score, task_id)
+            for score, task_id in ranked
+            if score < after_score or (score == after_score and task_id > after_id)
+        )
+    return heapq.nsmallest(limit, ranked, key=lambda key: (-key[0], key[1]))
+
+
+class SearchIndex:
+    """Inverted index over task titles with prefix matching.
+
+    Postings map each token to the ids of the tasks whose title contains it.
+    A sorted vocabulary makes every token with a given prefix a contiguous
+    bisect range. Results are ranked by the summed inverse document frequency
+    of the matched tokens, so rare words weigh more than common ones.
+    """
+
+    def __init__(self):
+        self._postings: dict[str, set[str]] = {}
+        self._vocabulary: list[str] = []
+        self._documents = 0
+        self._lock = threading.Lock()
+
+    def add(self, task_id: str, title: str) -> None:
+        with self._lock:
+            self._documents += 1
+            for token in set(tokenize(title)):
+                ids = self._postings.get(token)
+                if ids is None:
+                    ids = self._postings[token] = set()
+                    insort(self._vocabulary, token)
+                ids.add(task_id)
+
+    def add_many(self, documents: Iterable[tuple[str, str]]) -> None:
+        """Add (task_id, title) pairs, sorting the vocabulary once at the end.
+
+        Inserting new tokens one at a time shifts the vocabulary list on each,
+        which is quadratic when loading a whole store.
+        """
+        with self._lock:
+            postings = self._postings
+            for task_id, title in documents:
+                self._documents += 1
+                for token in set(tokenize(title)):
+                    ids = postings.get(token)
+                    if ids is None:
+                        ids = postings[token] = set()
+                    ids.add(task_id)
+            self._vocabulary = sorted(postings)
+
+    def remove(self, task_id: str, title: str) -> None:
+        with self._lock:
+            self._documents -= 1
+            for token in set(tokenize(title)):
+                ids = self._postings.get(token)
+                if ids is None:
+                    continue
+                ids.discard(task_id)
+                if not ids:
+                    del self._postings[token]
+                    del self._vocabulary[bisect_left(self._vocabulary, token)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._vocabulary.clear()
+            self._documents = 0
+
+    def search(self, text: str) -> dict[str, float]:
+        """Score every task whose title matches all terms of `text`.
+
+        Each term matches a whole token or, if long enough, any of the first
+        MAX_PREFIX_MATCHES tokens it is a prefix of. Terms are applied rarest
+        first, and later terms only probe the ids that are still candidates.
+        Only copying out the rarest term's postings holds the lock; writers
+        wait for that, not for narrowing and ranking.
+        """
+        terms = set(tokenize(text))
+        if not terms:
+            return {}
+        with self._lock:
+            expansions = sorted(
+                (self._expand(term) for term in terms),
+                key=lambda matches: sum(len(ids) for ids, _ in matches),
+            )
+            # The rarest term's sets are iterated, so they are copied while no
+            # writer can resize them; a set copy reuses the stored hashes. The
+            # other terms' sets are only probed, one atomic lookup at a time.
+            first = [(ids.copy(), weight) for ids, weight in expansions[0]]
+
+        # Lightest first, so a task in several sets keeps its best weight
+        scores: dict[str, float] = {}
+        for ids, weight in sorted(first, key=lambda match: match[1]):
+            scores.update(dict.fromkeys(ids, weight))
+
+        for matches in expansions[1:]:
+            narrowed: dict[str, float] = {}
+            for task_id, score in scores.items():
+                best = 0.0
+                for ids, weight in matches:
+                    if weight > best and task_id in ids:
+                        best = weight
+                if best:
+                    narrowed[task_id] = score + best
+            scores = narrowed
+            if not scores:
+                break
+        return scores
+
+    def _expand(self, term: str) -> list[tuple[set[str], float]]:
+        """Posting sets matching `term`, each with the weight a match is worth.
+
+        Tokens sharing a prefix are a contiguous run of the vocabulary, so a
+        bisect finds the run and at most MAX_PREFIX_MATCHES of it are read.
+        """
+        matches = []
+        exact = self._postings.get(term)
+        if exact:
+            matches.append((exact, self._idf(len(exact))))
+        if len(term) >= MIN_PREFIX_LENGTH:
+            vocabulary = self._vocabulary
+            start = bisect_left(vocabulary, term)
+            # One more than the cap, since the run may begin with `term` itself
+            end = min(len(vocabulary), start + MAX_PREFIX_MATCHES + 1)
+            for position in range(start, end):
+                token = vocabulary[position]
+                if not token.startswith(term):
+                    break
+                if token != term:
+                    ids = self._postings[token]
+                    matches.append((ids, PREFIX_WEIGHT * self._idf(len(ids))))
+        return matches
+
+    def _idf(self, document_frequency: int) -> float:
+        return math.log(1 + self._documents / document_frequency)
@@ -0,0 +1,118 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.storage.base import Storage
+
+# Characters kept from an owner's name when naming their shard's files
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def shard_name(owner: str) -> str:
+    """File-system-safe name for `owner`'s shard: readable, and distinct per owner."""
+    digest = hashlib.sha256(owner.encode("utf-8")).hexdigest()[:12]
+    return f"{_UNSAFE.sub('_', owner)[:40]}-{digest}"
+
+
+class ShardedStorage:
+    """Tasks partitioned by owner, each owner's in a Storage of their own.
+
+    A shard is built by `factory(owner)` the first time its owner makes a
+    request. Shards share nothing: each has its own locks, indexes, counters
+    and revisions, so one owner's load or data never reaches another's.
+
+    Requests lease their shard with acquire() and release(). With
+    `max_idle`, building a shard closes the least recently used shards
+    nobody holds a lease on, past `max_idle` of them, and the next request
+    for one builds it again; only set it for backends that persist.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Storage],
+        shards: Optional[dict[str, Storage]] = None,
+        max_idle: Optional[int] = None,
+    ):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._shards: dict[str, Storage] = dict(shards or {})
+        # Leases held per owner; owners holding none, least recently used first
+        self._leases: dict[str, int] = {}
+        self._idle: OrderedDict[str, None] = OrderedDict.fromkeys(self._shards)
+        # Taken to build or close a shard, so one is never open twice at once
+        self._lock = threading.Lock()
+        # Taken for lease bookkeeping only, which never blocks on I/O
+        self._leases_lock = threading.Lock()
+
+    def get(self, owner: str) -> Optional[Storage]:
+        """`owner`'s shard if it is built already; never builds one."""
+        return self._shards.get(owner)
+
+    def shard(self, owner: str) -> Storage:
+        """`owner`'s shard, building it if need be, without a lease."""
+        return self._shards.get(owner) or self._open(owner, lease=False)
+
+    def try_acquire(self, owner: str) -> Optional[Storage]:
+        """Lease `owner`'s shard if it is built already; never blocks on I/O."""
+        with self._leases_lock:
+            shard = self._shards.get(owner)
+            if shard is not None:
+                self._lease(owner)
+            return shard
+
+    def acquire(self, owner: str) -> Storage:
+        """Lease `owner`'s shard, building it if need be; it stays open until released."""
+        return self.try_acquire(owner) or self._open(owner, lease=True)
+
+    def release(self, owner: str) -> None:
+        with self._leases_lock:
+            leases = self._leases.pop(owner, 1) - 1
+            if leases:
+                self._leases[owner] = leases
+            elif owner in self._shards:
+                self._idle[owner] = None
+
+    def _lease(self, owner: str) -> None:
+        self._leases[owner] = self._leases.get(owner, 0) + 1
+        self._idle.pop(owner, None)
+
+    def _open(self, owner: str, lease: bool) -> Storage:
+        with self._lock:
+            shard = self._shards.get(owner)
+            if shard is None:
+                shard = self.factory(owner)
+            with self._leases_lock:
+                self._shards[owner] = shard
+                if lease:
+                    self._lease(owner)
+                elif owner not in self._leases:
+                    self._idle[owner] = None
+            self._close_idle()
+        return shard
+
+    def _close_idle(self) -> None:
+        # Called with self._lock held, so an owner closed here is not rebuilt
+        # until its files are closed
+        if self.max_idle is None:
+            return
+        while True:
+            with self._leases_lock:
+                if len(self._idle) <= self.max_idle:
+                    return
+                owner, _ = self._idle.popitem(last=False)
+                shard = self._shards.pop(owner)
+            shard.close()
+
+    def owners(self) -> list[str]:
+        return list(self._shards)
+
+    def close(self) -> None:
+        with self._lock:
+            for shard in self._shards.values():
+                shard.close()
+            with self._leases_lock:
+                self._shards.clear()
+                self._leases.clear()
+                self._idle.clear()
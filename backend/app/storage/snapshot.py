@@ -0,0 +1,464 @@
+import marshal
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+from app.storage.base import TaskRecord, from_micros
+from app.storage.memory import ActivityEntry
+from app.storage.wal import CorruptLogError, _sync_directory
+
+# Columnar snapshot layout. After the header come fixed-width columns with
+# one slot per task, in (created_at, id) order, then variable-length heaps:
+#
+#   ids          36-byte ASCII uuid per task
+#   flags        1 byte per task: completed
+#   created      int64 epoch microseconds per task
+#   updated      int64 epoch microseconds per task
+#   title_index  uint64 offset into titles per task, plus the end offset
+#   titles       UTF-8 titles back to back
+#   log_index    uint64 offset into logs per task, plus the end offset
+#   logs         per task, a marshal-encoded list of its activity entries
+#                (without the task_id); empty if it has none
+#   by_id        uint32 row numbers in id order, for lookups by id
+#   archived     marshal-encoded list of archived entries, in archive order
+#
+# Sections start on 8-byte boundaries and the file ends with MAGIC again, so
+# a truncated file is rejected. Nothing is read until a task is asked for.
+MAGIC = b"TASKSNAP"
+# Version 3 added the revision counter to the header; version 2 files, which
+# lack it, are still read
+VERSION = 3
+ID_WIDTH = 36
+SECTIONS = (
+    "ids",
+    "flags",
+    "created",
+    "updated",
+    "title_index",
+    "titles",
+    "log_index",
+    "logs",
+    "by_id",
+    "archived",
+)
+_HEADER = struct.Struct(f"<8sIIQQQQ{2 * len(SECTIONS)}Q")
+_HEADER_V2 = struct.Struct(f"<8sIIQQQ{2 * len(SECTIONS)}Q")
+_VERSION = struct.Struct("<8sI")
+_ALIGNMENT = 8
+
+# Tasks created in one batch share a timestamp; decoding it once also has
+# them share the datetime object, as they did before the restart
+_datetime = lru_cache(maxsize=4096)(from_micros)
+
+# A task as written to a snapshot: (id, completed, created_at, updated_at,
+# title, logs), with timestamps in microseconds and title and logs encoded
+SnapshotRow = tuple[bytes, bool, int, int, bytes, bytes]
+
+
+def is_columnar(path: str) -> bool:
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def encode_logs(entries: Iterable[ActivityEntry]) -> bytes:
+    rows = [(entry[0], entry[1], *entry[3:]) for entry in entries]
+    return marshal.dumps(rows) if rows else b""
+
+
+def write_columnar_snapshot(
+    path: str,
+    rows: list[SnapshotRow],
+    archived: list[ActivityEntry],
+    seq: int,
+    revision: int,
+) -> None:
+    """Write `rows` (sorted by created_at, then id) atomically to `path`."""
+    count = len(rows)
+    title_index = array("Q", [0])
+    log_index = array("Q", [0])
+    for row in rows:
+        title_index.append(title_index[-1] + len(row[4]))
+        log_index.append(log_index[-1] + len(row[5]))
+    by_id = array("I", sorted(range(count), key=lambda position: rows[position][0]))
+    sections = {
+        "ids": b"".join(row[0] for row in rows),
+        "flags": bytes(row[1] for row in rows),
+        "created": array("q", (row[2] for row in rows)).tobytes(),
+        "updated": array("q", (row[3] for row in rows)).tobytes(),
+        "title_index": title_index.tobytes(),
+        "titles": b"".join(row[4] for row in rows),
+        "log_index": log_index.tobytes(),
+        "logs": b"".join(row[5] for row in rows),
+        "by_id": by_id.tobytes(),
+        "archived": marshal.dumps([tuple(entry) for entry in archived]),
+    }
+    completed = sum(1 for row in rows if row[1])
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(bytes(_HEADER.size))
+        table = []
+        for name in SECTIONS:
+            file.write(bytes(-file.tell() % _ALIGNMENT))
+            table += [file.tell(), len(sections[name])]
+            file.write(sections[name])
+        file.write(MAGIC)
+        file.seek(0)
+        file.write(_HEADER.pack(MAGIC, VERSION, 0, count, completed, seq, revision, *table))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    _sync_directory(os.path.dirname(path))
+
+
+class MappedSnapshot:
+    """Read-only view of a columnar snapshot, decoding one task at a time.
+
+    The file is memory-mapped, so opening it costs the same at any size and
+    its pages are shared with the OS page cache rather than copied.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as exc:
+            self._file.close()
+            raise CorruptLogError(f"{path} is empty") from exc
+        if len(self._map) < _HEADER.size + len(MAGIC) or self._map[-len(MAGIC) :] != MAGIC:
+            self.close()
+            raise CorruptLogError(f"{path} is truncated")
+        _, version = _VERSION.unpack_from(self._map)
+        if version == VERSION:
+            _, _, _, self.count, self.completed, self.seq, self.revision, *table = (
+                _HEADER.unpack_from(self._map)
+            )
+        elif version == 2:
+            _, _, _, self.count, self.completed, self.seq, *table = _HEADER_V2.unpack_from(
+                self._map
+            )
+            self.revision = 0
+        else:
+            self.close()
+            raise ValueError(f"{path}: unsupported snapshot format {version}")
+        self._offsets = {name: table[2 * i] for i, name in enumerate(SECTIONS)}
+        self._lengths = {name: table[2 * i + 1] for i, name in enumerate(SECTIONS)}
+        view = memoryview(self._map)
+        self._views = [view]
+        self._flags = self._column(view, "flags", "B")
+        self._created = self._column(view, "created", "q")
+        self._updated = self._column(view, "updated", "q")
+        self._title_index = self._column(view, "title_index", "Q")
+        self._log_index = self._column(view, "log_index", "Q")
+        self._by_id = self._column(view, "by_id", "I")
+        self._ids = self._offsets["ids"]
+        self._titles = self._offsets["titles"]
+        self._logs = self._offsets["logs"]
+
+    def _column(self, view: memoryview, name: str, code: str) -> memoryview:
+        start = self._offsets[name]
+        column = view[start : start + self._lengths[name]].cast(code)
+        self._views.append(column)
+        return column
+
+    def task_id(self, row: int) -> str:
+        start = self._ids + ID_WIDTH * row
+        return self._map[start : start + ID_WIDTH].decode("ascii")
+
+    def find(self, task_id: str) -> Optional[int]:
+        """Row of `task_id`, by binary search over the id-ordered row numbers."""
+        key = task_id.encode("ascii", "replace")
+        if len(key) != ID_WIDTH:
+            return None
+        data, ids, by_id = self._map, self._ids, self._by_id
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = ids + ID_WIDTH * by_id[mid]
+            candidate = data[start : start + ID_WIDTH]
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return by_id[mid]
+        return None
+
+    def completed_at(self, row: int) -> bool:
+        return bool(self._flags[row])
+
+    def created_micros(self, row: int) -> int:
+        return self._created[row]
+
+    def updated_micros(self, row: int) -> int:
+        return self._updated[row]
+
+    def title_bytes(self, row: int) -> bytes:
+        start = self._titles + self._title_index[row]
+        return self._map[start : self._titles + self._title_index[row + 1]]
+
+    def log_bytes(self, row: int) -> bytes:
+        start = self._logs + self._log_index[row]
+        return self._map[start : self._logs + self._log_index[row + 1]]
+
+    def record(self, row: int) -> TaskRecord:
+        return TaskRecord(
+            self.task_id(row),
+            self.title_bytes(row).decode("utf-8"),
+            bool(self._flags[row]),
+            _datetime(self._created[row]),
+            _datetime(self._updated[row]),
+        )
+
+    def logs(self, row: int, task_id: str) -> list[ActivityEntry]:
+        blob = self.log_bytes(row)
+        if not blob:
+            return []
+        return [
+            ActivityEntry(seq, log_id, task_id, sys.intern(action), *rest)
+            for seq, log_id, action, *rest in marshal.loads(blob)
+        ]
+
+    def raw(self, row: int) -> SnapshotRow:
+        """A row as stored, for copying into the next snapshot without decoding it."""
+        start = self._ids + ID_WIDTH * row
+        return (
+            self._map[start : start + ID_WIDTH],
+            bool(self._flags[row]),
+            self._created[row],
+            self._updated[row],
+            self.title_bytes(row),
+            self.log_bytes(row),
+        )
+
+    def archived(self) -> list[ActivityEntry]:
+        start = self._offsets["archived"]
+        blob = self._map[start : start + self._lengths["archived"]]
+        return [
+            ActivityEntry(seq, log_id, task_id, sys.intern(action), *rest)
+            for seq, log_id, task_id, action, *rest in marshal.loads(blob)
+        ]
+
+    def close(self) -> None:
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        if hasattr(self, "_map"):
+            self._map.close()
+        self._file.close()
+
+
+class SnapshotTasks:
+    """The dict of tasks InMemoryStorage uses, over a MappedSnapshot.
+
+    A snapshot task becomes a TaskRecord the first time it is read, and
+    stays materialized. Writes go to in-memory overlays, so the snapshot
+    itself is never modified. Supports the dict operations the storage uses.
+    """
+
+    def __init__(self, snapshot: Optional[MappedSnapshot]):
+        self.snapshot = snapshot
+        # Snapshot tasks read or written since opening
+        self.loaded: dict[str, TaskRecord] = {}
+        # Snapshot tasks deleted since opening
+        self.removed: set[str] = set()
+        # Tasks the snapshot does not hold, in insertion order
+        self.fresh: dict[str, TaskRecord] = {}
+        self._lock = threading.Lock()
+
+    def _row(self, task_id: str) -> Optional[int]:
+        if self.snapshot is None or task_id in self.removed:
+            return None
+        return self.snapshot.find(task_id)
+
+    def _materialize(self, task_id: str, row: int) -> Optional[TaskRecord]:
+        record = self.snapshot.record(row)
+        with self._lock:
+            # A delete may have won the race while the row was decoded
+            if task_id in self.removed:
+                return None
+            return self.loaded.setdefault(task_id, record)
+
+    def get(self, task_id: str, default: Optional[TaskRecord] = None) -> Optional[TaskRecord]:
+        record = self.fresh.get(task_id)
+        if record is None:
+            record = self.loaded.get(task_id)
+        if record is None:
+            row = self._row(task_id)
+            if row is not None:
+                record = self._materialize(task_id, row)
+        return default if record is None else record
+
+    def __getitem__(self, task_id: str) -> TaskRecord:
+        record = self.get(task_id)
+        if record is None:
+            raise KeyError(task_id)
+        return record
+
+    def __contains__(self, task_id: str) -> bool:
+        return (
+            task_id in self.fresh or task_id in self.loaded or self._row(task_id) is not None
+        )
+
+    def __setitem__(self, task_id: str, record: TaskRecord) -> None:
+        in_snapshot = task_id not in self.fresh and self._row(task_id) is not None
+        if task_id in self.loaded or in_snapshot:
+            self.loaded[task_id] = record
+        else:
+            self.fresh[task_id] = record
+
+    def update(self, pairs: Iterable[tuple[str, TaskRecord]]) -> None:
+        for task_id, record in pairs:
+            self[task_id] = record
+
+    def pop(self, task_id: str, *default):
+        if task_id in self.fresh:
+            return self.fresh.pop(task_id)
+        row = self._row(task_id)
+        if row is None:
+            if default:
+                return default[0]
+            raise KeyError(task_id)
+        record = self.get(task_id)
+        with self._lock:
+            self.removed.add(task_id)
+            self.loaded.pop(task_id, None)
+        return record
+
+    def __len__(self) -> int:
+        count = self.snapshot.count if self.snapshot is not None else 0
+        return count - len(self.removed) + len(self.fresh)
+
+    def __iter__(self) -> Iterator[str]:
+        for task_id, _ in self.items():
+            yield task_id
+
+    def items(self) -> Iterator[tuple[str, TaskRecord]]:
+        """Snapshot tasks in (created_at, id) order, then the rest in insertion order."""
+        if self.snapshot is not None:
+            for row in range(self.snapshot.count):
+                task_id = self.snapshot.task_id(row)
+                record = self.loaded.get(task_id)
+                if record is None and task_id not in self.removed:
+                    record = self._materialize(task_id, row)
+                if record is not None:
+                    yield task_id, record
+        yield from list(self.fresh.items())
+
+    def values(self) -> Iterator[TaskRecord]:
+        for _, record in self.items():
+            yield record
+
+    def overlay(self) -> tuple[Optional[MappedSnapshot], dict, set, list[TaskRecord]]:
+        """Copies of (snapshot, loaded, removed, fresh tasks), taken consistently."""
+        with self._lock:
+            return self.snapshot, dict(self.loaded), set(self.removed), list(self.fresh.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self.snapshot = None
+            self.loaded = {}
+            self.removed = set()
+            self.fresh = {}
+
+
+class SnapshotLogs:
+    """The dict of live activity logs InMemoryStorage uses, over a MappedSnapshot.
+
+    A task's log is decoded, and trimmed to `max_per_task`, the first time
+    it is read; the list is then kept so appends and trims apply to it.
+    """
+
+    def __init__(self, snapshot: Optional[MappedSnapshot], max_per_task: Optional[int]):
+        self.snapshot = snapshot
+        self.max_per_task = max_per_task
+        self.loaded: dict[str, list[ActivityEntry]] = {}
+        # Snapshot logs popped (archived) since opening
+        self.removed: set[str] = set()
+        # Logs in `loaded` of tasks the snapshot does not have, so len is O(1)
+        self._fresh = 0
+        self._lock = threading.Lock()
+
+    def _row(self, task_id: str) -> Optional[int]:
+        if self.snapshot is None or task_id in self.removed:
+            return None
+        return self.snapshot.find(task_id)
+
+    def __len__(self) -> int:
+        count = self.snapshot.count - len(self.removed) if self.snapshot is not None else 0
+        return count + self._fresh
+
+    def get(self, task_id: str, default=None):
+        logs = self.loaded.get(task_id)
+        if logs is not None:
+            return logs
+        row = self._row(task_id)
+        if row is None:
+            return default
+        logs = self.snapshot.logs(row, task_id)
+        if self.max_per_task is not None:
+            del logs[: max(0, len(logs) - self.max_per_task)]
+        with self._lock:
+            if task_id in self.removed:
+                return default
+            return self.loaded.setdefault(task_id, logs)
+
+    def setdefault(self, task_id: str, default: list[ActivityEntry]) -> list[ActivityEntry]:
+        logs = self.get(task_id)
+        if logs is not None:
+            return logs
+        with self._lock:
+            if task_id not in self.loaded:
+                self._fresh += 1
+            return self.loaded.setdefault(task_id, default)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self.loaded or self._row(task_id) is not None
+
+    def pop(self, task_id: str, *default):
+        in_snapshot = self._row(task_id) is not None
+        logs = self.get(task_id)
+        with self._lock:
+            if self.loaded.pop(task_id, None) is not None and not in_snapshot:
+                self._fresh -= 1
+            if in_snapshot:
+                self.removed.add(task_id)
+        if logs is None:
+            if default:
+                return default[0]
+            raise KeyError(task_id)
+        return logs
+
+    def items(self) -> Iterator[tuple[str, list[ActivityEntry]]]:
+        """Every task's log, decoding those not read yet (without keeping them)."""
+        if self.snapshot is not None:
+            for row in range(self.snapshot.count):
+                task_id = self.snapshot.task_id(row)
+                if task_id in self.loaded or task_id in self.removed:
+                    continue
+                logs = self.snapshot.logs(row, task_id)
+                if self.max_per_task is not None:
+                    del logs[: max(0, len(logs) - self.max_per_task)]
+                yield task_id, logs
+        yield from list(self.loaded.items())
+
+    def values(self) -> Iterator[list[ActivityEntry]]:
+        for _, logs in self.items():
+            yield logs
+
+    def overlay(self) -> dict[str, list[ActivityEntry]]:
+        """Copies of the logs decoded or written since opening."""
+        with self._lock:
+            return {task_id: list(logs) for task_id, logs in self.loaded.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self.snapshot = None
+            self.loaded = {}
+            self.removed = set()
+            self._fresh = 0
@@ -0,0 +1,776 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, Optional, TypeVar
+from uuid import uuid4
+
+from app.metrics import queued
+from app.models import ActivityLog, Task, TaskEvent, TaskStats
+from app.storage.base import (
+    ActivityQuery,
+    ActivityRetention,
+    ActivitySeq,
+    ConsistencyError,
+    OrderKey,
+    TaskQuery,
+    TaskRecord,
+    from_micros,
+    to_micros,
+)
+from app.storage.search import MIN_PREFIX_LENGTH, RankKey, tokenize
+from app.storage.timed import TimedStorage
+
+# Threads every storage's async calls run on, however many shards are open;
+# each thread opens its own connection to each storage it serves
+ASYNC_THREADS = 8
+ASYNC_EXECUTOR = ThreadPoolExecutor(max_workers=ASYNC_THREADS, thread_name_prefix="sqlite")
+
+_T = TypeVar("_T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed);
+CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks (updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed_created_at ON tasks (completed, created_at, id);
+
+CREATE TABLE IF NOT EXISTS activity (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    archived INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_activity_task_id ON activity (task_id, seq);
+CREATE INDEX IF NOT EXISTS idx_activity_archived ON activity (archived, seq);
+CREATE INDEX IF NOT EXISTS idx_activity_timestamp ON activity (timestamp);
+
+-- Archived row count, and the highest seq retention has deleted: the change
+-- feed cannot serve revisions below it
+CREATE TABLE IF NOT EXISTS activity_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    archived INTEGER NOT NULL,
+    pruned_through INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO activity_meta (id, archived, pruned_through)
+SELECT 0, (SELECT COUNT(*) FROM activity WHERE archived = 1), 0;
+
+CREATE TABLE IF NOT EXISTS task_counts (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO task_counts (id, total, completed) VALUES (0, 0, 0);
+
+CREATE TABLE IF NOT EXISTS storage_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    epoch TEXT NOT NULL
+);
+INSERT OR IGNORE INTO storage_meta (id, epoch) VALUES (0, lower(hex(randomblob(6))));
+
+-- Full-text index over titles, kept in sync with tasks by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5 (
+    title, content='tasks', content_rowid='rowid', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_fts (rowid, title) VALUES (new.rowid, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title ON tasks BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+    INSERT INTO tasks_fts (rowid, title) VALUES (new.rowid, new.title);
+END;
+"""
+
+# Statements are kept as module constants so sqlite3's per-connection
+# statement cache always hits and each one is prepared only once.
+_TASK_COLUMNS = "id, title, completed, created_at, updated_at"
+_ACTIVITY_COLUMNS = "id, task_id, action, timestamp, old_value, new_value"
+
+_SELECT_TASK = f"SELECT {_TASK_COLUMNS} FROM tasks WHERE id = ?"
+_SELECT_ALL_TASKS = f"SELECT {_TASK_COLUMNS} FROM tasks ORDER BY created_at, id"
+_INSERT_TASK = f"INSERT INTO tasks ({_TASK_COLUMNS}) VALUES (?, ?, ?, ?, ?)"
+_UPDATE_TASK = "UPDATE tasks SET title = ?, completed = ?, updated_at = ? WHERE id = ?"
+_DELETE_TASK = "DELETE FROM tasks WHERE id = ?"
+_INSERT_ACTIVITY = f"INSERT INTO activity ({_ACTIVITY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)"
+# Task-scoped statements write `+archived` so the planner cannot pick
+# idx_activity_archived, which matches nearly every row, over idx_activity_task_id
+_SELECT_ACTIVITY = (
+    f"SELECT {_ACTIVITY_COLUMNS} FROM activity "
+    "WHERE task_id = ? AND +archived = 0 AND timestamp >= ? ORDER BY seq"
+)
+_SELECT_ACTIVITY_PAGE = (
+    f"SELECT seq, {_ACTIVITY_COLUMNS} FROM activity "
+    "WHERE seq > ? AND archived = ? AND timestamp >= ? ORDER BY seq LIMIT ?"
+)
+# Writes are serialized and stamped inside their transaction, so timestamps
+# rise with seq and a time bound becomes a seq bound via idx_activity_timestamp
+_SELECT_SEQ_AT = "SELECT seq FROM activity WHERE timestamp >= ? ORDER BY timestamp, seq LIMIT 1"
+_QUERY_ACTIVITY_FILTERS = (
+    "seq > ? AND seq < ? AND timestamp >= ? AND timestamp < ? AND action = coalesce(?, action) "
+    "ORDER BY seq LIMIT ?"
+)
+_QUERY_TASK_ACTIVITY = (
+    f"SELECT seq, {_ACTIVITY_COLUMNS} FROM activity "
+    f"WHERE task_id = ? AND +archived = 0 AND {_QUERY_ACTIVITY_FILTERS}"
+)
+_QUERY_ACTIVITY = (
+    f"SELECT seq, {_ACTIVITY_COLUMNS} FROM activity WHERE {_QUERY_ACTIVITY_FILTERS}"
+)
+_ARCHIVE_ACTIVITY = "UPDATE activity SET archived = 1 WHERE task_id = ?"
+# Retention deletes return the seqs they drop so the feed's floor can move
+_PRUNE_TASK_ACTIVITY = """
+DELETE FROM activity WHERE task_id = ? AND +archived = 0 AND (timestamp < ? OR seq <= (
+    SELECT seq FROM activity WHERE task_id = ? AND +archived = 0
+    ORDER BY seq DESC LIMIT 1 OFFSET ?
+))
+RETURNING seq
+"""
+_PRUNE_ARCHIVED = """
+DELETE FROM activity WHERE archived = 1 AND seq <= (
+    SELECT seq FROM activity WHERE archived = 1 ORDER BY seq DESC LIMIT 1 OFFSET ?
+)
+RETURNING seq
+"""
+_SELECT_ARCHIVED_COUNT = "SELECT archived FROM activity_meta WHERE id = 0"
+_ADJUST_ARCHIVED_COUNT = "UPDATE activity_meta SET archived = archived + ? WHERE id = 0"
+_RAISE_PRUNED_THROUGH = (
+    "UPDATE activity_meta SET pruned_through = max(pruned_through, ?) WHERE id = 0"
+)
+_SELECT_PRUNED_THROUGH = "SELECT pruned_through FROM activity_meta WHERE id = 0"
+# OFFSET past any task's history, for when max_per_task is unset
+_UNLIMITED = 2**62
+_ADJUST_COUNTS = "UPDATE task_counts SET total = total + ?, completed = completed + ? WHERE id = 0"
+_SELECT_COUNTS = "SELECT total, completed FROM task_counts WHERE id = 0"
+_RECOUNT = "SELECT COUNT(*), COALESCE(SUM(completed), 0) FROM tasks"
+# Every write that changes a task writes an activity row (an update that
+# changes nothing writes nothing at all), clear() advances the sequence by
+# hand, and AUTOINCREMENT never reuses a seq: so the highest seq handed out
+# doubles as the global revision, and a task's newest row as its revision.
+_SELECT_REVISION = (
+    "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'activity'), 0)"
+)
+_ADVANCE_REVISION = "UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'activity'"
+_SELECT_TASK_REVISION = "SELECT MAX(seq) FROM activity WHERE task_id = ? AND archived = 0"
+_SELECT_EPOCH = "SELECT epoch FROM storage_meta WHERE id = 0"
+# Activity rows are the change events; archived rows still count, since a
+# deleted task's events are part of the feed
+_SELECT_EVENTS = """
+SELECT activity.seq, activity.task_id, activity.action, activity.timestamp,
+    activity.old_value, activity.new_value,
+    tasks.id, tasks.title, tasks.completed, tasks.created_at, tasks.updated_at
+FROM activity LEFT JOIN tasks ON tasks.id = activity.task_id
+WHERE activity.seq > ?
+ORDER BY activity.seq
+LIMIT ?
+"""
+_SELECT_OLDEST_EVENT = "SELECT MIN(seq) FROM activity"
+_HAS_SEARCH_INDEX = "SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'"
+_REBUILD_SEARCH_INDEX = "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')"
+# bm25() is lower-is-better; negate it so scores rank like the in-memory index
+_SEARCH = f"""
+SELECT {_TASK_COLUMNS}, score FROM (
+    SELECT tasks.*, -bm25(tasks_fts) AS score
+    FROM tasks_fts JOIN tasks ON tasks.rowid = tasks_fts.rowid
+    WHERE tasks_fts MATCH ?
+)
+WHERE ? IS NULL OR score < ? OR (score = ? AND id > ?)
+ORDER BY score DESC, id
+LIMIT ?
+"""
+
+
+def _match_expression(text: str) -> Optional[str]:
+    """FTS5 MATCH string requiring every term, as a prefix when long enough.
+
+    A prefix term is written as ("t" OR "t"*) so that whole-word matches
+    score on both branches and rank above prefix-only matches.
+    """
+    terms = [
+        f'("{term}" OR "{term}"*)' if len(term) >= MIN_PREFIX_LENGTH else f'"{term}"'
+        for term in dict.fromkeys(tokenize(text))
+    ]
+    return " AND ".join(terms) if terms else None
+
+
+def _build_query(
+    query: TaskQuery,
+    limit: Optional[int],
+    after: Optional[OrderKey],
+) -> tuple[str, list]:
+    """SELECT for query_tasks. Only a handful of shapes exist, so they stay cached."""
+    field = query.sort_field
+    clauses: list[str] = []
+    params: list = []
+    if query.completed is not None:
+        clauses.append("completed = ?")
+        params.append(int(query.completed))
+    if query.created_after is not None:
+        clauses.append("created_at > ?")
+        params.append(to_micros(query.created_after))
+    if query.created_before is not None:
+        clauses.append("created_at < ?")
+        params.append(to_micros(query.created_before))
+    if query.updated_since is not None:
+        clauses.append("updated_at >= ?")
+        params.append(to_micros(query.updated_since))
+    if after is not None:
+        clauses.append(f"({field}, id) {'<' if query.descending else '>'} (?, ?)")
+        params.extend((to_micros(after[0]), after[1]))
+
+    direction = "DESC" if query.descending else "ASC"
+    sql = f"SELECT {_TASK_COLUMNS} FROM tasks"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {field} {direction}, id {direction}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+    return sql, params
+
+
+def _row_to_record(row: tuple) -> TaskRecord:
+    task_id, title, completed, created_at, updated_at = row
+    return TaskRecord(
+        task_id, title, bool(completed), from_micros(created_at), from_micros(updated_at)
+    )
+
+
+def _row_to_task(row: tuple) -> Task:
+    return _row_to_record(row).to_task()
+
+
+def _row_to_event(row: tuple) -> TaskEvent:
+    seq, task_id, action, timestamp, old_value, new_value = row[:6]
+    return TaskEvent(
+        revision=seq,
+        action=action,
+        task_id=task_id,
+        timestamp=from_micros(timestamp),
+        old_value=old_value,
+        new_value=new_value,
+        task=_row_to_task(row[6:]) if row[6] is not None else None,
+    )
+
+
+def _row_to_activity(row: tuple) -> ActivityLog:
+    log_id, task_id, action, timestamp, old_value, new_value = row
+    return ActivityLog(
+        id=log_id,
+        task_id=task_id,
+        action=action,
+        timestamp=from_micros(timestamp),
+        old_value=old_value,
+        new_value=new_value,
+    )
+
+
+class SQLiteStorage:
+    """SQLite-backed storage in WAL mode.
+
+    Each thread gets its own connection so readers never block each other;
+    writes run inside BEGIN IMMEDIATE transactions so read-modify-write
+    sequences are atomic across threads and processes sharing the file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        check_consistency: bool = False,
+        retention: ActivityRetention = ActivityRetention(),
+    ):
+        self.path = path
+        self.check_consistency = check_consistency
+        self.retention = retention
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        conn = self._conn()
+        # Databases created before search existed need their titles indexed
+        backfill_search = conn.execute(_HAS_SEARCH_INDEX).fetchone() is None
+        conn.executescript(SCHEMA)
+        if backfill_search:
+            conn.execute(_REBUILD_SEARCH_INDEX)
+        self.epoch = conn.execute(_SELECT_EPOCH).fetchone()[0]
+        self.aio = TimedStorage(AsyncSQLiteStorage(self), "sqlite")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=30.0,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=256,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _add_activity_log(
+        self,
+        conn: sqlite3.Connection,
+        task_id: str,
+        action: str,
+        timestamp: int,
+        old_value: Optional[str] = None,
+        new_value: Optional[str] = None,
+    ) -> None:
+        conn.execute(
+            _INSERT_ACTIVITY,
+            (str(uuid4()), task_id, action, timestamp, old_value, new_value),
+        )
+        max_per_task = self.retention.max_per_task
+        if max_per_task is not None or self.retention.max_age is not None:
+            keep = max_per_task if max_per_task is not None else _UNLIMITED
+            self._prune(conn, _PRUNE_TASK_ACTIVITY, (task_id, self._age_cutoff(), task_id, keep))
+
+    def _archive(self, conn: sqlite3.Connection, task_id: str) -> None:
+        archived = conn.execute(_ARCHIVE_ACTIVITY, (task_id,)).rowcount
+        conn.execute(_ADJUST_ARCHIVED_COUNT, (archived,))
+        max_archived = self.retention.max_archived
+        if max_archived is None:
+            return
+        # Pruning runs an OFFSET scan, so let the archive overshoot by a tenth
+        # and prune back in one go rather than on every delete
+        if conn.execute(_SELECT_ARCHIVED_COUNT).fetchone()[0] > max_archived * 11 // 10:
+            pruned = self._prune(conn, _PRUNE_ARCHIVED, (max_archived,))
+            conn.execute(_ADJUST_ARCHIVED_COUNT, (-pruned,))
+
+    def _prune(self, conn: sqlite3.Connection, sql: str, params: tuple) -> int:
+        """Run a retention DELETE; events up to what it drops can no longer be served."""
+        seqs = [row[0] for row in conn.execute(sql, params)]
+        if seqs:
+            conn.execute(_RAISE_PRUNED_THROUGH, (max(seqs),))
+        return len(seqs)
+
+    def _age_cutoff(self) -> int:
+        """Entries stamped before this (in epoch microseconds) have expired."""
+        if self.retention.max_age is None:
+            return 0
+        return to_micros(datetime.utcnow() - self.retention.max_age)
+
+    def revision(self) -> int:
+        return self._conn().execute(_SELECT_REVISION).fetchone()[0]
+
+    def task_revision(self, task_id: str) -> Optional[int]:
+        return self._conn().execute(_SELECT_TASK_REVISION, (task_id,)).fetchone()[0]
+
+    def events_since(self, revision: int, limit: int) -> Optional[list[TaskEvent]]:
+        conn = self._conn()
+        if revision > self.revision():
+            return None
+        rows = conn.execute(_SELECT_EVENTS, (revision, limit)).fetchall()
+        # clear() deletes activity rows, so anything older than the oldest
+        # remaining row is gone; checked after the read so a concurrent clear
+        # is never missed
+        oldest = conn.execute(_SELECT_OLDEST_EVENT).fetchone()[0]
+        floor = oldest - 1 if oldest is not None else self.revision()
+        floor = max(floor, conn.execute(_SELECT_PRUNED_THROUGH).fetchone()[0])
+        if revision < floor:
+            return None
+        return [_row_to_event(row) for row in rows]
+
+    def get_all_tasks(self) -> list[TaskRecord]:
+        return [_row_to_record(row) for row in self._conn().execute(_SELECT_ALL_TASKS)]
+
+    def query_tasks(
+        self,
+        query: TaskQuery,
+        limit: Optional[int] = None,
+        after: Optional[OrderKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[OrderKey]]:
+        sql, params = _build_query(query, limit, after)
+        rows = self._conn().execute(sql, params).fetchall()
+        tasks = [_row_to_record(row) for row in rows]
+        # One extra row is fetched to learn whether another page follows
+        if limit is not None and len(tasks) > limit:
+            return tasks[:limit], query.key(tasks[limit - 1])
+        return tasks, None
+
+    def search_tasks(
+        self,
+        text: str,
+        limit: int,
+        after: Optional[RankKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[RankKey]]:
+        match = _match_expression(text)
+        if match is None:
+            return [], None
+        after_score, after_id = after if after is not None else (None, None)
+        rows = self._conn().execute(
+            _SEARCH, (match, after_score, after_score, after_score, after_id, limit + 1)
+        ).fetchall()
+        tasks = [_row_to_record(row[:5]) for row in rows[:limit]]
+        next_key = (rows[limit - 1][5], rows[limit - 1][0]) if len(rows) > limit else None
+        return tasks, next_key
+
+    def get_task(self, task_id: str) -> Optional[Task]:
+        row = self._conn().execute(_SELECT_TASK, (task_id,)).fetchone()
+        return _row_to_task(row) if row else None
+
+    def create_task(self, title: str) -> Task:
+        return self.create_tasks([title])[0]
+
+    def create_tasks(self, titles: list[str]) -> list[Task]:
+        ids = [str(uuid4()) for _ in titles]
+        with self._transaction() as conn:
+            now = to_micros(datetime.utcnow())
+            rows = [(task_id, title, 0, now, now) for task_id, title in zip(ids, titles)]
+            conn.executemany(_INSERT_TASK, rows)
+            conn.execute(_ADJUST_COUNTS, (len(rows), 0))
+            conn.executemany(
+                _INSERT_ACTIVITY,
+                [(str(uuid4()), row[0], "created", now, None, None) for row in rows],
+            )
+        return [_row_to_task(row) for row in rows]
+
+    def complete_task(self, task_id: str) -> Optional[Task]:
+        with self._transaction() as conn:
+            row = conn.execute(_SELECT_TASK, (task_id,)).fetchone()
+            if row is None:
+                return None
+            _, title, completed, created_at, _ = row
+            now = to_micros(datetime.utcnow())
+            conn.execute(_UPDATE_TASK, (title, 1, now, task_id))
+            if not completed:
+                conn.execute(_ADJUST_COUNTS, (0, 1))
+            old_status = "completed" if completed else "pending"
+            self._add_activity_log(
+                conn, task_id, "completed", now, old_value=old_status, new_value="completed"
+            )
+        return _row_to_task((task_id, title, 1, created_at, now))
+
+    def update_task(
+        self,
+        task_id: str,
+        title: Optional[str] = None,
+        completed: Optional[bool] = None,
+    ) -> Optional[Task]:
+        with self._transaction() as conn:
+            return self._update(conn, task_id, title, completed)
+
+    def update_tasks(
+        self, updates: list[tuple[str, Optional[str], Optional[bool]]]
+    ) -> list[Optional[Task]]:
+        with self._transaction() as conn:
+            return [
+                self._update(conn, task_id, title, completed)
+                for task_id, title, completed in updates
+            ]
+
+    def _update(
+        self,
+        conn: sqlite3.Connection,
+        task_id: str,
+        title: Optional[str],
+        completed: Optional[bool],
+    ) -> Optional[Task]:
+        row = conn.execute(_SELECT_TASK, (task_id,)).fetchone()
+        if row is None:
+            return None
+        _, old_title, old_completed, created_at, _ = row
+        old_completed = bool(old_completed)
+        if (title is None or title == old_title) and (
+            completed is None or completed == old_completed
+        ):
+            # Nothing to record, so nothing changes, not even updated_at:
+            # the task's revision and ETag stay valid
+            return _row_to_task(row)
+        now = to_micros(datetime.utcnow())
+        new_title = old_title
+        new_completed = old_completed
+
+        if title is not None and title != old_title:
+            new_title = title
+            self._add_activity_log(
+                conn, task_id, "updated", now, old_value=old_title, new_value=title
+            )
+
+        if completed is not None and completed != old_completed:
+            old_status = "completed" if old_completed else "pending"
+            new_status = "completed" if completed else "pending"
+            new_completed = completed
+            conn.execute(_ADJUST_COUNTS, (0, 1 if completed else -1))
+            self._add_activity_log(
+                conn, task_id, "status_changed", now, old_value=old_status, new_value=new_status
+            )
+
+        conn.execute(_UPDATE_TASK, (new_title, int(new_completed), now, task_id))
+        return _row_to_task((task_id, new_title, new_completed, created_at, now))
+
+    def delete_task(self, task_id: str) -> bool:
+        with self._transaction() as conn:
+            return self._delete(conn, task_id)
+
+    def delete_tasks(self, task_ids: list[str]) -> list[bool]:
+        with self._transaction() as conn:
+            return [self._delete(conn, task_id) for task_id in task_ids]
+
+    def _delete(self, conn: sqlite3.Connection, task_id: str) -> bool:
+        row = conn.execute(_SELECT_TASK, (task_id,)).fetchone()
+        if row is None:
+            return False
+        self._add_activity_log(conn, task_id, "deleted", to_micros(datetime.utcnow()))
+        # Archive activity logs before deleting
+        self._archive(conn, task_id)
+        conn.execute(_DELETE_TASK, (task_id,))
+        conn.execute(_ADJUST_COUNTS, (-1, -1 if row[2] else 0))
+        return True
+
+    def get_task_activity(self, task_id: str) -> Optional[list[ActivityLog]]:
+        conn = self._conn()
+        if conn.execute(_SELECT_TASK, (task_id,)).fetchone() is None:
+            return None
+        rows = conn.execute(_SELECT_ACTIVITY, (task_id, self._age_cutoff()))
+        return [_row_to_activity(row) for row in rows]
+
+    def query_task_activity(
+        self,
+        task_id: str,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> Optional[tuple[list[ActivityLog], Optional[ActivitySeq]]]:
+        conn = self._conn()
+        if conn.execute(_SELECT_TASK, (task_id,)).fetchone() is None:
+            return None
+        return self._query_activity(conn, _QUERY_TASK_ACTIVITY, (task_id,), query, limit, after)
+
+    def query_activity(
+        self,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]:
+        return self._query_activity(self._conn(), _QUERY_ACTIVITY, (), query, limit, after)
+
+    def _query_activity(
+        self,
+        conn: sqlite3.Connection,
+        sql: str,
+        params: tuple,
+        query: ActivityQuery,
+        limit: Optional[int],
+        after: Optional[ActivitySeq],
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]:
+        lowest = self._age_cutoff()
+        if query.since is not None:
+            lowest = max(lowest, to_micros(query.since))
+        until = to_micros(query.until) if query.until is not None else _UNLIMITED
+        low_seq = after if after is not None else 0
+        if lowest:
+            row = conn.execute(_SELECT_SEQ_AT, (lowest,)).fetchone()
+            if row is None:
+                return [], None
+            low_seq = max(low_seq, row[0] - 1)
+        high_seq = _UNLIMITED
+        if query.until is not None:
+            row = conn.execute(_SELECT_SEQ_AT, (until,)).fetchone()
+            high_seq = row[0] if row is not None else _UNLIMITED
+        # The seq bounds narrow the scan; rows are still checked against the times
+        rows = conn.execute(
+            sql,
+            params
+            + (low_seq, high_seq, lowest, until, query.action, -1 if limit is None else limit + 1),
+        ).fetchall()
+        logs = [_row_to_activity(row[1:]) for row in rows]
+        if limit is not None and len(logs) > limit:
+            return logs[:limit], rows[limit - 1][0]
+        return logs, None
+
+    def iter_activity(self, archived: bool, batch_size: int) -> Iterator[list[ActivityLog]]:
+        after = 0
+        while True:
+            rows = self._conn().execute(
+                _SELECT_ACTIVITY_PAGE, (after, int(archived), self._age_cutoff(), batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield [_row_to_activity(row[1:]) for row in rows]
+            after = rows[-1][0]
+
+    def get_stats(self) -> TaskStats:
+        conn = self._conn()
+        total, completed = conn.execute(_SELECT_COUNTS).fetchone()
+        if self.check_consistency:
+            recounted = tuple(conn.execute(_RECOUNT).fetchone())
+            if (total, completed) != recounted:
+                raise ConsistencyError(
+                    f"task_counts drifted: counters={(total, completed)}, recount={recounted}"
+                )
+        return TaskStats(total=total, completed=completed, pending=total - completed)
+
+    def sizes(self) -> dict[str, int]:
+        # Activity lives in one table rather than per-task logs; only the
+        # task count is kept where it is cheap to read
+        return {"tasks": self._conn().execute(_SELECT_COUNTS).fetchone()[0]}
+
+    def clear(self) -> None:
+        """Clear all data - useful for testing."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM activity")
+            conn.execute("UPDATE task_counts SET total = 0, completed = 0 WHERE id = 0")
+            conn.execute("UPDATE activity_meta SET archived = 0 WHERE id = 0")
+            # Deleting rows leaves the sequence where it was; move it on so
+            # ETags issued before the clear never match
+            conn.execute(_ADVANCE_REVISION)
+
+    def close(self) -> None:
+        self.aio.close()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class AsyncSQLiteStorage:
+    """AsyncStorage over a SQLiteStorage.
+
+    sqlite3 only blocks, so every call runs on an executor, and the event
+    loop only awaits the result. Every storage shares ASYNC_EXECUTOR by
+    default, so threads stay bounded however many shards are open; its
+    threads keep their connections until the storage is closed, and
+    bounding it keeps a burst of requests from opening a connection each.
+    """
+
+    def __init__(self, storage: SQLiteStorage, executor: ThreadPoolExecutor = ASYNC_EXECUTOR):
+        self.sync = storage
+        self.epoch = storage.epoch
+        self._executor = executor
+        # Calls submitted and not yet finished, which close() waits for
+        self._calls = 0
+        self._calls_done = threading.Condition()
+
+    async def _run(self, call: Callable[..., _T], *args) -> _T:
+        with self._calls_done:
+            self._calls += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, queued("sqlite", self._call, call, *args)
+        )
+
+    def _call(self, call: Callable[..., _T], *args) -> _T:
+        try:
+            return call(*args)
+        finally:
+            with self._calls_done:
+                self._calls -= 1
+                self._calls_done.notify_all()
+
+    async def revision(self) -> int:
+        return await self._run(self.sync.revision)
+
+    async def task_revision(self, task_id: str) -> Optional[int]:
+        return await self._run(self.sync.task_revision, task_id)
+
+    async def events_since(self, revision: int, limit: int) -> Optional[list[TaskEvent]]:
+        return await self._run(self.sync.events_since, revision, limit)
+
+    async def get_all_tasks(self) -> list[TaskRecord]:
+        return await self._run(self.sync.get_all_tasks)
+
+    async def query_tasks(
+        self,
+        query: TaskQuery,
+        limit: Optional[int] = None,
+        after: Optional[OrderKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[OrderKey]]:
+        return await self._run(self.sync.query_tasks, query, limit, after)
+
+    async def search_tasks(
+        self,
+        text: str,
+        limit: int,
+        after: Optional[RankKey] = None,
+    ) -> tuple[list[TaskRecord], Optional[RankKey]]:
+        return await self._run(self.sync.search_tasks, text, limit, after)
+
+    async def get_task(self, task_id: str) -> Optional[Task]:
+        return await self._run(self.sync.get_task, task_id)
+
+    async def create_task(self, title: str) -> Task:
+        return await self._run(self.sync.create_task, title)
+
+    async def create_tasks(self, titles: list[str]) -> list[Task]:
+        return await self._run(self.sync.create_tasks, titles)
+
+    async def complete_task(self, task_id: str) -> Optional[Task]:
+        return await self._run(self.sync.complete_task, task_id)
+
+    async def update_task(
+        self,
+        task_id: str,
+        title: Optional[str] = None,
+        completed: Optional[bool] = None,
+    ) -> Optional[Task]:
+        return await self._run(self.sync.update_task, task_id, title, completed)
+
+    async def update_tasks(
+        self, updates: list[tuple[str, Optional[str], Optional[bool]]]
+    ) -> list[Optional[Task]]:
+        return await self._run(self.sync.update_tasks, updates)
+
+    async def delete_task(self, task_id: str) -> bool:
+        return await self._run(self.sync.delete_task, task_id)
+
+    async def delete_tasks(self, task_ids: list[str]) -> list[bool]:
+        return await self._run(self.sync.delete_tasks, task_ids)
+
+    async def get_task_activity(self, task_id: str) -> Optional[list[ActivityLog]]:
+        return await self._run(self.sync.get_task_activity, task_id)
+
+    async def query_task_activity(
+        self,
+        task_id: str,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> Optional[tuple[list[ActivityLog], Optional[ActivitySeq]]]:
+        return await self._run(self.sync.query_task_activity, task_id, query, limit, after)
+
+    async def query_activity(
+        self,
+        query: ActivityQuery,
+        limit: Optional[int] = None,
+        after: Optional[ActivitySeq] = None,
+    ) -> tuple[list[ActivityLog], Optional[ActivitySeq]]:
+        return await self._run(self.sync.query_activity, query, limit, after)
+
+    async def get_stats(self) -> TaskStats:
+        return await self._run(self.sync.get_stats)
+
+    def close(self) -> None:
+        """Wait for calls in flight; the executor stays up for other storages."""
+        with self._calls_done:
+            self._calls_done.wait_for(lambda: not self._calls)
@@ -0,0 +1,59 @@
+from time import perf_counter
+
+from app.metrics import STORAGE_CALL_SECONDS
+from app.storage.base import AsyncStorage
+
+# The AsyncStorage methods TimedStorage records
+TIMED_METHODS = (
+    "revision",
+    "task_revision",
+    "events_since",
+    "get_all_tasks",
+    "query_tasks",
+    "search_tasks",
+    "get_task",
+    "create_task",
+    "create_tasks",
+    "complete_task",
+    "update_task",
+    "update_tasks",
+    "delete_task",
+    "delete_tasks",
+    "get_task_activity",
+    "query_task_activity",
+    "query_activity",
+    "get_stats",
+)
+
+
+class TimedStorage:
+    """AsyncStorage that records how long each call takes, per backend and method.
+
+    Everything else (`sync`, `epoch`, a backend's own extras) is the wrapped
+    storage's.
+    """
+
+    def __init__(self, storage: AsyncStorage, backend: str):
+        self.storage = storage
+        self.backend = backend
+        self.sync = storage.sync
+        self.epoch = storage.epoch
+
+    def __getattr__(self, name: str):
+        return getattr(self.storage, name)
+
+
+def _timed(name: str):
+    async def call(self: TimedStorage, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return await getattr(self.storage, name)(*args, **kwargs)
+        finally:
+            STORAGE_CALL_SECONDS.observe(perf_counter() - start, self.backend, name)
+
+    call.__name__ = call.__qualname__ = name
+    return call
+
+
+for _name in TIMED_METHODS:
+    setattr(TimedStorage, _name, _timed(_name))
@@ -0,0 +1,285 @@
+import asyncio
+import marshal
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import Any, BinaryIO, Iterable, Iterator, Optional
+
+# Every record, in the log and in snapshots, is framed as
+# <payload length, crc32 of payload> + a marshal-encoded tuple of plain values
+_FRAME = struct.Struct("<II")
+
+_SEGMENT = re.compile(r"wal-(\d{10})\.log")
+_SNAPSHOT = re.compile(r"snapshot-(\d{10})\.bin")
+
+
+class CorruptLogError(Exception):
+    """A log segment or snapshot failed its checksum outside a torn tail."""
+
+
+def segment_path(directory: str, number: int) -> str:
+    return os.path.join(directory, f"wal-{number:010d}.log")
+
+
+def snapshot_path(directory: str, number: int) -> str:
+    """Snapshot `number` holds the state before segment `number` begins."""
+    return os.path.join(directory, f"snapshot-{number:010d}.bin")
+
+
+def list_files(directory: str) -> tuple[list[int], list[int]]:
+    """Numbers of the (segments, snapshots) in `directory`, ascending."""
+    segments, snapshots = [], []
+    for name in os.listdir(directory):
+        if match := _SEGMENT.fullmatch(name):
+            segments.append(int(match.group(1)))
+        elif match := _SNAPSHOT.fullmatch(name):
+            snapshots.append(int(match.group(1)))
+    return sorted(segments), sorted(snapshots)
+
+
+def encode_frame(record: tuple) -> bytes:
+    payload = marshal.dumps(record)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(file: BinaryIO) -> Iterator[tuple[int, Any]]:
+    """Yield (end offset, record) for each intact frame, stopping at the first bad one."""
+    offset = 0
+    while True:
+        header = file.read(_FRAME.size)
+        if len(header) < _FRAME.size:
+            return
+        length, checksum = _FRAME.unpack(header)
+        payload = file.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        offset += _FRAME.size + length
+        yield offset, marshal.loads(payload)
+
+
+def replay_segment(path: str, last: bool) -> Iterator[Any]:
+    """Yield a segment's records.
+
+    A crash can leave the final segment with a partly written frame; that
+    tail is cut off. Anywhere else a bad frame means real corruption.
+    """
+    with open(path, "r+b") as file:
+        end = 0
+        for end, record in read_frames(file):
+            yield record
+        if end < os.fstat(file.fileno()).st_size:
+            if not last:
+                raise CorruptLogError(f"{path} is damaged at byte {end}")
+            file.truncate(end)
+
+
+def write_snapshot(path: str, frames: Iterable[tuple]) -> None:
+    """Write `frames` to `path` atomically: it either appears whole or not at all."""
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        for record in frames:
+            file.write(encode_frame(record))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    _sync_directory(os.path.dirname(path))
+
+
+def read_snapshot(path: str) -> Iterator[Any]:
+    with open(path, "rb") as file:
+        end = 0
+        for end, record in read_frames(file):
+            yield record
+        if end < os.fstat(file.fileno()).st_size:
+            raise CorruptLogError(f"{path} is damaged at byte {end}")
+
+
+def _sync_directory(directory: str) -> None:
+    # Makes created, renamed and deleted names durable
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """Append-only record log with group commit.
+
+    append() only queues a frame and hands back a ticket; wait(ticket)
+    returns once that frame is on disk. The first waiter to find no flush
+    running writes and fsyncs everything queued so far, so concurrent writers
+    share one fsync instead of paying for one each. Coroutines await
+    wait_async(ticket) instead, which holds no thread: a flusher thread does
+    the writing for them and resolves their futures on their event loop.
+    """
+
+    def __init__(self, directory: str, segment: int, sync: bool = True):
+        self.directory = directory
+        self.segment = segment
+        self.sync = sync
+        # Records appended to the current segment
+        self.records = 0
+        self._file = open(segment_path(directory, segment), "ab")
+        _sync_directory(directory)
+        self._cond = threading.Condition()
+        self._pending: list[bytes] = []
+        self._appended = 0
+        self._durable = 0
+        self._flushing = False
+        self._error: Optional[OSError] = None
+        # (ticket, loop, future) per coroutine in wait_async, until its flush
+        self._waiters: list[tuple[int, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._flusher: Optional[threading.Thread] = None
+        self._flush_requested = False
+        self._closed = False
+
+    def append(self, record: tuple) -> int:
+        frame = encode_frame(record)
+        with self._cond:
+            if self._closed:
+                raise ValueError("write-ahead log is closed")
+            self._pending.append(frame)
+            self._appended += 1
+            self.records += 1
+            return self._appended
+
+    def wait(self, ticket: int) -> None:
+        with self._cond:
+            while self._durable < ticket:
+                if self._error is not None:
+                    raise OSError("write-ahead log failed; restart to recover") from self._error
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                if self._closed:
+                    # close() flushed everything appended before it
+                    raise ValueError("write-ahead log is closed")
+                self._flush_locked()
+
+    async def wait_async(self, ticket: int) -> None:
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._durable >= ticket:
+                return
+            if self._error is not None:
+                raise OSError("write-ahead log failed; restart to recover") from self._error
+            if self._closed:
+                # No flusher is left to resolve the future
+                raise ValueError("write-ahead log is closed")
+            future = loop.create_future()
+            self._waiters.append((ticket, loop, future))
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._run_flusher, name="wal-flusher", daemon=True
+                )
+                self._flusher.start()
+        # Ask for the flush from the loop's next pass, so every write the
+        # current pass applies is appended first and shares its fsync
+        loop.call_soon(self._request_flush)
+        await future
+
+    def _request_flush(self) -> None:
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+
+    def _run_flusher(self) -> None:
+        """Flush when asked to, once no flush is already running."""
+        with self._cond:
+            while not self._closed:
+                if not self._flush_requested or self._flushing or self._error is not None:
+                    self._cond.wait()
+                    continue
+                self._flush_requested = False
+                if not self._waiters:
+                    continue  # Another waiter's flush already covered them
+                try:
+                    self._flush_locked()
+                except OSError:
+                    pass  # _flush_locked failed the waiters with it
+
+    def _wake_waiters(self) -> None:
+        """Resolve the futures the last flush made durable, or all on error. Caller holds _cond."""
+        if self._error is not None:
+            woken, self._waiters = self._waiters, []
+        else:
+            woken = [waiter for waiter in self._waiters if waiter[0] <= self._durable]
+            self._waiters = [waiter for waiter in self._waiters if waiter[0] > self._durable]
+        for _, loop, future in woken:
+            try:
+                loop.call_soon_threadsafe(_resolve, future, self._error)
+            except RuntimeError:
+                pass  # The waiter's loop is closed; nobody is left to tell
+
+    def _flush_locked(self) -> None:
+        """Write out everything queued. Caller holds _cond; it is released meanwhile."""
+        self._flushing = True
+        batch, self._pending = self._pending, []
+        through = self._appended
+        file = self._file
+        self._cond.release()
+        try:
+            file.write(b"".join(batch))
+            file.flush()
+            if self.sync:
+                os.fsync(file.fileno())
+        except OSError as exc:
+            error = exc
+        else:
+            error = None
+        finally:
+            self._cond.acquire()
+            self._flushing = False
+            self._cond.notify_all()
+        if error is not None:
+            # What was queued is lost, so later writes cannot be acknowledged either
+            self._error = error
+            self._wake_waiters()
+            raise OSError("write-ahead log failed; restart to recover") from error
+        self._durable = through
+        if self._waiters:
+            self._wake_waiters()
+
+    def rotate(self) -> int:
+        """Flush, then start the next segment. Returns the new segment's number.
+
+        The caller must keep writers out meanwhile, so every record appended
+        before the call lands in the old segment.
+        """
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            if self._pending:
+                self._flush_locked()
+            self._file.close()
+            self.segment += 1
+            self.records = 0
+            self._file = open(segment_path(self.directory, self.segment), "ab")
+            _sync_directory(self.directory)
+            return self.segment
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            while self._flushing:
+                self._cond.wait()
+            if self._pending and self._error is None:
+                self._flush_locked()
+            self._file.close()
+        if self._flusher is not None:
+            self._flusher.join()
+
+
+def _resolve(future: asyncio.Future, error: Optional[OSError]) -> None:
+    if future.cancelled():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        failure = OSError("write-ahead log failed; restart to recover")
+        failure.__cause__ = error
+        future.set_exception(failure)
@@ -0,0 +1,163 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Protocol
+from uuid import uuid4
+
+Claims = dict[str, Any]
+
+# Header of every token HMACTokenVerifier issues
+_HS256_HEADER = {"alg": "HS256", "typ": "JWT"}
+
+
+class InvalidTokenError(Exception):
+    """The token is malformed, wrongly signed, expired or revoked."""
+
+
+class TokenVerifier(Protocol):
+    def verify(self, token: str) -> Claims:
+        """Return the token's claims, or raise InvalidTokenError."""
+        ...
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64decode(segment: str) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+    except (binascii.Error, ValueError) as exc:
+        raise InvalidTokenError("malformed token") from exc
+
+
+def _json_segment(value: Claims) -> str:
+    return _b64encode(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+class HMACTokenVerifier:
+    """Issues and verifies HS256 JSON Web Tokens signed with a shared secret.
+
+    Tokens carry `sub`, `iat`, `exp` (issue time plus `ttl` seconds) and a
+    unique `jti`. The signature is checked, in constant time, before any
+    part of the token is parsed.
+    """
+
+    def __init__(
+        self, secret: bytes, ttl: float = 3600, clock: Callable[[], float] = time.time
+    ):
+        self.secret = secret
+        self.ttl = ttl
+        self.clock = clock
+        self._header = _json_segment(_HS256_HEADER)
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        return hmac.new(self.secret, signing_input, hashlib.sha256).digest()
+
+    def issue(self, subject: str) -> str:
+        now = int(self.clock())
+        claims = {"sub": subject, "iat": now, "exp": now + int(self.ttl), "jti": uuid4().hex}
+        signing_input = f"{self._header}.{_json_segment(claims)}"
+        return f"{signing_input}.{_b64encode(self._sign(signing_input.encode('ascii')))}"
+
+    def verify(self, token: str) -> Claims:
+        parts = token.split(".")
+        if len(parts) != 3 or not token.isascii():
+            raise InvalidTokenError("malformed token")
+        header, payload, signature = parts
+        expected = self._sign(f"{header}.{payload}".encode("ascii"))
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise InvalidTokenError("bad signature")
+        try:
+            algorithm = json.loads(_b64decode(header)).get("alg")
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, AttributeError) as exc:
+            raise InvalidTokenError("malformed token") from exc
+        if algorithm != "HS256" or not isinstance(claims, dict):
+            raise InvalidTokenError("malformed token")
+        expires = claims.get("exp")
+        if not isinstance(expires, (int, float)) or expires <= self.clock():
+            raise InvalidTokenError("token expired")
+        return claims
+
+
+class CachedTokenVerifier:
+    """Wraps a TokenVerifier so each token is verified once, not on every request.
+
+    Verified claims are kept in an LRU of at most `max_size` tokens, each
+    until the earlier of its `exp` claim and `ttl` seconds. Entries are keyed
+    by the token's SHA-256 digest, so the cache holds no usable credentials
+    and a lookup compares digests rather than the secret-bearing tokens.
+
+    revoke() evicts a token and refuses it until it would have expired
+    anyway. Revocations are kept in this process only.
+    """
+
+    def __init__(
+        self,
+        verifier: TokenVerifier,
+        max_size: int = 10_000,
+        ttl: float = 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.verifier = verifier
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        # digest -> (claims, expiry in clock() seconds), least recently used first
+        self._cache: OrderedDict[bytes, tuple[Claims, float]] = OrderedDict()
+        # digest -> the revoked token's own expiry
+        self._revoked: dict[bytes, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8", "surrogatepass")).digest()
+
+    def verify(self, token: str) -> Claims:
+        key = self._key(token)
+        now = self.clock()
+        with self._lock:
+            if key in self._revoked:
+                raise InvalidTokenError("token revoked")
+            cached = self._cache.get(key)
+            if cached is not None:
+                claims, expires = cached
+                if expires > now:
+                    self._cache.move_to_end(key)
+                    return claims
+                del self._cache[key]
+        # Verified outside the lock, so a slow verifier does not serialize requests
+        claims = self.verifier.verify(token)
+        expires = min(float(claims.get("exp", float("inf"))), now + self.ttl)
+        with self._lock:
+            # Revoked while it was being verified
+            if key in self._revoked:
+                raise InvalidTokenError("token revoked")
+            self._cache[key] = (claims, expires)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return claims
+
+    def revoke(self, token: str) -> None:
+        """Refuse `token` from now on. Tokens that are already invalid are ignored."""
+        try:
+            claims = self.verifier.verify(token)
+        except InvalidTokenError:
+            return
+        key = self._key(token)
+        now = self.clock()
+        with self._lock:
+            self._cache.pop(key, None)
+            # Expired tokens fail verification on their own, so forget them
+            self._revoked = {
+                digest: expires for digest, expires in self._revoked.items() if expires > now
+            }
+            # A token without an expiry stays revoked for the life of the process
+            self._revoked[key] = float(claims.get("exp", float("inf")))
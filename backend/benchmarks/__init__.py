@@ -0,0 +1,6 @@
+import os
+import secrets
+
+# The app refuses to start without a signing key; servers started by a
+# benchmark inherit this one through the environment
+os.environ.setdefault("AUTH_SECRET", secrets.token_hex(32))
@@ -0,0 +1,260 @@
+"""
+Threadpool vs async route load test.
+
+Starts uvicorn twice per backend: once with the app as it is, whose task
+routes are coroutines on the async storage API, and once with the same
+routes declared as sync handlers (and sync auth dependencies) over the sync
+Storage API, the way they used to be, so every request runs on FastAPI's
+threadpool. Each is driven with a mixed read/write workload over ~1000
+concurrent connections, reporting requests per second and p50/p99 latency.
+
+Run from the backend directory:
+
+    python -m benchmarks.async_routes --backends durable sqlite --connections 1000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.models import Task, TaskStats
+from app.routers.auth import issue_token, security, token_verifier
+from app.routers.tasks import _not_modified
+from app.schemas import BulkCreateRequest, TaskUpdate
+from app.storage import Storage, shards
+from app.tokens import InvalidTokenError
+from benchmarks.load_workers import _free_port
+
+# Servers inherit this process's environment, and so its AUTH_SECRET
+AUTH_HEADERS = {"Authorization": f"Bearer {issue_token('admin')}"}
+SEED_TASKS = 1000
+
+threadpool_app = FastAPI()
+
+
+def _sync_user(
+    request: Request, credentials: HTTPAuthorizationCredentials | None = Depends(security)
+) -> str:
+    if credentials is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+    try:
+        return token_verifier.verify(credentials.credentials)["sub"]
+    except InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+
+def _sync_storage(owner: str = Depends(_sync_user)) -> Storage:
+    return shards.shard(owner)
+
+
+@threadpool_app.get("/")
+def root() -> dict:
+    return {}
+
+
+@threadpool_app.get("/tasks/stats", response_model=TaskStats)
+def get_stats(
+    request: Request, response: Response, storage: Storage = Depends(_sync_storage)
+) -> TaskStats | Response:
+    if (cached := _not_modified(storage, request, response, storage.revision())) is not None:
+        return cached
+    return storage.get_stats()
+
+
+@threadpool_app.get("/tasks/{task_id}", response_model=Task)
+def get_task(
+    task_id: str, request: Request, response: Response, storage: Storage = Depends(_sync_storage)
+) -> Task | Response:
+    revision = storage.task_revision(task_id)
+    if revision is not None:
+        if (cached := _not_modified(storage, request, response, revision)) is not None:
+            return cached
+    task = storage.get_task(task_id)
+    if task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return task
+
+
+@threadpool_app.patch("/tasks/{task_id}", response_model=Task)
+def update_task(
+    task_id: str, update: TaskUpdate, storage: Storage = Depends(_sync_storage)
+) -> Task:
+    task = storage.update_task(task_id, title=update.title, completed=update.completed)
+    if task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return task
+
+
+@threadpool_app.post("/tasks/bulk", status_code=status.HTTP_201_CREATED)
+def create_tasks_bulk(
+    items: BulkCreateRequest, storage: Storage = Depends(_sync_storage)
+) -> list[Task]:
+    return storage.create_tasks([item.title for item in items])
+
+
+SERVERS = {
+    "threadpool": "benchmarks.async_routes:threadpool_app",
+    "async": "app.main:app",
+}
+
+
+def _backend_env(backend: str, directory: str) -> dict:
+    env = dict(os.environ)
+    for name in ("STORAGE_BACKEND", "SQLITE_PATH", "MEMORY_DATA_DIR"):
+        env.pop(name, None)
+    if backend == "sqlite":
+        env.update(STORAGE_BACKEND="sqlite", SQLITE_PATH=os.path.join(directory, "tasks.db"))
+    elif backend == "durable":
+        env.update(MEMORY_DATA_DIR=os.path.join(directory, "data"))
+    return env
+
+
+def _start_server(target: str, port: int, env: dict) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", target,
+            "--port", str(port), "--log-level", "warning", "--backlog", "4096",
+        ],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def _seed(base_url: str) -> list[str]:
+    titles = [{"title": f"Task {i}"} for i in range(SEED_TASKS)]
+    with httpx.Client(base_url=base_url, headers=AUTH_HEADERS, timeout=60.0) as client:
+        response = client.post("/tasks/bulk", json=titles)
+        response.raise_for_status()
+        return [result["id"] for result in response.json()]
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection, spoken directly over a socket.
+
+    httpx costs more CPU per request than the server under test, so on a
+    small machine it would measure itself; this client parses just enough
+    of a response (status line and Content-Length) to read the next one.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str):
+        self.reader = reader
+        self.writer = writer
+        self.prefix = f"Host: {host}\r\nAuthorization: {AUTH_HEADERS['Authorization']}\r\n"
+
+    async def request(self, method: str, path: str, body: bytes = b"") -> int:
+        head = f"{method} {path} HTTP/1.1\r\n{self.prefix}"
+        if body:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        self.writer.write(head.encode() + b"\r\n" + body)
+        headers = await self.reader.readuntil(b"\r\n\r\n")
+        status_code = int(headers[9:12])
+        length = 0
+        for line in headers.split(b"\r\n"):
+            if line[:15].lower() == b"content-length:":
+                length = int(line[15:])
+        await self.reader.readexactly(length)
+        return status_code
+
+
+async def _drive(
+    base_url: str, task_ids: list[str], connections: int, duration: float
+) -> list[float]:
+    host, port = base_url.removeprefix("http://").split(":")
+    latencies = []
+    deadline = time.monotonic() + duration
+
+    async def worker() -> None:
+        conn = _Connection(*await asyncio.open_connection(host, int(port)), f"{host}:{port}")
+        try:
+            while time.monotonic() < deadline:
+                task_id = random.choice(task_ids)
+                roll = random.random()
+                start = time.perf_counter()
+                if roll < 0.6:
+                    status_code = await conn.request("GET", f"/tasks/{task_id}")
+                elif roll < 0.8:
+                    status_code = await conn.request("GET", "/tasks/stats")
+                else:
+                    completed = "true" if random.random() < 0.5 else "false"
+                    body = f'{{"completed": {completed}}}'.encode()
+                    status_code = await conn.request("PATCH", f"/tasks/{task_id}", body)
+                latencies.append(time.perf_counter() - start)
+                if status_code != 200:
+                    raise RuntimeError(f"unexpected status {status_code}")
+        finally:
+            conn.writer.close()
+
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    return latencies
+
+
+def _client_process(
+    base_url: str, task_ids: list[str], connections: int, duration: float
+) -> list[float]:
+    return asyncio.run(_drive(base_url, task_ids, connections, duration))
+
+
+def run(
+    target: str, backend: str, connections: int, client_procs: int, duration: float
+) -> tuple[float, float, float]:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        server = _start_server(SERVERS[target], port, _backend_env(backend, tmp))
+        try:
+            task_ids = _seed(base_url)
+            per_process = connections // client_procs
+            with multiprocessing.get_context("spawn").Pool(client_procs) as pool:
+                results = pool.starmap(
+                    _client_process,
+                    [(base_url, task_ids, per_process, duration)] * client_procs,
+                )
+        finally:
+            server.terminate()
+            server.wait()
+    latencies = [latency for result in results for latency in result]
+    percentiles = statistics.quantiles(latencies, n=100)
+    return len(latencies) / duration, percentiles[49] * 1000, percentiles[98] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--backends", nargs="+", choices=["memory", "durable", "sqlite"],
+        default=["durable", "sqlite"],
+    )
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--client-procs", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    print(f"{args.connections} concurrent connections, {args.duration:.0f}s per run")
+    print(f"{'backend':<8} {'handlers':<11} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for backend in args.backends:
+        for target in SERVERS:
+            rps, p50, p99 = run(
+                target, backend, args.connections, args.client_procs, args.duration
+            )
+            print(f"{backend:<8} {target:<11} {rps:>8.0f} {p50:>9.1f} {p99:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
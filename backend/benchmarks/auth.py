@@ -0,0 +1,73 @@
+"""
+Authentication overhead benchmark.
+
+Times one token check, the work require_auth does on every request, for the
+old fixed-token comparison, a full HS256 verification, and a hit in the
+verified-token cache; then the latency of GET /tasks/stats in-process with
+the cache and without it.
+
+Run from the backend directory:
+
+    python -m benchmarks.auth --checks 200000 --requests 2000
+"""
+import argparse
+import hmac
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import auth
+from app.tokens import CachedTokenVerifier
+
+FIXED_TOKEN = "mock-jwt-token-12345"
+
+
+def _microseconds_per_call(check, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        check()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def _request_latencies(client: TestClient, headers: dict, requests: int) -> list[float]:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get("/tasks/stats", headers=headers)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        assert response.status_code == 200
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--checks", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    token = auth.issue_token("admin")
+    cached = CachedTokenVerifier(auth.token_signer)
+    checks = {
+        "fixed token compare": lambda: hmac.compare_digest(token, FIXED_TOKEN),
+        "HS256 verify": lambda: auth.token_signer.verify(token),
+        "cached verify": lambda: cached.verify(token),
+    }
+    print(f"{'token check':<22} {'us/call':>8}")
+    for name, check in checks.items():
+        print(f"{name:<22} {_microseconds_per_call(check, args.checks):>8.2f}")
+
+    headers = {"Authorization": f"Bearer {token}"}
+    print(f"\n{'GET /tasks/stats':<22} {'p50 us':>8} {'p99 us':>8}")
+    with TestClient(app) as client:
+        for name, verifier in (("uncached", auth.token_signer), ("cached", cached)):
+            auth.token_verifier = verifier
+            _request_latencies(client, headers, args.requests // 10)
+            latencies = _request_latencies(client, headers, args.requests)
+            p99 = statistics.quantiles(latencies, n=100)[98]
+            print(f"{name:<22} {statistics.median(latencies):>8.0f} {p99:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
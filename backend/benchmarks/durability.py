@@ -0,0 +1,118 @@
+"""
+Durable in-memory storage benchmark.
+
+Reports update throughput for InMemoryStorage against DurableMemoryStorage
+(write-ahead log with group commit) at several writer thread counts, then
+the recovery time of a store holding --tasks tasks: from the log alone,
+and from a snapshot. Recovery runs in a fresh process, which reports when
+the store opened, when its indexes were ready, and its peak RSS.
+
+Run from the backend directory:
+
+    python -m benchmarks.durability --tasks 1000000
+"""
+import argparse
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from app.storage import DurableMemoryStorage, InMemoryStorage
+
+BATCH_SIZE = 5000
+
+
+def _titles(tasks: int, rng: random.Random) -> list[str]:
+    letters = string.ascii_lowercase + " "
+    return ["".join(rng.choices(letters, k=rng.randint(10, 40))) for _ in range(tasks)]
+
+
+def _updates_per_second(storage, threads: int, updates: int) -> float:
+    """Throughput of `threads` writers each updating their own tasks."""
+    task_ids = [task.id for task in storage.create_tasks([f"Task {i}" for i in range(threads)])]
+
+    def work(task_id: str) -> None:
+        for version in range(updates // threads):
+            storage.update_task(task_id, title=f"v{version}")
+
+    workers = [threading.Thread(target=work, args=(task_id,)) for task_id in task_ids]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return updates / (time.perf_counter() - start)
+
+
+def _populate(directory: str, titles: list[str]) -> DurableMemoryStorage:
+    # Large enough that nothing is snapshotted until asked
+    storage = DurableMemoryStorage(directory, snapshot_every=len(titles) + 1)
+    for start in range(0, len(titles), BATCH_SIZE):
+        storage.create_tasks(titles[start : start + BATCH_SIZE])
+    return storage
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM, unlike ru_maxrss, is not inherited from the forking parent
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def _recover(directory: str) -> None:
+    """Open the store in `directory` and print open time, index time and peak RSS."""
+    start = time.perf_counter()
+    storage = DurableMemoryStorage(directory)
+    opened = time.perf_counter() - start
+    storage.get_stats()
+    indexed = time.perf_counter() - start
+    peak = _peak_rss_mb()
+    print(f"opened {opened:.2f}s, indexed {indexed:.2f}s, peak RSS {peak:.0f} MB")
+    # Stop it without the final snapshot close() would take
+    storage._closing = True
+    storage._snapshot_wanted.set()
+    storage._snapshotter.join()
+
+
+def _recovery(directory: str) -> str:
+    command = [sys.executable, "-m", "benchmarks.durability", "--recover", directory]
+    return subprocess.run(command, capture_output=True, check=True, text=True).stdout.strip()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--recover", metavar="DIRECTORY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.recover:
+        _recover(args.recover)
+        return
+
+    print(f"{'writers':>8} {'memory/s':>12} {'durable/s':>12} {'ratio':>8}")
+    for threads in (1, 4, 16, 64):
+        volatile = _updates_per_second(InMemoryStorage(), threads, args.updates)
+        with tempfile.TemporaryDirectory() as directory:
+            durable = DurableMemoryStorage(directory)
+            logged = _updates_per_second(durable, threads, args.updates)
+            durable.close()
+        print(f"{threads:>8} {volatile:>12.0f} {logged:>12.0f} {volatile / logged:>7.1f}x")
+
+    titles = _titles(args.tasks, random.Random(42))
+    with tempfile.TemporaryDirectory() as directory:
+        storage = _populate(directory, titles)
+        print(f"\n{args.tasks} tasks")
+        print(f"recovery from log:      {_recovery(directory)}")
+        start = time.perf_counter()
+        storage.snapshot()
+        print(f"snapshot write:         {time.perf_counter() - start:.2f}s")
+        print(f"recovery from snapshot: {_recovery(directory)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Multi-worker load test.
+
+Starts uvicorn against a shared SQLite database with 1, 2, 4, ... worker
+processes and drives a mixed read/write workload at it, reporting requests
+per second for each worker count.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_workers --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app.routers.auth import issue_token
+
+# Servers inherit this process's environment, and so its AUTH_SECRET
+AUTH_HEADERS = {"Authorization": f"Bearer {issue_token('admin')}"}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(workers: int, port: int, db_path: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        STORAGE_BACKEND="sqlite",
+        SQLITE_PATH=db_path,
+        WEB_CONCURRENCY=str(workers),
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def _drive(base_url: str, task_ids: list[str], concurrency: int, duration: float) -> int:
+    completed = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal completed
+        while time.monotonic() < deadline:
+            task_id = random.choice(task_ids)
+            roll = random.random()
+            if roll < 0.6:
+                response = await client.get(f"/tasks/{task_id}")
+            elif roll < 0.8:
+                response = await client.get("/tasks/stats")
+            else:
+                response = await client.patch(
+                    f"/tasks/{task_id}", json={"completed": random.random() < 0.5}
+                )
+            response.raise_for_status()
+            completed += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=AUTH_HEADERS, limits=limits, timeout=30.0
+    ) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return completed
+
+
+def _client_process(base_url: str, task_ids: list[str], concurrency: int, duration: float) -> int:
+    return asyncio.run(_drive(base_url, task_ids, concurrency, duration))
+
+
+def run(workers: int, seed_tasks: int, client_procs: int, concurrency: int, duration: float) -> float:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = _start_server(workers, port, os.path.join(tmp, "tasks.db"))
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            with httpx.Client(base_url=base_url, headers=AUTH_HEADERS) as client:
+                task_ids = [
+                    client.post("/tasks", json={"title": f"Task {i}"}).json()["id"]
+                    for i in range(seed_tasks)
+                ]
+            with multiprocessing.get_context("spawn").Pool(client_procs) as pool:
+                counts = pool.starmap(
+                    _client_process,
+                    [(base_url, task_ids, concurrency, duration)] * client_procs,
+                )
+        finally:
+            server.terminate()
+            server.wait()
+    return sum(counts) / duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed-tasks", type=int, default=1000)
+    parser.add_argument("--client-procs", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32, help="in-flight requests per client process")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    for workers in args.workers:
+        rps = run(workers, args.seed_tasks, args.client_procs, args.concurrency, args.duration)
+        baseline = baseline or rps
+        print(f"{workers:>8} {rps:>10.0f} {rps / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
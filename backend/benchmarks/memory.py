@@ -0,0 +1,131 @@
+"""
+Task storage memory benchmark.
+
+Reports bytes per task, measured with tracemalloc, for the bare task
+representation (the Task models InMemoryStorage used to hold versus the
+TaskRecord tuples it holds now), the same for one activity log entry
+(ActivityLog models versus ActivityEntry tuples), and for a whole
+InMemoryStorage including its indexes and activity log.
+
+Run from the backend directory:
+
+    python -m benchmarks.memory --tasks 1000000
+"""
+import argparse
+import gc
+import random
+import string
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable
+from uuid import uuid4
+
+from app.models import ActivityLog, Task
+from app.storage import InMemoryStorage, TaskRecord
+from app.storage.base import to_micros
+from app.storage.memory import ActivityEntry
+
+BATCH_SIZE = 5000
+
+
+def _titles(tasks: int, rng: random.Random) -> list[str]:
+    letters = string.ascii_lowercase + " "
+    return ["".join(rng.choices(letters, k=rng.randint(10, 40))) for _ in range(tasks)]
+
+
+def _build_models(titles: list[str]) -> dict[str, Task]:
+    now = datetime.utcnow()
+    tasks = {}
+    for title in titles:
+        task = Task(id=str(uuid4()), title=title, created_at=now, updated_at=now)
+        # A write replaced created_at/updated_at sharing with model_copy
+        task = task.model_copy(update={"updated_at": now + timedelta(seconds=1)})
+        tasks[task.id] = task
+    return tasks
+
+
+def _build_records(titles: list[str]) -> dict[str, TaskRecord]:
+    now = datetime.utcnow()
+    tasks = {}
+    for title in titles:
+        record = TaskRecord(str(uuid4()), title, False, now, now)
+        record = record._replace(updated_at=now + timedelta(seconds=1))
+        tasks[record.id] = record
+    return tasks
+
+
+def _build_activity_models(titles: list[str]) -> dict[str, list[ActivityLog]]:
+    logs = {}
+    for _ in titles:
+        task_id = str(uuid4())
+        log = ActivityLog(
+            id=str(uuid4()),
+            task_id=task_id,
+            action="updated",
+            timestamp=datetime.utcnow(),
+            old_value="pending",
+            new_value="completed",
+        )
+        logs[task_id] = [log]
+    return logs
+
+
+def _build_activity_entries(titles: list[str]) -> dict[str, list[ActivityEntry]]:
+    logs = {}
+    for seq, _ in enumerate(titles, 1):
+        task_id = str(uuid4())
+        entry = ActivityEntry(
+            seq,
+            uuid4().int,
+            task_id,
+            sys.intern("updated"),
+            to_micros(datetime.utcnow()),
+            "pending",
+            "completed",
+        )
+        logs[task_id] = [entry]
+    return logs
+
+
+def _build_storage(titles: list[str]) -> InMemoryStorage:
+    storage = InMemoryStorage()
+    for start in range(0, len(titles), BATCH_SIZE):
+        storage.create_tasks(titles[start : start + BATCH_SIZE])
+    return storage
+
+
+def _bytes_per_task(build: Callable[[list[str]], object], titles: list[str]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = build(titles)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del result
+    return used / len(titles)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    # Titles are shared by every run, so only what each layout adds is counted
+    titles = _titles(args.tasks, random.Random(42))
+    workloads = {
+        "Task models (before)": _build_models,
+        "TaskRecord (after)": _build_records,
+        "ActivityLog models": _build_activity_models,
+        "ActivityEntry": _build_activity_entries,
+        "InMemoryStorage total": _build_storage,
+    }
+    print(f"{args.tasks} tasks")
+    print(f"{'layout':<24} {'bytes/task':>12}")
+    for name, build in workloads.items():
+        print(f"{name:<24} {_bytes_per_task(build, titles):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Title search latency benchmark.
+
+Builds a SearchIndex over synthetic task titles and reports query latency
+(including top-k ranking) for rare words, common words, prefixes and
+multi-word queries, against the 10 ms target. It also reports how long each
+query holds the index lock, which is how long a write to the same shard
+can be kept waiting.
+
+Run from the backend directory:
+
+    python -m benchmarks.search --tasks 1000000
+"""
+import argparse
+import itertools
+import random
+import statistics
+import threading
+import time
+
+from app.storage.search import SearchIndex, top_ranked
+
+WORDS_PER_TITLE = (2, 6)
+VOCABULARY_SIZE = 50_000
+# Queries should return in well under this with a million tasks
+TARGET_MS = 10.0
+
+
+class _TimedLock:
+    """The index's lock, recording how long each holder keeps it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.held: list[float] = []
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._acquired = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.held.append((time.perf_counter() - self._acquired) * 1000)
+        self._lock.release()
+
+
+def _vocabulary(rng: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def _build(tasks: int, rng: random.Random) -> tuple[SearchIndex, list[str]]:
+    words = _vocabulary(rng)
+    # Zipf-like: a few words are very common, most are rare
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    index = SearchIndex()
+    index.add_many(
+        (
+            f"task-{task_number}",
+            " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(*WORDS_PER_TITLE))),
+        )
+        for task_number in range(tasks)
+    )
+    return index, words
+
+
+def _time(index: SearchIndex, queries: list[str], limit: int) -> tuple[list[float], list[float]]:
+    """Each query's latency, and how long it held the index lock, in ms."""
+    lock = index._lock = _TimedLock()
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        top_ranked(index.search(query), limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, lock.held
+
+
+def _p99(timings: list[float]) -> float:
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start = time.perf_counter()
+    index, words = _build(args.tasks, rng)
+    print(f"indexed {args.tasks} titles in {time.perf_counter() - start:.1f}s")
+
+    common, rare = words[:100], words[len(words) // 2 :]
+    workloads = {
+        "rare word": [rng.choice(rare) for _ in range(args.queries)],
+        "common word": [rng.choice(common) for _ in range(args.queries)],
+        "prefix (2 chars)": [rng.choice(rare)[:2] for _ in range(args.queries)],
+        "prefix (3 chars)": [rng.choice(rare)[:3] for _ in range(args.queries)],
+        "common + rare": [
+            f"{rng.choice(common)} {rng.choice(rare)}" for _ in range(args.queries)
+        ],
+    }
+    print(f"{'query':<18} {'p50 ms':>8} {'p99 ms':>8} {'lock p99':>9}  target {TARGET_MS:g} ms")
+    for name, queries in workloads.items():
+        timings, held = _time(index, queries, args.limit)
+        p99 = _p99(timings)
+        verdict = "met" if p99 < TARGET_MS else "MISSED"
+        print(
+            f"{name:<18} {statistics.median(timings):>8.2f} {p99:>8.2f} {_p99(held):>9.2f}"
+            f"  {verdict}"
+        )
+
+
+if __name__ == "__main__":
+    main()
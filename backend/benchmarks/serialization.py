@@ -0,0 +1,77 @@
+"""
+List response serialization benchmark.
+
+Times GET /tasks returning every task, in-process through the ASGI app, for
+the route as it is now (storage records encoded by pydantic-core) and for
+the same route declared the way it used to be, building Task models for
+response_model to validate and encode.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization --tasks 50000
+"""
+import argparse
+import statistics
+import time
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Task
+from app.routers import tasks as tasks_router
+from app.routers.auth import MOCK_USERNAME, issue_token, require_auth
+from app.storage import InMemoryStorage, ShardedStorage
+
+AUTH_HEADERS = {"Authorization": f"Bearer {issue_token(MOCK_USERNAME)}"}
+BATCH_SIZE = 5000
+
+
+def _baseline_app(storage: InMemoryStorage) -> FastAPI:
+    baseline = FastAPI()
+
+    @baseline.get("/tasks", response_model=list[Task], dependencies=[Depends(require_auth)])
+    def list_tasks() -> list[Task]:
+        return [task.to_task() for task in storage.get_all_tasks()]
+
+    return baseline
+
+
+def _time(client: TestClient, requests: int) -> list[float]:
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get("/tasks", headers=AUTH_HEADERS)
+        response.raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    storage = InMemoryStorage()
+    for start in range(0, args.tasks, BATCH_SIZE):
+        count = min(BATCH_SIZE, args.tasks - start)
+        storage.create_tasks([f"Task {start + offset}" for offset in range(count)])
+    tasks_router.shards = ShardedStorage(lambda owner: InMemoryStorage(), {MOCK_USERNAME: storage})
+
+    workloads = {
+        "response_model (before)": _baseline_app(storage),
+        "records to_json (after)": app,
+    }
+    print(f"GET /tasks with {args.tasks} tasks")
+    print(f"{'serializer':<24} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, target in workloads.items():
+        with TestClient(target) as client:
+            client.get("/tasks", headers=AUTH_HEADERS)  # warm up
+            timings = sorted(_time(client, args.requests))
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{name:<24} {statistics.median(timings):>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Storage and route benchmark suite with regression gating.
+
+Seeds each backend with --sizes tasks, then measures the throughput of
+create, list (a page of 100), stats, patch, activity (one task's log) and
+delete, first on the Storage API directly and then as HTTP requests to the
+app through an in-process ASGI client, which also times auth (a request
+rejected by require_auth). Each operation runs for --min-time seconds per
+repeat and the best of --repeats is kept. Titles, and the tasks operated
+on, come from --seed. Tasks a repeat creates are deleted before the next,
+and patch and activity touch separate tasks, so every repeat sees the
+same dataset.
+
+Results are written as JSON to --output. With --baseline, each result's
+throughput is compared to the one stored there. The backends and sizes of
+results that fell by more than --threshold are measured again (--confirm
+times, keeping the best), and if any result still has, the run exits with
+status 1. Best-of-repeats and the second measurement are there because a
+shared machine's speed wanders by tens of percent for seconds at a time;
+a real regression survives both. Baselines are machine-specific: record
+one on the machine that will be gated, e.g.
+
+    python -m benchmarks.suite --output benchmarks/baseline.json
+
+Run from the backend directory:
+
+    python -m benchmarks.suite --sizes 1000 1000000 --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from itertools import accumulate
+from typing import Awaitable, Callable, Iterator
+
+import httpx
+
+from app.main import app
+from app.routers import tasks as tasks_router
+from app.routers.auth import MOCK_USERNAME, issue_token
+from app.storage import (
+    DurableMemoryStorage,
+    InMemoryStorage,
+    ShardedStorage,
+    SQLiteStorage,
+    Storage,
+    TaskQuery,
+)
+
+AUTH_HEADERS = {"Authorization": f"Bearer {issue_token(MOCK_USERNAME)}"}
+# Well-formed, but signed with the wrong key
+FORGED_HEADERS = {"Authorization": f"Bearer {issue_token(MOCK_USERNAME)[:-4]}AAAA"}
+BATCH_SIZE = 5000
+PAGE_SIZE = 100
+VOCABULARY_SIZE = 5000
+BACKENDS = ("memory", "durable", "sqlite")
+
+
+def _titles(tasks: int, rng: random.Random) -> list[str]:
+    """Titles of 2-6 words from a fixed vocabulary, common words drawn most often.
+
+    Strings of random letters would make nearly every token new to the
+    search index, which real titles are not.
+    """
+    vocabulary = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+        for _ in range(VOCABULARY_SIZE)
+    ]
+    weights = list(accumulate(1 / rank for rank in range(1, VOCABULARY_SIZE + 1)))
+    return [
+        " ".join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(2, 6)))
+        for _ in range(tasks)
+    ]
+
+
+def _open(backend: str, directory: str) -> Storage:
+    if backend == "durable":
+        return DurableMemoryStorage(os.path.join(directory, "data"))
+    if backend == "sqlite":
+        return SQLiteStorage(os.path.join(directory, "tasks.db"))
+    return InMemoryStorage()
+
+
+def _seed(storage: Storage, titles: list[str]) -> list[str]:
+    task_ids = []
+    for start in range(0, len(titles), BATCH_SIZE):
+        batch = storage.create_tasks(titles[start : start + BATCH_SIZE])
+        task_ids.extend(task.id for task in batch)
+    return task_ids
+
+
+class _Workload:
+    """The tasks operations act on, drawn the same way on every run.
+
+    Patches go to the first half of the seeded tasks and activity reads to
+    the second, so reads do not slow down as patches grow activity logs.
+    Tasks made by create are the ones delete removes.
+    """
+
+    def __init__(self, task_ids: list[str], seed: int):
+        half = len(task_ids) // 2
+        self.patched = task_ids[:half]
+        self.read = task_ids[half:]
+        self.created: list[str] = []
+        self.rng = random.Random(seed)
+        self.count = 0
+
+    def patch_target(self) -> str:
+        return self.rng.choice(self.patched)
+
+    def read_target(self) -> str:
+        return self.rng.choice(self.read)
+
+    def title(self) -> str:
+        self.count += 1
+        return f"Benchmark task {self.count}"
+
+
+def _storage_operations(storage: Storage, work: _Workload) -> dict[str, Callable[[], None]]:
+    def create() -> None:
+        work.created.append(storage.create_task(work.title()).id)
+
+    def patch() -> None:
+        storage.update_task(work.patch_target(), completed=work.rng.random() < 0.5)
+
+    return {
+        "create": create,
+        "list": lambda: storage.query_tasks(TaskQuery(), PAGE_SIZE),
+        "stats": storage.get_stats,
+        "patch": patch,
+        "activity": lambda: storage.get_task_activity(work.read_target()),
+        "delete": lambda: storage.delete_task(work.created.pop()),
+    }
+
+
+def _http_operations(
+    client: httpx.AsyncClient, work: _Workload
+) -> dict[str, Callable[[], Awaitable[None]]]:
+    async def request(method: str, url: str, expected: int, **kwargs) -> httpx.Response:
+        response = await client.request(method, url, **kwargs)
+        if response.status_code != expected:
+            raise RuntimeError(f"{method} {url} answered {response.status_code}")
+        return response
+
+    async def create() -> None:
+        response = await request("POST", "/tasks", 201, json={"title": work.title()})
+        work.created.append(response.json()["id"])
+
+    async def patch() -> None:
+        body = {"completed": work.rng.random() < 0.5}
+        await request("PATCH", f"/tasks/{work.patch_target()}", 200, json=body)
+
+    return {
+        "create": create,
+        "list": lambda: request("GET", f"/tasks?limit={PAGE_SIZE}", 200),
+        "stats": lambda: request("GET", "/tasks/stats", 200),
+        "patch": patch,
+        "activity": lambda: request("GET", f"/tasks/{work.read_target()}/activity", 200),
+        "auth": lambda: request("GET", "/tasks/stats", 401, headers=FORGED_HEADERS),
+        "delete": lambda: request("DELETE", f"/tasks/{work.created.pop()}", 204),
+    }
+
+
+def _calls(name: str, work: _Workload, min_time: float) -> Iterator[None]:
+    """Yield once per call to make, for `min_time` (delete also stops when out of tasks)."""
+    deadline = time.perf_counter() + min_time
+    while time.perf_counter() < deadline and (name != "delete" or work.created):
+        yield None
+
+
+def _restore(storage: Storage, work: _Workload) -> None:
+    """Delete, untimed, the tasks a repeat created and did not get to delete."""
+    storage.delete_tasks(work.created)
+    work.created.clear()
+
+
+def _summary(runs: list[list[float]]) -> dict:
+    """Best-of-repeats throughput, and latency percentiles over every call."""
+    latencies = sorted(latency for run in runs for latency in run)
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "ops_per_sec": round(max(len(run) / sum(run) for run in runs), 1),
+        "p50_us": round(percentiles[49] * 1e6, 1),
+        "p99_us": round(percentiles[98] * 1e6, 1),
+    }
+
+
+def _bench_storage(storage: Storage, work: _Workload, repeats: int, min_time: float) -> dict:
+    operations = _storage_operations(storage, work)
+    runs: dict[str, list[list[float]]] = {name: [] for name in operations}
+    for _ in range(repeats):
+        for name, operation in operations.items():
+            latencies = []
+            for _ in _calls(name, work, min_time):
+                start = time.perf_counter()
+                operation()
+                latencies.append(time.perf_counter() - start)
+            runs[name].append(latencies)
+        _restore(storage, work)
+    return {name: _summary(results) for name, results in runs.items()}
+
+
+async def _bench_http(storage: Storage, work: _Workload, repeats: int, min_time: float) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", headers=AUTH_HEADERS
+    ) as client:
+        operations = _http_operations(client, work)
+        runs: dict[str, list[list[float]]] = {name: [] for name in operations}
+        for _ in range(repeats):
+            for name, operation in operations.items():
+                latencies = []
+                for _ in _calls(name, work, min_time):
+                    start = time.perf_counter()
+                    await operation()
+                    latencies.append(time.perf_counter() - start)
+                runs[name].append(latencies)
+            _restore(storage, work)
+    return {name: _summary(results) for name, results in runs.items()}
+
+
+def run(backend: str, size: int, seed: int, repeats: int, min_time: float) -> list[dict]:
+    """Every operation's result for `backend` seeded with `size` tasks, on both layers."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = _open(backend, tmp)
+        routed_shards = tasks_router.shards
+        try:
+            task_ids = _seed(storage, _titles(size, random.Random(seed)))
+            # Seeded objects never become garbage; keep collections from rescanning them
+            gc.collect()
+            gc.freeze()
+            layers = {
+                "storage": lambda work: _bench_storage(storage, work, repeats, min_time),
+                "http": lambda work: asyncio.run(_bench_http(storage, work, repeats, min_time)),
+            }
+            tasks_router.shards = ShardedStorage(
+                lambda owner: InMemoryStorage(), {MOCK_USERNAME: storage}
+            )
+            for layer, bench in layers.items():
+                for operation, summary in bench(_Workload(task_ids, seed)).items():
+                    results.append(
+                        {
+                            "layer": layer,
+                            "backend": backend,
+                            "operation": operation,
+                            "size": size,
+                            **summary,
+                        }
+                    )
+        finally:
+            tasks_router.shards = routed_shards
+            gc.unfreeze()
+            storage.close()
+    return results
+
+
+def _key(result: dict) -> tuple:
+    return result["layer"], result["backend"], result["operation"], result["size"]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[tuple]:
+    """Print each result against the baseline; return the keys of those that regressed."""
+    for field in ("python", "platform", "cpus"):
+        if results["environment"][field] != baseline["environment"][field]:
+            print(
+                f"warning: baseline was recorded with {field}="
+                f"{baseline['environment'][field]!r}, this run has "
+                f"{results['environment'][field]!r}"
+            )
+    recorded = {_key(result): result for result in baseline["results"]}
+    regressions = []
+    print(f"\n{'layer':<8} {'backend':<8} {'operation':<9} {'size':>8} "
+          f"{'baseline':>10} {'ops/s':>10} {'change':>8}")
+    for result in results["results"]:
+        layer, backend, operation, size = _key(result)
+        row = f"{layer:<8} {backend:<8} {operation:<9} {size:>8}"
+        before = recorded.get(_key(result))
+        if before is None:
+            print(f"{row} {'-':>10} {result['ops_per_sec']:>10.0f}      new")
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        regressed = change < -threshold
+        print(
+            f"{row} {before['ops_per_sec']:>10.0f} {result['ops_per_sec']:>10.0f} "
+            f"{change:>+8.0%}{'  REGRESSED' if regressed else ''}"
+        )
+        if regressed:
+            regressions.append(_key(result))
+    return regressions
+
+
+def _print_result(result: dict) -> None:
+    print(
+        f"{result['layer']:<8} {result['backend']:<8} {result['operation']:<9} "
+        f"{result['size']:>8} {result['ops_per_sec']:>10.0f} {result['p50_us']:>9.1f} "
+        f"{result['p99_us']:>9.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="seconds per operation per repeat"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results JSON to gate against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="largest tolerated fall in throughput, as a fraction of the baseline",
+    )
+    parser.add_argument(
+        "--confirm", type=int, default=1,
+        help="times to measure regressions again, keeping the best, before failing",
+    )
+    args = parser.parse_args()
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {"repeats": args.repeats, "min_time": args.min_time, "seed": args.seed},
+        "results": [],
+    }
+    print(f"{'layer':<8} {'backend':<8} {'operation':<9} {'size':>8} "
+          f"{'ops/s':>10} {'p50 us':>9} {'p99 us':>9}")
+    for backend in args.backends:
+        for size in args.sizes:
+            for result in run(backend, size, args.seed, args.repeats, args.min_time):
+                results["results"].append(result)
+                _print_result(result)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for attempt in range(args.confirm):
+            if not regressions:
+                break
+            print(f"\nmeasuring regressions again ({attempt + 1}/{args.confirm})")
+            latest = {_key(result): result for result in results["results"]}
+            for backend, size in sorted({(key[1], key[3]) for key in regressions}):
+                for result in run(backend, size, args.seed, args.repeats, args.min_time):
+                    if result["ops_per_sec"] > latest[_key(result)]["ops_per_sec"]:
+                        latest[_key(result)] = result
+                        _print_result(result)
+            results["results"] = list(latest.values())
+            regressions = compare(results, baseline, args.threshold)
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+        file.write("\n")
+    print(f"results written to {args.output}")
+    if regressions:
+        print(f"\n{len(regressions)} regressed by more than {args.threshold:.0%}:")
+        for layer, backend, operation, size in regressions:
+            print(f"  {layer} {backend} {operation} at {size} tasks")
+        sys.exit(1)
+    if args.baseline:
+        print(f"\nno throughput regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,58 @@
+import os
+import secrets
+
 import pytest
 from fastapi.testclient import TestClient
 
+# The app refuses to start without a signing key
+os.environ.setdefault("AUTH_SECRET", secrets.token_hex(32))
+
 from app.main import app
-from app.storage import storage
+from app.routers.auth import MOCK_USERNAME
+from app.storage import DurableMemoryStorage, InMemoryStorage, ShardedStorage, SQLiteStorage
+
+STORAGE_BACKENDS = ["memory", "durable", "sqlite"]
+
+# Every module that binds the global shards instance at import time
+SHARDS_REFERENCES = [
+    "app.storage.shards",
+    "app.routers.tasks.shards",
+    "app.routers.metrics.shards",
+]
+
+
+def _backend_factory(kind: str, tmp_path):
+    def build(owner: str):
+        if kind == "sqlite":
+            backend = SQLiteStorage(str(tmp_path / f"{owner}.db"))
+        elif kind == "durable":
+            backend = DurableMemoryStorage(str(tmp_path / owner))
+        else:
+            backend = InMemoryStorage()
+        backend.check_consistency = True
+        return backend
+
+    return build
+
+
+@pytest.fixture(params=STORAGE_BACKENDS)
+def shards(request, tmp_path, monkeypatch):
+    """Fresh per-owner shards of one backend kind, installed as the app's global."""
+    sharded = ShardedStorage(_backend_factory(request.param, tmp_path))
+    for reference in SHARDS_REFERENCES:
+        monkeypatch.setattr(reference, sharded)
+    yield sharded
+    sharded.close()
+
+
+@pytest.fixture
+def storage(shards):
+    """The shard of the user the tests authenticate as, for each backend."""
+    return shards.shard(MOCK_USERNAME)
 
 
 @pytest.fixture
-def client():
-    """Create a test client and clear storage before each test."""
-    storage.clear()
+def client(storage):
+    """Create a test client backed by a fresh storage instance."""
     with TestClient(app) as test_client:
         yield test_client
@@ -0,0 +1,151 @@
+from datetime import datetime
+
+from app.routers.auth import issue_token
+from app.storage import ActivityQuery, ActivityRetention, InMemoryStorage
+
+AUTH_TOKEN = issue_token("admin")
+AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+
+
+def _create(client, title: str) -> str:
+    return client.post("/tasks", json={"title": title}, headers=AUTH_HEADERS).json()["id"]
+
+
+def _pages(client, url: str, **params) -> list[list[dict]]:
+    """Follow X-Next-Cursor from the first page to the last."""
+    pages = []
+    while True:
+        response = client.get(url, params=params, headers=AUTH_HEADERS)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+        params = {**params, "cursor": cursor}
+
+
+def test_task_activity_pages(client):
+    """Paging a task's activity returns every entry once, in order."""
+    task_id = _create(client, "v0")
+    for version in range(1, 7):
+        client.patch(f"/tasks/{task_id}", json={"title": f"v{version}"}, headers=AUTH_HEADERS)
+
+    everything = client.get(f"/tasks/{task_id}/activity", headers=AUTH_HEADERS).json()
+    pages = _pages(client, f"/tasks/{task_id}/activity", limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [log for page in pages for log in page] == everything
+
+
+def test_task_activity_filters(client):
+    """since is inclusive, until exclusive, and action matches exactly."""
+    task_id = _create(client, "v0")
+    for version in range(1, 5):
+        client.patch(f"/tasks/{task_id}", json={"title": f"v{version}"}, headers=AUTH_HEADERS)
+    client.put(f"/tasks/{task_id}/complete", headers=AUTH_HEADERS)
+    everything = client.get(f"/tasks/{task_id}/activity", headers=AUTH_HEADERS).json()
+    since, until = everything[2]["timestamp"], everything[4]["timestamp"]
+
+    response = client.get(
+        f"/tasks/{task_id}/activity", params={"since": since, "until": until}, headers=AUTH_HEADERS
+    )
+    assert response.json() == [log for log in everything if since <= log["timestamp"] < until]
+
+    response = client.get(
+        f"/tasks/{task_id}/activity", params={"action": "updated"}, headers=AUTH_HEADERS
+    )
+    assert [log["new_value"] for log in response.json()] == ["v1", "v2", "v3", "v4"]
+
+
+def test_task_activity_aware_bounds(client):
+    """Timezone-aware bounds are compared in UTC."""
+    task_id = _create(client, "Task")
+    response = client.get(
+        f"/tasks/{task_id}/activity",
+        params={"since": "2000-01-01T05:00:00+05:00"},
+        headers=AUTH_HEADERS,
+    )
+    assert [log["action"] for log in response.json()] == ["created"]
+    response = client.get(
+        f"/tasks/{task_id}/activity",
+        params={"until": "2000-01-01T05:00:00+05:00"},
+        headers=AUTH_HEADERS,
+    )
+    assert response.json() == []
+
+
+def test_task_activity_not_found(client):
+    """Unknown tasks are a 404 with or without paging."""
+    for params in ({}, {"limit": 5}, {"action": "created"}):
+        response = client.get("/tasks/missing/activity", params=params, headers=AUTH_HEADERS)
+        assert response.status_code == 404
+
+
+def test_activity_invalid_cursor(client):
+    """Malformed cursors are rejected with 400 on both endpoints."""
+    task_id = _create(client, "Task")
+    for url in (f"/tasks/{task_id}/activity", "/activity"):
+        response = client.get(url, params={"cursor": "not-a-cursor"}, headers=AUTH_HEADERS)
+        assert response.status_code == 400
+
+
+def test_activity_feed_requires_auth(client):
+    """The global feed is protected like the task endpoints."""
+    assert client.get("/activity").status_code == 403
+
+
+def test_activity_feed_spans_tasks(client):
+    """The feed interleaves every task's activity, deleted tasks included."""
+    first = _create(client, "First")
+    second = _create(client, "Second")
+    client.put(f"/tasks/{first}/complete", headers=AUTH_HEADERS)
+    client.delete(f"/tasks/{second}", headers=AUTH_HEADERS)
+
+    feed = client.get("/activity", headers=AUTH_HEADERS).json()
+    assert [(log["task_id"], log["action"]) for log in feed] == [
+        (first, "created"),
+        (second, "created"),
+        (first, "completed"),
+        (second, "deleted"),
+    ]
+    pages = _pages(client, "/activity", limit=1)
+    assert [log for page in pages for log in page] == feed
+    deleted = client.get("/activity", params={"action": "deleted"}, headers=AUTH_HEADERS).json()
+    assert [log["task_id"] for log in deleted] == [second]
+
+
+def test_activity_feed_etag(client):
+    """The feed revalidates against the global revision."""
+    _create(client, "Task")
+    response = client.get("/activity", headers=AUTH_HEADERS)
+    etag = response.headers["ETag"]
+    cached = client.get("/activity", headers={**AUTH_HEADERS, "If-None-Match": etag})
+    assert cached.status_code == 304
+    _create(client, "Another")
+    fresh = client.get("/activity", headers={**AUTH_HEADERS, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert len(fresh.json()) == 2
+
+
+def test_activity_feed_skips_dropped_entries(storage):
+    """Entries retention drops from a task's log leave the feed too."""
+    storage.retention = ActivityRetention(max_per_task=2)
+    task = storage.create_task("v0")
+    for version in range(1, 5):
+        storage.update_task(task.id, title=f"v{version}")
+
+    feed, next_seq = storage.query_activity(ActivityQuery())
+    assert next_seq is None
+    assert feed == storage.get_task_activity(task.id)
+    assert [log.new_value for log in feed] == ["v3", "v4"]
+
+
+def test_memory_feed_compacts():
+    """The in-memory feed rebuilds once most of its entries were dropped."""
+    storage = InMemoryStorage(retention=ActivityRetention(max_per_task=1))
+    task = storage.create_task("v0")
+    for version in range(1, 100):
+        storage.update_task(task.id, title=f"v{version}")
+
+    assert len(storage._activity) < 10
+    feed, _ = storage.query_activity(ActivityQuery(until=datetime.utcnow()))
+    assert [log.new_value for log in feed] == ["v99"]
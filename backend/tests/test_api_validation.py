@@ -8,18 +8,17 @@ The -s flag shows print output for visibility into test values.
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
-from app.storage import storage
+from app.routers.auth import issue_token, token_signer
 
 
 # Auth token for authenticated requests
-AUTH_TOKEN = "mock-jwt-token-12345"
+AUTH_TOKEN = issue_token("admin")
 AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
 
 
 @pytest.fixture
-def client():
-    """Create a test client and clear storage before each test."""
-    storage.clear()
+def client(storage):
+    """Create a test client backed by a fresh storage instance."""
     with TestClient(app) as test_client:
         yield test_client
 
@@ -36,7 +35,7 @@ class TestAuthLogin:
         assert response.status_code == 200, f"Expected 200, got {response.status_code}"
         data = response.json()
         assert "token" in data, "Response should contain 'token'"
-        assert data["token"] == "mock-jwt-token-12345", f"Token mismatch: {data['token']}"
+        assert token_signer.verify(data["token"])["sub"] == "admin", "Token should be signed"
         assert data["message"] == "Login successful", f"Message mismatch: {data['message']}"
         print("✓ Login successful with valid credentials")
 
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from app.storage import ActivityQuery, DurableMemoryStorage, InMemoryStorage, TaskQuery
+from app.storage.wal import WriteAheadLog
+
+
+def test_async_api_matches_sync(storage):
+    """Every async call sees and makes the same changes as its sync namesake."""
+    aio = storage.aio
+
+    async def scenario():
+        first, second, third = await aio.create_tasks(["Buy milk", "Walk dog", "Write report"])
+        assert await aio.get_task(first.id) == storage.get_task(first.id)
+        assert (await aio.update_task(first.id, title="Buy oat milk")).title == "Buy oat milk"
+        assert (await aio.complete_task(second.id)).completed
+        assert await aio.delete_task(third.id)
+        assert await aio.delete_tasks([third.id]) == [False]
+        assert await aio.update_tasks([(third.id, "Gone", None)]) == [None]
+        assert await aio.task_revision(first.id) == storage.task_revision(first.id)
+        page, after = await aio.query_tasks(TaskQuery(), limit=1)
+        assert page == storage.query_tasks(TaskQuery(), 1)[0] and after is not None
+        assert await aio.get_all_tasks() == storage.get_all_tasks()
+        found, _ = await aio.search_tasks("milk", 10)
+        assert [task.id for task in found] == [first.id]
+        assert await aio.get_task_activity(first.id) == storage.get_task_activity(first.id)
+        feed, _ = await aio.query_activity(ActivityQuery())
+        assert feed == storage.query_activity(ActivityQuery())[0]
+        events = await aio.events_since(0, 100)
+        assert [event.action for event in events][-1] == "deleted"
+        return await aio.get_stats(), await aio.revision()
+
+    stats, revision = asyncio.run(scenario())
+    assert (stats.total, stats.completed) == (2, 1)
+    assert revision == storage.revision()
+    assert storage.aio.sync is storage and storage.aio.epoch == storage.epoch
+
+
+def test_concurrent_async_writes_share_fsyncs(tmp_path, monkeypatch):
+    """Writes awaited together are durable after a few flushes, not one each."""
+    fsyncs = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (fsyncs.append(fd), fsync(fd)))
+    storage = DurableMemoryStorage(str(tmp_path))
+    tasks = storage.create_tasks([f"Task {i}" for i in range(200)])
+    fsyncs.clear()
+
+    async def update_all():
+        return await asyncio.gather(
+            *(storage.aio.update_task(task.id, title="done") for task in tasks)
+        )
+
+    assert all(task.title == "done" for task in asyncio.run(update_all()))
+    assert 1 <= len(fsyncs) < len(tasks) / 2
+    storage._wal._file.close()  # crash: no final snapshot
+
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert {task.title for task in recovered.get_all_tasks()} == {"done"}
+    recovered.close()
+
+
+def test_log_failure_fails_async_waiters(tmp_path, monkeypatch):
+    log = WriteAheadLog(str(tmp_path), 1)
+    ticket = log.append(("record",))
+
+    def fail(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "fsync", fail)
+
+    async def wait():
+        await log.wait_async(ticket)
+
+    with pytest.raises(OSError, match="write-ahead log failed"):
+        asyncio.run(wait())
+    # Later writes cannot be acknowledged either
+    with pytest.raises(OSError, match="write-ahead log failed"):
+        asyncio.run(wait())
+    log.close()
+
+
+def test_closed_log_refuses_writes(tmp_path):
+    """A closed log raises rather than queueing records no flusher will write."""
+    log = WriteAheadLog(str(tmp_path), 1)
+    ticket = log.append(("record",))
+    log.close()
+    # Records appended before close() were flushed by it
+    asyncio.run(log.wait_async(ticket))
+    log.wait(ticket)
+    with pytest.raises(ValueError, match="closed"):
+        log.append(("late",))
+    with pytest.raises(ValueError, match="closed"):
+        asyncio.run(log.wait_async(ticket + 1))
+    with pytest.raises(ValueError, match="closed"):
+        log.wait(ticket + 1)
+
+
+def test_contended_calls_leave_the_event_loop_free():
+    """Writes and stats waiting on a lock held elsewhere wait on a thread, not the loop."""
+    storage = InMemoryStorage()
+    held = threading.Event()
+
+    def hold_lock():
+        # As a long search or a snapshot would
+        with storage._shared_lock:
+            held.set()
+            time.sleep(0.3)
+
+    async def scenario():
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        await asyncio.to_thread(held.wait)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        calls = asyncio.gather(storage.aio.create_task("Waits"), storage.aio.get_stats())
+        await asyncio.sleep(0.05)
+        # The loop ran on while both calls waited for the lock
+        assert loop.time() - start < 0.2
+        assert not calls.done()
+        created, _ = await calls
+        assert created.title == "Waits"
+        assert (await storage.aio.get_stats()).total == 1
+        holder.join()
+
+    asyncio.run(scenario())
@@ -1,3 +1,27 @@
+import pytest
+
+from app.routers.auth import DEV_AUTH_SECRET, issue_token, signing_key, token_signer
+from app.tokens import CachedTokenVerifier, HMACTokenVerifier, InvalidTokenError
+
+
+class _Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _CountingVerifier:
+    def __init__(self, verifier):
+        self.verifier = verifier
+        self.calls = 0
+
+    def verify(self, token: str) -> dict:
+        self.calls += 1
+        return self.verifier.verify(token)
+
+
 def test_login_success(client):
     """POST /auth/login with valid credentials returns token."""
     response = client.post(
@@ -7,7 +31,7 @@ def test_login_success(client):
     assert response.status_code == 200
     data = response.json()
     assert "token" in data
-    assert data["token"] == "mock-jwt-token-12345"
+    assert token_signer.verify(data["token"])["sub"] == "admin"
     assert data["message"] == "Login successful"
 
 
@@ -41,3 +65,121 @@ def test_login_missing_fields(client):
 
     response = client.post("/auth/login", json={"password": "password"})
     assert response.status_code == 422
+
+
+def test_issued_token_grants_access(client):
+    """A token from /auth/login is accepted by the task endpoints."""
+    token = client.post("/auth/login", json={"username": "admin", "password": "password"})
+    headers = {"Authorization": f"Bearer {token.json()['token']}"}
+    assert client.get("/tasks", headers=headers).status_code == 200
+
+
+def test_forged_and_tampered_tokens_rejected(client):
+    """Tokens signed with another key, or altered after signing, get 401."""
+    forged = HMACTokenVerifier(b"another secret").issue("admin")
+    header, payload, signature = issue_token("admin").split(".")
+    tampered = f"{header}.{HMACTokenVerifier(b'x').issue('root').split('.')[1]}.{signature}"
+    for token in (forged, tampered, "mock-jwt-token-12345", "a.b.c"):
+        response = client.get("/tasks", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
+    with pytest.raises(InvalidTokenError):
+        token_signer.verify("é.é.é")
+
+
+def test_expired_token_rejected():
+    clock = _Clock()
+    signer = HMACTokenVerifier(b"secret", ttl=60, clock=clock)
+    token = signer.issue("admin")
+    assert signer.verify(token)["exp"] == clock.now + 60
+    clock.now += 60
+    with pytest.raises(InvalidTokenError):
+        signer.verify(token)
+
+
+def test_cache_verifies_each_token_once():
+    clock = _Clock()
+    inner = _CountingVerifier(HMACTokenVerifier(b"secret", ttl=3600, clock=clock))
+    cache = CachedTokenVerifier(inner, ttl=60, clock=clock)
+    token = HMACTokenVerifier(b"secret", clock=clock).issue("admin")
+    for _ in range(3):
+        assert cache.verify(token)["sub"] == "admin"
+    assert inner.calls == 1
+    # Cached claims are re-verified once the cache TTL passes
+    clock.now += 61
+    cache.verify(token)
+    assert inner.calls == 2
+
+
+def test_cache_never_outlives_the_token():
+    clock = _Clock()
+    signer = HMACTokenVerifier(b"secret", ttl=10, clock=clock)
+    cache = CachedTokenVerifier(signer, ttl=60, clock=clock)
+    token = signer.issue("admin")
+    cache.verify(token)
+    clock.now += 10
+    with pytest.raises(InvalidTokenError):
+        cache.verify(token)
+
+
+def test_cache_is_bounded_lru():
+    signer = HMACTokenVerifier(b"secret")
+    inner = _CountingVerifier(signer)
+    cache = CachedTokenVerifier(inner, max_size=2)
+    first, second, third = (signer.issue(f"user{i}") for i in range(3))
+    cache.verify(first)
+    cache.verify(second)
+    cache.verify(first)
+    cache.verify(third)
+    assert inner.calls == 3
+    # second was least recently used, so it was evicted; first was not
+    cache.verify(first)
+    assert inner.calls == 3
+    cache.verify(second)
+    assert inner.calls == 4
+
+
+def test_revoked_token_is_evicted():
+    signer = HMACTokenVerifier(b"secret")
+    cache = CachedTokenVerifier(signer)
+    token, other = signer.issue("admin"), signer.issue("admin")
+    cache.verify(token)
+    cache.revoke(token)
+    with pytest.raises(InvalidTokenError):
+        cache.verify(token)
+    assert cache.verify(other)["sub"] == "admin"
+
+
+def test_logout_revokes_bearer_token(client):
+    """POST /auth/logout revokes the token it was called with."""
+    headers = {"Authorization": f"Bearer {issue_token('admin')}"}
+    assert client.get("/tasks", headers=headers).status_code == 200
+    assert client.post("/auth/logout", headers=headers).status_code == 204
+    assert client.get("/tasks", headers=headers).status_code == 401
+
+
+def test_browser_logout_revokes_cookie(client):
+    """GET /auth/logout revokes the session cookie's token before clearing it."""
+    response = client.post(
+        "/auth/session",
+        json={"username": "admin", "password": "password"},
+        follow_redirects=False,
+    )
+    token = response.cookies["auth_token"]
+    client.get("/auth/logout", follow_redirects=False)
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/tasks", headers=headers).status_code == 401
+
+
+def test_signing_key_requires_a_secret(monkeypatch, caplog):
+    """Without $AUTH_SECRET the app refuses to start unless dev mode is explicit."""
+    monkeypatch.delenv("AUTH_SECRET", raising=False)
+    monkeypatch.delenv("AUTH_DEV_MODE", raising=False)
+    with pytest.raises(ValueError, match="AUTH_SECRET"):
+        signing_key()
+
+    monkeypatch.setenv("AUTH_DEV_MODE", "1")
+    assert signing_key() == DEV_AUTH_SECRET.encode()
+    assert "public development key" in caplog.text
+
+    monkeypatch.setenv("AUTH_SECRET", "s3cret")
+    assert signing_key() == b"s3cret"
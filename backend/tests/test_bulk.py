@@ -0,0 +1,92 @@
+from app.routers.auth import issue_token
+from app.schemas import MAX_BULK_OPERATIONS
+
+AUTH_TOKEN = issue_token("admin")
+AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+
+
+def test_bulk_create(client):
+    """POST /tasks/bulk creates every task and returns per-item results."""
+    response = client.post(
+        "/tasks/bulk",
+        json=[{"title": "One"}, {"title": "  Two  "}],
+        headers=AUTH_HEADERS,
+    )
+    assert response.status_code == 201
+    results = response.json()
+    assert [r["status"] for r in results] == [201, 201]
+    assert [r["task"]["title"] for r in results] == ["One", "Two"]
+    assert all(r["id"] == r["task"]["id"] for r in results)
+
+    stats = client.get("/tasks/stats", headers=AUTH_HEADERS).json()
+    assert stats["total"] == 2
+
+    activity = client.get(f"/tasks/{results[0]['id']}/activity", headers=AUTH_HEADERS).json()
+    assert [log["action"] for log in activity] == ["created"]
+
+
+def test_bulk_create_rejects_invalid_item(client):
+    """POST /tasks/bulk validates every item and creates nothing on error."""
+    response = client.post(
+        "/tasks/bulk", json=[{"title": "Fine"}, {"title": "  "}], headers=AUTH_HEADERS
+    )
+    assert response.status_code == 422
+    assert client.get("/tasks", headers=AUTH_HEADERS).json() == []
+
+
+def test_bulk_create_limits(client):
+    """POST /tasks/bulk rejects empty and oversized batches."""
+    response = client.post("/tasks/bulk", json=[], headers=AUTH_HEADERS)
+    assert response.status_code == 422
+
+    too_many = [{"title": "x"}] * (MAX_BULK_OPERATIONS + 1)
+    response = client.post("/tasks/bulk", json=too_many, headers=AUTH_HEADERS)
+    assert response.status_code == 422
+
+
+def test_bulk_update(client):
+    """PATCH /tasks/bulk applies each update and reports missing ids as 404."""
+    created = client.post(
+        "/tasks/bulk", json=[{"title": "A"}, {"title": "B"}], headers=AUTH_HEADERS
+    ).json()
+    a, b = (item["id"] for item in created)
+
+    response = client.patch(
+        "/tasks/bulk",
+        json=[
+            {"id": a, "completed": True},
+            {"id": "missing", "title": "Nope"},
+            {"id": b, "title": "B2"},
+        ],
+        headers=AUTH_HEADERS,
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["status"] for r in results] == [200, 404, 200]
+    assert results[0]["task"]["completed"] is True
+    assert "not found" in results[1]["detail"].lower()
+    assert results[2]["task"]["title"] == "B2"
+
+    stats = client.get("/tasks/stats", headers=AUTH_HEADERS).json()
+    assert stats == {"total": 2, "completed": 1, "pending": 1}
+
+
+def test_bulk_delete(client):
+    """DELETE /tasks/bulk removes existing tasks and reports missing ids as 404."""
+    created = client.post(
+        "/tasks/bulk", json=[{"title": "A"}, {"title": "B"}], headers=AUTH_HEADERS
+    ).json()
+    a, b = (item["id"] for item in created)
+
+    response = client.request(
+        "DELETE", "/tasks/bulk", json=[a, "missing", b], headers=AUTH_HEADERS
+    )
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()] == [204, 404, 204]
+    assert client.get("/tasks", headers=AUTH_HEADERS).json() == []
+
+
+def test_bulk_requires_auth(client):
+    """Bulk endpoints are behind the same auth as the rest of /tasks."""
+    response = client.post("/tasks/bulk", json=[{"title": "x"}])
+    assert response.status_code == 403
@@ -0,0 +1,179 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CODECS, CompressionCache, CompressionMiddleware, negotiate
+from app.routers.auth import issue_token
+
+AUTH_TOKEN = issue_token("admin")
+AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+
+
+def _populate(client, count: int = 30) -> None:
+    for i in range(count):
+        client.post("/tasks", json={"title": f"Task number {i}"}, headers=AUTH_HEADERS)
+
+
+def _get(client, url: str, encoding: str, **headers):
+    return client.get(url, headers={**AUTH_HEADERS, "Accept-Encoding": encoding, **headers})
+
+
+def test_negotiate_prefers_highest_quality_then_server_order():
+    assert negotiate("") is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip").name == "gzip"
+    assert negotiate("gzip;q=0.5, deflate").name == "gzip"
+    assert negotiate("gzip;q=0, deflate") is None
+    assert negotiate("*").name == next(iter(CODECS))
+    assert negotiate("*;q=0.5, gzip").name == "gzip"
+    assert negotiate("GZIP; q=0.8").name == "gzip"
+
+
+def test_large_list_is_compressed(client):
+    """A full list goes out gzipped, decoding to the identity body, with a weak ETag."""
+    _populate(client)
+    plain = _get(client, "/tasks", "identity")
+    response = _get(client, "/tasks", "gzip")
+
+    assert "content-encoding" not in plain.headers
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(plain.content)
+    assert response.content == plain.content
+    assert response.headers["etag"] == f"W/{plain.headers['etag']}"
+
+
+def test_small_response_is_not_compressed(client):
+    """Bodies under the minimum size go out as they are."""
+    response = _get(client, "/tasks/stats", "gzip")
+
+    assert response.status_code == 200
+    assert len(response.content) < compression.MINIMUM_SIZE
+    assert "content-encoding" not in response.headers
+
+
+def test_weak_etag_revalidates(client):
+    """The compressed response's weak ETag still answers If-None-Match with 304."""
+    _populate(client)
+    etag = _get(client, "/tasks", "gzip").headers["etag"]
+    assert etag.startswith("W/")
+
+    response = _get(client, "/tasks", "gzip", **{"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_unchanged_response_reuses_compressed_bytes(client, monkeypatch):
+    """Polling an unchanged list compresses once; a write makes the next poll compress again."""
+    calls = []
+
+    def counting_gzip(data: bytes) -> bytes:
+        calls.append(len(data))
+        return gzip.compress(data)
+
+    monkeypatch.setitem(CODECS, "gzip", CODECS["gzip"]._replace(compress=counting_gzip))
+    _populate(client)
+
+    first = _get(client, "/tasks", "gzip")
+    second = _get(client, "/tasks", "gzip")
+    assert len(calls) == 1
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+
+    client.post("/tasks", json={"title": "One more"}, headers=AUTH_HEADERS)
+    third = _get(client, "/tasks", "gzip")
+    assert len(calls) == 2
+    assert len(third.json()) == len(first.json()) + 1
+
+
+def test_export_is_compressed_as_a_stream(client):
+    """Exports are compressed chunk by chunk, without a Content-Length."""
+    _populate(client)
+    plain = _get(client, "/tasks/export", "identity")
+    response = _get(client, "/tasks/export", "gzip")
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.headers["content-disposition"] == plain.headers["content-disposition"]
+    assert response.text == plain.text
+    assert [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_server_sent_events_are_not_compressed(client):
+    """Event streams go out as they are; listed text types such as CSV are still compressed."""
+    _populate(client)
+    events = _get(client, "/tasks/events?timeout=0", "gzip", Accept="text/event-stream")
+    assert events.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in events.headers
+    assert events.text.startswith("retry:")
+
+    csv = _get(client, "/tasks/export?format=csv", "gzip")
+    assert csv.headers["content-encoding"] == "gzip"
+
+
+def test_stream_chunks_decode_as_they_arrive():
+    """Every flushed chunk decodes on its own, so clients can read rows as they stream."""
+    decoder = zlib.decompressobj(31)
+    stream = CODECS["gzip"].stream()
+    for chunk in (b'{"id": 1}\n', b'{"id": 2}\n'):
+        assert decoder.decompress(stream.compress(chunk)) == chunk
+    assert decoder.decompress(stream.finish()) == b""
+    assert decoder.eof
+
+
+@pytest.mark.parametrize("encoding", ["br", "zstd"])
+def test_optional_codecs(client, encoding):
+    """Brotli and zstd are used when installed and the client accepts them."""
+    if encoding not in CODECS:
+        pytest.skip(f"{encoding} support is not installed")
+    _populate(client)
+    plain = _get(client, "/tasks", "identity")
+    response = _get(client, "/tasks", f"gzip, {encoding}")
+
+    assert response.headers["content-encoding"] == encoding
+    if encoding == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        body = zstandard.ZstdDecompressor().decompress(response.content)
+    else:
+        body = response.content
+    assert body == plain.content
+
+
+def test_cache_is_bounded_in_bytes():
+    cache = CompressionCache(max_bytes=10)
+    cache.put(("a",), b"12345")
+    cache.put(("b",), b"12345")
+    assert cache.get(("a",)) == b"12345"
+
+    cache.put(("c",), b"12345")
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == b"12345"
+    assert cache.size == 10
+
+    cache.put(("d",), b"x" * 11)
+    assert cache.get(("d",)) is None
+
+
+def test_same_etag_with_another_body_is_not_served_from_cache():
+    """A cached body is only reused for the exact bytes it was compressed from."""
+    body = b"[" + b"1," * 1000 + b"1]"
+
+    async def app(scope, receive, send):
+        headers = [(b"content-type", b"application/json"), (b"etag", b'"same-1"')]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    middleware = CompressionMiddleware(app)
+    client = TestClient(middleware)
+    assert client.get("/", headers={"Accept-Encoding": "gzip"}).content == body
+    assert len(middleware.cache._entries) == 1
+
+    body = body.replace(b"1", b"2")
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == body
+    assert len(middleware.cache._entries) == 2
@@ -0,0 +1,103 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.storage import ConsistencyError, SQLiteStorage, TaskQuery
+
+TASKS = 20
+PATCHES_PER_TASK = 100
+THREADS = 32
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switches():
+    """Force the interpreter to interleave threads as often as possible."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_concurrent_patches_lose_no_updates(storage):
+    """Thousands of concurrent PATCH-style updates leave an unbroken history per task."""
+    task_ids = [storage.create_task("v0").id for _ in range(TASKS)]
+    jobs = [
+        (task_id, f"v{round_}", round_ % 2 == 1)
+        for round_ in range(1, PATCHES_PER_TASK + 1)
+        for task_id in task_ids
+    ]
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(lambda job: storage.update_task(job[0], *job[1:]), jobs))
+    assert all(result is not None for result in results)
+
+    for task_id in task_ids:
+        updates = [log for log in storage.get_task_activity(task_id) if log.action == "updated"]
+        # Every title is distinct, so every PATCH must be recorded, and each
+        # one must start from the value the previous one wrote.
+        assert len(updates) == PATCHES_PER_TASK
+        for previous, current in zip(updates, updates[1:]):
+            assert current.old_value == previous.new_value
+        assert updates[0].old_value == "v0"
+        assert storage.get_task(task_id).title == updates[-1].new_value
+
+    # check_consistency makes this recount and compare against the counters
+    stats = storage.get_stats()
+    assert stats.total == TASKS
+
+
+def test_concurrent_create_and_delete_keep_index_consistent(storage):
+    """Interleaved creates and deletes leave the page index matching the tasks."""
+    keep = [storage.create_task(f"keep {i}").id for i in range(200)]
+    doomed = [storage.create_task(f"doomed {i}").id for i in range(200)]
+
+    def churn(i: int) -> None:
+        storage.delete_task(doomed[i])
+        storage.complete_task(keep[i])
+        storage.create_task(f"new {i}")
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        list(pool.map(churn, range(200)))
+
+    page, _ = storage.query_tasks(TaskQuery(), limit=1000)
+    assert len(page) == 400
+    assert {task.id for task in page} >= set(keep)
+    stats = storage.get_stats()
+    assert (stats.total, stats.completed) == (400, 200)
+
+
+def test_stats_stay_consistent_during_deletes(storage):
+    """Stats read while completed tasks are deleted never count a pending task."""
+    task_ids = [task.id for task in storage.create_tasks([f"Done {i}" for i in range(2000)])]
+    storage.update_tasks([(task_id, None, True) for task_id in task_ids])
+    # The recount would race the deletes; this checks the counters alone
+    storage.check_consistency = False
+    done = threading.Event()
+    seen = []
+
+    def read_stats() -> None:
+        while not done.is_set():
+            stats = storage.get_stats()
+            seen.append((stats.pending, stats.total - stats.completed))
+
+    reader = threading.Thread(target=read_stats)
+    reader.start()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        list(pool.map(storage.delete_task, task_ids))
+    done.set()
+    reader.join()
+
+    assert seen and all(pair == (0, 0) for pair in seen)
+
+
+def test_counter_drift_raises(storage):
+    """check_consistency raises an explicit error, which python -O cannot strip."""
+    storage.create_task("Counted")
+    if isinstance(storage, SQLiteStorage):
+        storage._conn().execute("UPDATE task_counts SET completed = completed + 1")
+    else:
+        storage._completed_count += 1
+    with pytest.raises(ConsistencyError):
+        storage.get_stats()
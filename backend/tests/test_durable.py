@@ -0,0 +1,305 @@
+import os
+import threading
+
+import pytest
+
+from app.storage import ActivityQuery, ActivityRetention, DurableMemoryStorage, create_storage
+from app.storage.wal import (
+    CorruptLogError,
+    list_files,
+    segment_path,
+    snapshot_path,
+    write_snapshot,
+)
+
+
+def _crash(storage: DurableMemoryStorage) -> None:
+    """Stop a storage the way a killed process would: no final snapshot or flush."""
+    storage._closing = True
+    storage._snapshot_wanted.set()
+    storage._snapshotter.join()
+    storage._wal._file.close()
+
+
+def _state(storage) -> tuple:
+    tasks = sorted(storage.get_all_tasks())
+    activity = {task.id: storage.get_task_activity(task.id) for task in tasks}
+    feed, _ = storage.query_activity(ActivityQuery())
+    return tasks, activity, feed, storage.get_stats()
+
+
+def _populate(storage) -> list[str]:
+    ids = [task.id for task in storage.create_tasks(["Buy milk", "Walk dog", "Write report"])]
+    storage.update_task(ids[0], title="Buy oat milk")
+    storage.complete_task(ids[1])
+    storage.delete_task(ids[2])
+    return ids
+
+
+def test_log_replay_after_crash(tmp_path):
+    """Every acknowledged write survives a crash with no snapshot taken."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    ids = _populate(storage)
+    before = _state(storage)
+    _crash(storage)
+
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert _state(recovered) == before
+    found, _ = recovered.search_tasks("oat", 10)
+    assert [task.id for task in found] == [ids[0]]
+    archived = [log.action for logs in recovered.iter_activity(True, 10) for log in logs]
+    assert archived == ["created", "deleted"]
+    recovered.close()
+
+
+def test_revisions_only_go_up_across_restarts(tmp_path):
+    """Recovery restores the revision counter, from the log and from snapshots."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    _populate(storage)
+    revisions = [storage.revision()]
+    # Recovered from the log alone, from a snapshot, then from a snapshot and
+    # a log holding a clear
+    for stop in (_crash, DurableMemoryStorage.close, _crash):
+        tagged = {task.id: storage.task_revision(task.id) for task in storage.get_all_tasks()}
+        stop(storage)
+        storage = DurableMemoryStorage(str(tmp_path))
+        assert storage.revision() >= revisions[-1]
+        for task_id, revision in tagged.items():
+            assert revision <= storage.task_revision(task_id) <= storage.revision()
+        # Events from before the restart are not kept; following them must resync
+        assert storage.events_since(revisions[-1] - 1, 10) is None
+        assert storage.events_since(storage.revision(), 10) == []
+
+        task = storage.create_task(f"After restart {len(revisions)}")
+        assert storage.task_revision(task.id) == storage.revision() > revisions[-1]
+        if stop is DurableMemoryStorage.close:
+            storage.clear()
+        revisions.append(storage.revision())
+    storage.close()
+    assert revisions == sorted(set(revisions))
+
+
+def test_snapshot_plus_log_tail(tmp_path):
+    """Recovery loads the newest snapshot and replays only the log after it."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    _populate(storage)
+    storage.snapshot()
+    storage.create_task("After the snapshot")
+    before = _state(storage)
+    _crash(storage)
+
+    segments, snapshots = list_files(str(tmp_path))
+    assert len(snapshots) == 1 and segments == [snapshots[0]]
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert _state(recovered) == before
+    # New activity continues the sequence instead of reusing it
+    task = recovered.create_task("Later")
+    feed, _ = recovered.query_activity(ActivityQuery())
+    assert feed[-1].task_id == task.id
+    assert len(feed) == len(before[2]) + 1
+    recovered.close()
+
+
+def test_background_snapshots(tmp_path):
+    """Passing snapshot_every records triggers a snapshot that drops old segments."""
+    storage = DurableMemoryStorage(str(tmp_path), snapshot_every=5)
+    for i in range(20):
+        storage.create_task(f"Task {i}")
+    storage.close()
+
+    segments, snapshots = list_files(str(tmp_path))
+    assert segments == [] and len(snapshots) == 1
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert recovered.get_stats().total == 20
+    recovered.close()
+
+
+def test_torn_tail_is_discarded(tmp_path):
+    """A half-written final record is cut off; the records before it are kept."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    storage.create_task("Kept")
+    segment = storage._wal.segment
+    _crash(storage)
+    with open(segment_path(str(tmp_path), segment), "ab") as file:
+        file.write(b"\x40\x00\x00\x00partial")
+
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert [task.title for task in recovered.get_all_tasks()] == ["Kept"]
+    recovered.create_task("Appended after recovery")
+    _crash(recovered)
+    assert DurableMemoryStorage(str(tmp_path)).get_stats().total == 2
+
+
+def test_corruption_before_the_tail_is_an_error(tmp_path):
+    """Damage in a segment that later segments follow is not silently skipped."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    storage.create_task("First")
+    segment = storage._wal.segment
+    _crash(storage)
+    # A second run adds a later segment
+    storage = DurableMemoryStorage(str(tmp_path))
+    storage.create_task("Second")
+    _crash(storage)
+    path = segment_path(str(tmp_path), segment)
+    with open(path, "r+b") as file:
+        file.seek(os.path.getsize(path) - 1)
+        file.write(b"\xff")
+
+    with pytest.raises(CorruptLogError):
+        DurableMemoryStorage(str(tmp_path))
+
+
+def test_clear_is_durable(tmp_path):
+    """clear() is logged like any write."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    _populate(storage)
+    storage.clear()
+    storage.create_task("Fresh")
+    _crash(storage)
+
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert [task.title for task in recovered.get_all_tasks()] == ["Fresh"]
+    assert list(recovered.iter_activity(True, 10)) == []
+    recovered.close()
+
+
+def test_concurrent_writes_all_survive(tmp_path):
+    """Writers sharing group commits are each acknowledged only once durable."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    tasks = storage.create_tasks([f"Task {i}" for i in range(8)])
+
+    def work(task_id: str) -> None:
+        for version in range(25):
+            storage.update_task(task_id, title=f"v{version}")
+
+    threads = [threading.Thread(target=work, args=(task.id,)) for task in tasks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    before = _state(storage)
+    _crash(storage)
+
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert _state(recovered) == before
+    assert {task.title for task in recovered.get_all_tasks()} == {"v24"}
+    recovered.close()
+
+
+def test_restart_without_writes_leaves_no_segment(tmp_path):
+    """Opening and closing an unchanged store does not accumulate empty segments."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    storage.create_task("Task")
+    storage.close()
+    for _ in range(3):
+        DurableMemoryStorage(str(tmp_path)).close()
+    assert list_files(str(tmp_path))[0] == []
+
+
+def test_create_storage_with_data_dir(monkeypatch, tmp_path):
+    """MEMORY_DATA_DIR makes the in-memory backend durable."""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.setenv("MEMORY_DATA_DIR", str(tmp_path / "data"))
+    backend = create_storage()
+    assert isinstance(backend, DurableMemoryStorage)
+    backend.close()
+
+
+def test_snapshot_is_read_lazily(tmp_path):
+    """A restart maps the snapshot; tasks are decoded only when asked for."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    ids = _populate(storage)
+    storage.close()
+
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert len(recovered.tasks) == 2
+    assert recovered.tasks.loaded == {} and recovered.activity_logs.loaded == {}
+    assert recovered.get_task(ids[0]).title == "Buy oat milk"
+    # Untouched since the restart, so at the revision recovery restored
+    assert recovered.task_revision(ids[0]) == recovered.revision() > 0
+    assert list(recovered.tasks.loaded) == [ids[0]]
+    assert [log.action for log in recovered.get_task_activity(ids[1])] == [
+        "created",
+        "completed",
+    ]
+    assert recovered.get_task(ids[2]) is None
+    recovered.close()
+
+
+def test_restarted_store_snapshots_again(tmp_path):
+    """Rows carried over from the mapped snapshot merge with changes made since."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    ids = _populate(storage)
+    storage.create_tasks([f"Task {i}" for i in range(5)])
+    storage.close()
+
+    storage = DurableMemoryStorage(str(tmp_path))
+    storage.update_task(ids[1], title="Walk the dog")
+    storage.delete_task(ids[0])
+    storage.create_task("After the restart")
+    before = _state(storage)
+    storage.close()
+
+    _, snapshots = list_files(str(tmp_path))
+    assert len(snapshots) == 1
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert _state(recovered) == before
+    assert [task.title for task in recovered.get_all_tasks()][-1] == "After the restart"
+    recovered.close()
+
+
+def test_retention_applies_to_snapshot_logs(tmp_path):
+    """Logs decoded from a snapshot are trimmed to the retention of the new process."""
+    storage = DurableMemoryStorage(str(tmp_path))
+    task = storage.create_task("Task")
+    for version in range(5):
+        storage.update_task(task.id, title=f"v{version}")
+    storage.close()
+
+    recovered = DurableMemoryStorage(str(tmp_path), retention=ActivityRetention(max_per_task=2))
+    assert [log.new_value for log in recovered.get_task_activity(task.id)] == ["v3", "v4"]
+    recovered.close()
+
+
+def test_truncated_snapshot_is_an_error(tmp_path):
+    storage = DurableMemoryStorage(str(tmp_path))
+    storage.create_task("Task")
+    storage.close()
+    path = snapshot_path(str(tmp_path), list_files(str(tmp_path))[1][0])
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 1)
+
+    with pytest.raises(CorruptLogError):
+        DurableMemoryStorage(str(tmp_path))
+
+
+def test_framed_snapshot_still_loads(tmp_path):
+    """Snapshots written in the earlier marshal-framed format are read on upgrade."""
+    task = ("0" * 36, "Old task", True, 1_700_000_000_000_000, 1_700_000_000_000_000)
+    entry = (1, 7, task[0], "created", 1_700_000_000_000_000, None, None)
+    write_snapshot(
+        snapshot_path(str(tmp_path), 1),
+        [("snapshot", 1, 1), ("tasks", [task]), ("logs", [entry])],
+    )
+
+    recovered = DurableMemoryStorage(str(tmp_path))
+    assert [(t.title, t.completed) for t in recovered.get_all_tasks()] == [("Old task", True)]
+    assert recovered.get_stats().completed == 1
+    recovered.create_task("New")
+    feed, _ = recovered.query_activity(ActivityQuery())
+    assert [log.action for log in feed] == ["created", "created"]
+    recovered.close()
+
+
+def test_sizes_count_snapshot_and_new_entries(tmp_path):
+    storage = DurableMemoryStorage(str(tmp_path))
+    _populate(storage)
+    storage.close()
+
+    reopened = DurableMemoryStorage(str(tmp_path))
+    assert reopened.sizes() == {"tasks": 2, "activity_logs": 2, "deleted_activity_logs": 1}
+    added = reopened.create_task("New").id
+    reopened.delete_task(added)
+    reopened.delete_task(reopened.get_all_tasks()[0].id)
+    assert reopened.sizes() == {"tasks": 1, "activity_logs": 1, "deleted_activity_logs": 3}
+    reopened.close()
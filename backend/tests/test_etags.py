@@ -0,0 +1,104 @@
+from app.routers.auth import issue_token
+
+AUTH_TOKEN = issue_token("admin")
+AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+
+
+def _conditional_get(client, url, etag):
+    return client.get(url, headers={**AUTH_HEADERS, "If-None-Match": etag})
+
+
+def test_list_and_stats_return_304_until_anything_changes(client):
+    """GET /tasks and /tasks/stats revalidate against the global revision."""
+    client.post("/tasks", json={"title": "Task"}, headers=AUTH_HEADERS)
+    for url in ("/tasks", "/tasks/stats"):
+        first = client.get(url, headers=AUTH_HEADERS)
+        etag = first.headers["ETag"]
+        assert first.headers["Cache-Control"] == "no-cache"
+
+        cached = _conditional_get(client, url, etag)
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["ETag"] == etag
+
+    client.post("/tasks", json={"title": "Another"}, headers=AUTH_HEADERS)
+    changed = _conditional_get(client, "/tasks", etag)
+    assert changed.status_code == 200
+    assert len(changed.json()) == 2
+    assert changed.headers["ETag"] != etag
+
+
+def test_task_etag_tracks_only_that_task(client):
+    """GET /tasks/{id} and its activity change ETag only when that task changes."""
+    task_id = client.post("/tasks", json={"title": "Mine"}, headers=AUTH_HEADERS).json()["id"]
+    other_id = client.post("/tasks", json={"title": "Other"}, headers=AUTH_HEADERS).json()["id"]
+
+    for url in (f"/tasks/{task_id}", f"/tasks/{task_id}/activity"):
+        etag = client.get(url, headers=AUTH_HEADERS).headers["ETag"]
+
+        client.patch(f"/tasks/{other_id}", json={"title": "Other 2"}, headers=AUTH_HEADERS)
+        assert _conditional_get(client, url, etag).status_code == 304
+
+        client.patch(f"/tasks/{task_id}", json={"completed": True}, headers=AUTH_HEADERS)
+        refreshed = _conditional_get(client, url, etag)
+        assert refreshed.status_code == 200
+        assert refreshed.headers["ETag"] != etag
+        client.patch(f"/tasks/{task_id}", json={"completed": False}, headers=AUTH_HEADERS)
+
+
+def test_if_none_match_lists_and_weak_tags(client):
+    """If-None-Match accepts lists, weak tags and '*'."""
+    etag = client.get("/tasks/stats", headers=AUTH_HEADERS).headers["ETag"]
+    assert _conditional_get(client, "/tasks/stats", f'"stale", W/{etag}').status_code == 304
+    assert _conditional_get(client, "/tasks/stats", "*").status_code == 304
+    assert _conditional_get(client, "/tasks/stats", '"stale"').status_code == 200
+
+
+def test_deleted_task_is_not_served_from_cache(client):
+    """A stale ETag for a deleted task yields 404, not 304."""
+    task_id = client.post("/tasks", json={"title": "Gone"}, headers=AUTH_HEADERS).json()["id"]
+    etag = client.get(f"/tasks/{task_id}", headers=AUTH_HEADERS).headers["ETag"]
+    client.delete(f"/tasks/{task_id}", headers=AUTH_HEADERS)
+    assert _conditional_get(client, f"/tasks/{task_id}", etag).status_code == 404
+
+
+def test_revisions_increase_monotonically(storage):
+    """Every mutation raises the global revision; task revisions follow their task."""
+    start = storage.revision()
+    task = storage.create_task("Counted")
+    after_create = storage.revision()
+    assert after_create > start
+    assert storage.task_revision(task.id) == after_create
+
+    storage.update_task(task.id, title="Renamed")
+    assert storage.revision() > after_create
+    assert storage.task_revision(task.id) == storage.revision()
+
+    storage.delete_task(task.id)
+    assert storage.task_revision(task.id) is None
+
+
+def test_no_op_update_leaves_task_and_etags_unchanged(client):
+    """A PATCH that changes nothing writes nothing, so cached copies stay correct."""
+    task = client.post("/tasks", json={"title": "Same"}, headers=AUTH_HEADERS).json()
+    url = f"/tasks/{task['id']}"
+    etags = {
+        path: client.get(path, headers=AUTH_HEADERS).headers["ETag"] for path in (url, "/tasks")
+    }
+
+    for body in ({}, {"title": "Same"}, {"completed": False}):
+        patched = client.patch(url, json=body, headers=AUTH_HEADERS)
+        assert patched.status_code == 200
+        assert patched.json() == task
+
+    for path, etag in etags.items():
+        assert _conditional_get(client, path, etag).status_code == 304
+
+
+def test_clear_moves_the_revision(storage):
+    """Clearing storage invalidates every ETag issued before it."""
+    storage.create_task("Cleared")
+    before = storage.revision()
+    storage.clear()
+    assert storage.revision() > before
+    assert storage.events_since(before - 1, 10) is None
@@ -0,0 +1,187 @@
+import json
+import threading
+import time
+
+from app.pagination import decode_event_cursor, encode_event_cursor
+from app.routers.auth import issue_token
+
+AUTH_TOKEN = issue_token("admin")
+AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+SSE_HEADERS = {**AUTH_HEADERS, "Accept": "text/event-stream"}
+
+
+def _poll(client, **params):
+    response = client.get("/tasks/events", params={"timeout": 0, **params}, headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _parse_sse(body: str) -> list[dict]:
+    messages = []
+    for block in body.split("\n\n"):
+        fields = {}
+        for line in block.splitlines():
+            if line.startswith(":"):
+                continue
+            name, _, value = line.partition(": ")
+            fields[name] = value
+        if "data" in fields:
+            messages.append(fields)
+    return messages
+
+
+def test_events_require_auth(client):
+    """The event feed is protected like every other task endpoint."""
+    response = client.get("/tasks/events", params={"timeout": 0})
+    assert response.status_code == 403
+
+
+def test_long_poll_returns_changes_in_order(client):
+    """Every mutation shows up once, in order, with the task's current state."""
+    start = _poll(client)["cursor"]
+    task = client.post("/tasks", json={"title": "Watch me"}, headers=AUTH_HEADERS).json()
+    client.patch(f"/tasks/{task['id']}", json={"title": "Renamed"}, headers=AUTH_HEADERS)
+    client.put(f"/tasks/{task['id']}/complete", headers=AUTH_HEADERS)
+    gone = client.post("/tasks", json={"title": "Gone"}, headers=AUTH_HEADERS).json()
+    client.delete(f"/tasks/{gone['id']}", headers=AUTH_HEADERS)
+
+    page = _poll(client, after=start)
+    events = page["events"]
+    assert [(event["action"], event["task_id"]) for event in events] == [
+        ("created", task["id"]),
+        ("updated", task["id"]),
+        ("completed", task["id"]),
+        ("created", gone["id"]),
+        ("deleted", gone["id"]),
+    ]
+    revisions = [event["revision"] for event in events]
+    assert revisions == sorted(set(revisions))
+    assert decode_event_cursor(page["cursor"])[0] == revisions[-1]
+    assert events[1]["old_value"] == "Watch me" and events[1]["new_value"] == "Renamed"
+    assert events[0]["task"]["title"] == "Renamed"
+    assert events[0]["task"]["completed"] is True
+    assert events[3]["task"] is None
+
+    assert _poll(client, after=page["cursor"]) == {"cursor": page["cursor"], "events": []}
+
+
+def test_long_poll_resumes_page_by_page(client):
+    """Following `cursor` through small pages yields every event exactly once."""
+    start = _poll(client)["cursor"]
+    created = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()["id"]
+        for i in range(7)
+    ]
+    seen, after = [], start
+    while (page := _poll(client, after=after, limit=3))["events"]:
+        assert len(page["events"]) <= 3
+        seen.extend(event["task_id"] for event in page["events"])
+        after = page["cursor"]
+    assert seen == created
+
+
+def test_bulk_create_is_never_split_across_pages(client):
+    """Events sharing a revision are always delivered together."""
+    start = _poll(client)["cursor"]
+    client.post("/tasks/bulk", json=[{"title": f"Bulk {i}"} for i in range(5)], headers=AUTH_HEADERS)
+    client.post("/tasks", json={"title": "After"}, headers=AUTH_HEADERS)
+
+    seen, after = 0, start
+    while (page := _poll(client, after=after, limit=2))["events"]:
+        seen += len(page["events"])
+        after = page["cursor"]
+    assert seen == 6
+
+
+def test_long_poll_waits_for_a_change(client, storage):
+    """A long poll with no pending events returns as soon as a write lands."""
+    start = _poll(client)["cursor"]
+    writer = threading.Timer(0.3, storage.create_task, args=("Late",))
+    writer.start()
+    began = time.monotonic()
+    response = client.get(
+        "/tasks/events", params={"after": start, "timeout": 10}, headers=AUTH_HEADERS
+    )
+    writer.join()
+    assert time.monotonic() - began < 5
+    assert [event["action"] for event in response.json()["events"]] == ["created"]
+
+
+def test_long_poll_times_out_empty(client):
+    """With nothing new, the long poll returns an empty page after `timeout`."""
+    began = time.monotonic()
+    page = client.get("/tasks/events", params={"timeout": 0.3}, headers=AUTH_HEADERS).json()
+    assert page["events"] == []
+    assert time.monotonic() - began >= 0.3
+
+
+def test_stale_revision_is_gone(client, storage):
+    """Revisions from before a clear, or not yet issued, must resync."""
+    client.post("/tasks", json={"title": "Before"}, headers=AUTH_HEADERS)
+    storage.clear()
+    client.post("/tasks", json={"title": "After"}, headers=AUTH_HEADERS)
+    for revision in (0, storage.revision() + 100):
+        after = encode_event_cursor(revision, storage.epoch)
+        response = client.get(
+            "/tasks/events", params={"after": after, "timeout": 0}, headers=AUTH_HEADERS
+        )
+        assert response.status_code == 410
+
+
+def test_cursor_from_another_epoch_is_gone(client, storage):
+    """Revision numbers restart with a new epoch, so an old epoch's cursor must resync."""
+    storage.create_task("Counted")
+    for after in (encode_event_cursor(0, "restarted"), encode_event_cursor(0, "")):
+        response = client.get(
+            "/tasks/events", params={"after": after, "timeout": 0}, headers=AUTH_HEADERS
+        )
+        assert response.status_code == 410
+    headers = {**SSE_HEADERS, "Last-Event-ID": encode_event_cursor(0, "restarted")}
+    response = client.get("/tasks/events", params={"timeout": 0}, headers=headers)
+    assert response.status_code == 410
+
+    for after in ("1", "not a cursor"):
+        response = client.get(
+            "/tasks/events", params={"after": after, "timeout": 0}, headers=AUTH_HEADERS
+        )
+        assert response.status_code == 400
+
+
+def test_server_sent_events(client):
+    """SSE streams each event with its action and a resumable id."""
+    start = _poll(client)["cursor"]
+    task = client.post("/tasks", json={"title": "Streamed"}, headers=AUTH_HEADERS).json()
+    client.delete(f"/tasks/{task['id']}", headers=AUTH_HEADERS)
+
+    response = client.get(
+        "/tasks/events", params={"after": start, "timeout": 0.2}, headers=SSE_HEADERS
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = _parse_sse(response.text)
+    assert [message["event"] for message in messages] == ["created", "deleted"]
+    assert [json.loads(message["data"])["task_id"] for message in messages] == [task["id"]] * 2
+
+    # Reconnecting with Last-Event-ID skips what the client already has
+    resumed = client.get(
+        "/tasks/events",
+        params={"timeout": 0.2},
+        headers={**SSE_HEADERS, "Last-Event-ID": messages[0]["id"]},
+    )
+    assert [message["event"] for message in _parse_sse(resumed.text)] == ["deleted"]
+
+
+def test_sse_ids_mark_revision_boundaries(client, storage):
+    """Within a bulk revision only the last event carries the id."""
+    start = _poll(client)["cursor"]
+    client.post("/tasks/bulk", json=[{"title": "A"}, {"title": "B"}], headers=AUTH_HEADERS)
+    messages = _parse_sse(
+        client.get(
+            "/tasks/events", params={"after": start, "timeout": 0.2}, headers=SSE_HEADERS
+        ).text
+    )
+    revisions = [json.loads(message["data"])["revision"] for message in messages]
+    for message, revision, following in zip(messages, revisions, revisions[1:] + [None]):
+        assert ("id" in message) == (revision != following)
+        if "id" in message:
+            assert decode_event_cursor(message["id"]) == (revision, storage.epoch)
@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+
+from app.routers.auth import issue_token
+
+AUTH_TOKEN = issue_token("admin")
+AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+
+
+def _populate(client) -> tuple[list[str], str]:
+    """Create three tasks, edit one and delete another; return (live ids, deleted id)."""
+    ids = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()["id"]
+        for i in range(3)
+    ]
+    client.put(f"/tasks/{ids[0]}/complete", headers=AUTH_HEADERS)
+    client.delete(f"/tasks/{ids[2]}", headers=AUTH_HEADERS)
+    return ids[:2], ids[2]
+
+
+def _ndjson(client, **params) -> list[dict]:
+    response = client.get("/tasks/export", params=params, headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_export_requires_auth(client):
+    """The export is protected like every other task endpoint."""
+    response = client.get("/tasks/export")
+    assert response.status_code == 403
+
+
+def test_export_ndjson(client):
+    """Tasks come first, encoded as GET /tasks does, then live and archived activity."""
+    live, deleted = _populate(client)
+    records = _ndjson(client)
+
+    tasks = client.get("/tasks", headers=AUTH_HEADERS).json()
+    assert [r for r in records if r["type"] == "task"] == [{"type": "task", **t} for t in tasks]
+    assert [r["type"] for r in records] == ["task"] * 2 + ["activity"] * 3 + [
+        "deleted_activity"
+    ] * 2
+
+    activity = [r for r in records if r["type"] == "activity"]
+    expected = client.get(f"/tasks/{live[0]}/activity", headers=AUTH_HEADERS).json()
+    assert [r for r in activity if r["task_id"] == live[0]] == [
+        {"type": "activity", **log} for log in expected
+    ]
+    archived = [r for r in records if r["type"] == "deleted_activity"]
+    assert {r["task_id"] for r in archived} == {deleted}
+    assert [r["action"] for r in archived] == ["created", "deleted"]
+
+
+def test_export_spans_many_batches(client, monkeypatch):
+    """Batching never drops or repeats a record."""
+    monkeypatch.setattr("app.routers.tasks.EXPORT_BATCH_SIZE", 2)
+    ids = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()["id"]
+        for i in range(7)
+    ]
+    for task_id in ids[:3]:
+        client.delete(f"/tasks/{task_id}", headers=AUTH_HEADERS)
+
+    records = _ndjson(client)
+    assert [r["id"] for r in records if r["type"] == "task"] == ids[3:]
+    assert [r["task_id"] for r in records if r["type"] == "activity"] == ids[3:]
+    assert sorted(r["task_id"] for r in records if r["type"] == "deleted_activity") == sorted(
+        ids[:3] * 2
+    )
+
+
+def test_export_csv(client):
+    """The CSV variant has one row per record under a fixed header."""
+    live, deleted = _populate(client)
+    response = client.get("/tasks/export", params={"format": "csv"}, headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="tasks.csv"' in response.headers["content-disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    ndjson = _ndjson(client)
+    assert [row["type"] for row in rows] == [record["type"] for record in ndjson]
+    task = next(row for row in rows if row["id"] == live[0])
+    expected = next(record for record in ndjson if record["id"] == live[0])
+    assert task["completed"] == "true"
+    assert task["created_at"] == expected["created_at"]
+    assert task["action"] == ""
+
+
+def test_export_empty(client):
+    """With no data the NDJSON body is empty and the CSV is just its header."""
+    assert _ndjson(client) == []
+    response = client.get("/tasks/export", params={"format": "csv"}, headers=AUTH_HEADERS)
+    assert response.text.splitlines() == [
+        "type,id,task_id,title,completed,created_at,updated_at,action,timestamp,old_value,new_value"
+    ]
+
+
+def test_export_invalid_format(client):
+    """Unknown formats are rejected with 422."""
+    response = client.get("/tasks/export", params={"format": "xml"}, headers=AUTH_HEADERS)
+    assert response.status_code == 422
@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+from app.importer import MAX_IMPORT_LINE_BYTES, import_ndjson
+from app.routers.auth import issue_token
+
+AUTH_TOKEN = issue_token("admin")
+AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+NDJSON_HEADERS = {**AUTH_HEADERS, "Content-Type": "application/x-ndjson"}
+
+
+def _ndjson(*rows) -> bytes:
+    return b"".join(
+        (row if isinstance(row, bytes) else json.dumps(row).encode()) + b"\n" for row in rows
+    )
+
+
+def _import(client, body: bytes) -> list[dict]:
+    response = client.post("/tasks/import", content=body, headers=NDJSON_HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _run(chunks: list[bytes], storage, batch_size: int) -> list[dict]:
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        records = import_ndjson(body(), storage.aio, batch_size)
+        return [json.loads(record) async for record in records]
+
+    return asyncio.run(collect())
+
+
+def test_import_requires_auth(client):
+    """The import is protected like every other task endpoint."""
+    response = client.post("/tasks/import", content=_ndjson({"title": "x"}))
+    assert response.status_code == 403
+
+
+def test_import_creates_tasks(client):
+    """Every valid line becomes a task with its activity log."""
+    records = _import(client, _ndjson({"title": "One"}, {"title": "  Two  "}))
+    assert records[-1] == {"type": "summary", "lines": 2, "imported": 2, "failed": 0}
+
+    tasks = client.get("/tasks", headers=AUTH_HEADERS).json()
+    # A batch shares one timestamp, so list order within it is by id
+    assert sorted(task["title"] for task in tasks) == ["One", "Two"]
+    activity = client.get(f"/tasks/{tasks[0]['id']}/activity", headers=AUTH_HEADERS).json()
+    assert [log["action"] for log in activity] == ["created"]
+
+
+def test_import_reports_bad_lines(client):
+    """Invalid lines are reported with their line numbers; the rest still import."""
+    body = _ndjson(
+        {"title": "Good"}, {"title": "   "}, b"not json", b"", {"name": "x"}, {"title": "Also good"}
+    )
+    records = _import(client, body)
+
+    errors = [record for record in records if record["type"] == "error"]
+    assert [error["line"] for error in errors] == [2, 3, 5]
+    assert "title must not be empty" in errors[0]["detail"]
+    assert errors[2]["detail"].startswith("title:")
+    assert records[-1] == {"type": "summary", "lines": 6, "imported": 2, "failed": 3}
+    assert client.get("/tasks/stats", headers=AUTH_HEADERS).json()["total"] == 2
+
+
+def test_import_without_trailing_newline(client):
+    """The last line counts even when the body does not end with a newline."""
+    records = _import(client, b'{"title": "One"}\n{"title": "Two"}')
+    assert records[-1]["imported"] == 2
+
+
+def test_import_batches_and_progress(storage):
+    """Lines split across chunks are rejoined, and progress follows every batch."""
+    body = _ndjson(*({"title": f"Task {i}"} for i in range(7)))
+    chunks = [body[i : i + 5] for i in range(0, len(body), 5)]
+    records = _run(chunks, storage, batch_size=3)
+
+    progress = [record for record in records if record["type"] == "progress"]
+    assert [record["imported"] for record in progress] == [3, 6, 7]
+    assert records[-1] == {"type": "summary", "lines": 7, "imported": 7, "failed": 0}
+    tasks = storage.get_all_tasks()
+    assert sorted(task.title for task in tasks) == [f"Task {i}" for i in range(7)]
+
+
+def test_import_rejects_oversized_line_without_buffering_it(storage):
+    """A line over the size limit is reported and skipped; later lines still import."""
+    huge = b'{"title": "' + b"x" * (MAX_IMPORT_LINE_BYTES + 10) + b'"}'
+    chunks = [huge[i : i + 4096] for i in range(0, len(huge), 4096)]
+    chunks.append(b'\n{"title": "After"}\n')
+    records = _run(chunks, storage, batch_size=10)
+
+    assert records[0]["type"] == "error" and records[0]["line"] == 1
+    assert records[-1] == {"type": "summary", "lines": 2, "imported": 1, "failed": 1}
+
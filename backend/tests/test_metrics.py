@@ -0,0 +1,87 @@
+import re
+
+from app.metrics import Gauge, Histogram
+from app.routers.auth import issue_token
+
+AUTH_HEADERS = {"Authorization": f"Bearer {issue_token('admin')}"}
+
+
+def _sample(text: str, name: str, **labels: str) -> float:
+    """The value of the sample `name` whose labels include `labels` (0 if absent)."""
+    for line in text.splitlines():
+        match = re.fullmatch(r"(\w+)(?:\{(.*)\})? (\S+)", line)
+        if match is None or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ""))
+        if all(found.get(key) == value for key, value in labels.items()):
+            return float(match.group(3))
+    return 0.0
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("op_seconds", "Op time.", ("op",), (0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, 'say "hi"\n')
+    assert list(histogram.samples()) == [
+        'op_seconds_bucket{op="say \\"hi\\"\\n",le="0.1"} 1',
+        'op_seconds_bucket{op="say \\"hi\\"\\n",le="1.0"} 3',
+        'op_seconds_bucket{op="say \\"hi\\"\\n",le="+Inf"} 4',
+        'op_seconds_sum{op="say \\"hi\\"\\n"} 4.05',
+        'op_seconds_count{op="say \\"hi\\"\\n"} 4',
+    ]
+
+
+def test_gauge_reads_collect_at_scrape():
+    sizes = {"tasks": 1}
+    gauge = Gauge("entries", "Entries.", ("structure",), collect=lambda: [
+        ((name,), size) for name, size in sizes.items()
+    ])
+    sizes["tasks"] = 5
+    assert list(gauge.samples()) == ['entries{structure="tasks"} 5']
+
+
+def test_requests_are_recorded_by_route_template(client):
+    before = client.get("/metrics").text
+    task = client.post("/tasks", json={"title": "Measure me"}, headers=AUTH_HEADERS).json()
+    for _ in range(3):
+        client.get(f"/tasks/{task['id']}", headers=AUTH_HEADERS)
+    client.get("/tasks/not-a-task", headers=AUTH_HEADERS)
+    client.get("/no-such-path")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+    route = {"route": "/tasks/{task_id}", "method": "GET"}
+
+    def delta(name: str, **labels: str) -> float:
+        return _sample(after, name, **labels) - _sample(before, name, **labels)
+
+    assert delta("http_request_duration_seconds_count", status="200", **route) == 3
+    assert delta("http_request_duration_seconds_count", status="404", **route) == 1
+    assert delta("http_request_duration_seconds_count", route="unmatched") == 1
+    assert task["id"] not in after
+    assert delta("http_request_size_bytes_sum", method="POST", route="/tasks") == len(
+        b'{"title": "Measure me"}'
+    )
+    assert delta("http_response_size_bytes_count", **route) == 4
+    assert delta("http_response_size_bytes_sum", **route) > 0
+
+
+def test_storage_calls_and_sizes_are_recorded(client, storage):
+    before = client.get("/metrics").text
+    client.post("/tasks/bulk", json=[{"title": "One"}, {"title": "Two"}], headers=AUTH_HEADERS)
+    task_id = storage.get_all_tasks()[0].id
+    client.delete(f"/tasks/{task_id}", headers=AUTH_HEADERS)
+    after = client.get("/metrics").text
+
+    for method in ("create_tasks", "delete_task"):
+        labels = {"backend": storage.aio.backend, "method": method}
+        calls = _sample(after, "storage_call_duration_seconds_count", **labels)
+        assert calls - _sample(before, "storage_call_duration_seconds_count", **labels) == 1
+    assert _sample(after, "storage_entries", structure="tasks") == 1
+    assert _sample(after, "storage_shards") == 1
+    if "activity_logs" in storage.sizes():
+        assert _sample(after, "storage_entries", structure="activity_logs") == 1
+        assert _sample(after, "storage_entries", structure="deleted_activity_logs") == 1
+    assert "threadpool_tasks_waiting" in after
@@ -0,0 +1,68 @@
+import re
+import sys
+import threading
+import time
+
+from app.profiling import collapse
+from app.routers import profiling
+from app.routers.auth import issue_token
+
+AUTH_HEADERS = {"Authorization": f"Bearer {issue_token('admin')}"}
+
+
+def test_collapse_lists_frames_outermost_first():
+    def inner():
+        return collapse("AnyIO worker thread", sys._getframe())
+
+    stack = inner().split(";")
+    assert stack[0] == "AnyIO_worker_thread"
+    assert stack[-2:] == [
+        "test_profiling.py:test_collapse_lists_frames_outermost_first",
+        "test_profiling.py:test_collapse_lists_frames_outermost_first.<locals>.inner",
+    ]
+
+
+def test_profile_samples_a_time_window(client):
+    response = client.post("/debug/profile?seconds=0.2", headers=AUTH_HEADERS)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert int(response.headers["X-Profile-Samples"]) > 0
+    lines = response.text.splitlines()
+    assert lines and all(re.fullmatch(r"[^ ]+ \d+", line) for line in lines)
+    # The test thread spent the window waiting for this response
+    assert any(line.startswith("MainThread;") for line in lines)
+    assert profiling._active is None
+
+
+def test_profile_ends_after_requests(client):
+    results = {}
+
+    def run_profile() -> None:
+        started = time.monotonic()
+        results["response"] = client.post(
+            "/debug/profile?requests=3&seconds=30", headers=AUTH_HEADERS
+        )
+        results["elapsed"] = time.monotonic() - started
+
+    thread = threading.Thread(target=run_profile)
+    thread.start()
+    while profiling._active is None:
+        time.sleep(0.01)
+    conflict = client.post("/debug/profile?seconds=1", headers=AUTH_HEADERS)
+    assert conflict.status_code == 409
+    client.get("/tasks", headers=AUTH_HEADERS)
+    client.get("/tasks/stats", headers=AUTH_HEADERS)
+    thread.join(timeout=10)
+
+    assert results["response"].status_code == 200
+    assert results["elapsed"] < 10
+    assert int(results["response"].headers["X-Profile-Requests"]) >= 3
+
+
+def test_profile_is_admin_only(client):
+    assert client.post("/debug/profile?seconds=0.1").status_code == 403
+    other = {"Authorization": f"Bearer {issue_token('someone')}"}
+    response = client.post("/debug/profile?seconds=0.1", headers=other)
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Admin only"
@@ -0,0 +1,62 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+from app.storage import TaskQuery
+
+
+@pytest.fixture
+def populated(storage):
+    """A few hundred tasks with mixed status, spread-out timestamps and updates."""
+    rng = random.Random(7)
+    tasks = storage.create_tasks([f"Task {i}" for i in range(300)])
+    for task in rng.sample(tasks, 120):
+        storage.update_task(task.id, completed=True)
+    for task in rng.sample(tasks, 60):
+        storage.update_task(task.id, title=f"{task.title} edited")
+    for task in rng.sample(tasks, 30):
+        storage.delete_task(task.id)
+    return storage
+
+
+def _expected(storage, query):
+    tasks = [task for task in storage.get_all_tasks() if query.matches(task)]
+    return sorted(tasks, key=query.key, reverse=query.descending)
+
+
+def _queries(storage):
+    tasks = storage.get_all_tasks()
+    created = sorted(task.created_at for task in tasks)
+    updated = sorted(task.updated_at for task in tasks)
+    for sort in ("created_at", "-created_at", "updated_at", "-updated_at"):
+        for completed in (None, True, False):
+            yield TaskQuery(completed=completed, sort=sort)
+            # Narrow ranges on each index exercise the index-selection paths
+            yield TaskQuery(completed=completed, updated_since=updated[-5], sort=sort)
+            yield TaskQuery(
+                completed=completed,
+                created_after=created[0] - timedelta(seconds=1),
+                created_before=created[-1] + timedelta(seconds=1),
+                sort=sort,
+            )
+
+
+def test_query_matches_brute_force(populated):
+    """Every index path returns exactly what a filter-and-sort scan would."""
+    for query in _queries(populated):
+        tasks, next_key = populated.query_tasks(query)
+        assert [t.id for t in tasks] == [t.id for t in _expected(populated, query)], query
+        assert next_key is None
+
+
+def test_query_pages_concatenate_to_full_result(populated):
+    """Paging with any query and limit visits each match once, in order."""
+    for query in _queries(populated):
+        seen, after = [], None
+        while True:
+            page, after = populated.query_tasks(query, limit=17, after=after)
+            seen.extend(task.id for task in page)
+            if after is None:
+                break
+        assert seen == [t.id for t in _expected(populated, query)], query
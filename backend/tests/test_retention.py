@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+import pytest
+
+from app.storage import ActivityRetention, InMemoryStorage, SQLiteStorage, activity_retention
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_storage(request, tmp_path):
+    """Build a storage of each backend with a given retention policy."""
+    created = []
+
+    def make(retention: ActivityRetention):
+        if request.param == "sqlite":
+            backend = SQLiteStorage(str(tmp_path / "tasks.db"), retention=retention)
+        else:
+            backend = InMemoryStorage(retention=retention)
+        created.append(backend)
+        return backend
+
+    yield make
+    for backend in created:
+        backend.close()
+
+
+def _archived(storage) -> list:
+    return [log for logs in storage.iter_activity(True, 100) for log in logs]
+
+
+def test_max_per_task_keeps_newest_entries(make_storage):
+    """Only the newest max_per_task entries of a task are kept."""
+    storage = make_storage(ActivityRetention(max_per_task=3))
+    task = storage.create_task("v0")
+    for version in range(1, 6):
+        storage.update_task(task.id, title=f"v{version}")
+
+    activity = storage.get_task_activity(task.id)
+    assert [log.new_value for log in activity] == ["v3", "v4", "v5"]
+
+
+def test_max_age_expires_entries(make_storage):
+    """Entries older than max_age are dropped, even for tasks nobody writes to."""
+    storage = make_storage(ActivityRetention(max_age=timedelta(0)))
+    task = storage.create_task("Stale")
+    assert storage.get_task_activity(task.id) == []
+    assert [batch for batch in storage.iter_activity(False, 100)] == []
+
+
+def test_max_archived_caps_deleted_task_logs(make_storage):
+    """Archived logs of deleted tasks are capped, dropping the oldest."""
+    storage = make_storage(ActivityRetention(max_archived=4))
+    tasks = [storage.create_task(f"Task {i}") for i in range(5)]
+    for task in tasks:
+        storage.delete_task(task.id)
+
+    # Each deleted task archives two entries: created and deleted
+    archived = _archived(storage)
+    # SQLite prunes in batches, so it may briefly hold a tenth more
+    assert 4 <= len(archived) <= 4 * 11 // 10 + 1
+    assert tasks[0].id not in {log.task_id for log in archived}
+    assert (tasks[4].id, "deleted") in {(log.task_id, log.action) for log in archived}
+
+
+def test_unlimited_retention_keeps_everything(make_storage):
+    """With every limit lifted nothing is dropped."""
+    storage = make_storage(ActivityRetention(max_per_task=None, max_archived=None))
+    task = storage.create_task("v0")
+    for version in range(1, 1500):
+        storage.update_task(task.id, title=f"v{version}")
+    assert len(storage.get_task_activity(task.id)) == 1500
+
+
+def test_pruned_events_require_resync(tmp_path):
+    """A change feed that would skip pruned SQLite rows answers None (410) instead."""
+    storage = SQLiteStorage(str(tmp_path / "tasks.db"), retention=ActivityRetention(max_per_task=2))
+    start = storage.revision()
+    task = storage.create_task("v0")
+    assert storage.events_since(start, 10) is not None
+    storage.update_task(task.id, title="v1")
+    storage.update_task(task.id, title="v2")
+
+    assert storage.events_since(start, 10) is None
+    assert storage.events_since(storage.revision() - 1, 10) is not None
+    storage.close()
+
+
+def test_retention_from_environment(monkeypatch):
+    """Limits are read from the environment, where 0 lifts a limit."""
+    monkeypatch.setenv("ACTIVITY_MAX_PER_TASK", "50")
+    monkeypatch.setenv("ACTIVITY_MAX_AGE_DAYS", "30")
+    monkeypatch.setenv("ACTIVITY_MAX_ARCHIVED", "0")
+    assert activity_retention() == ActivityRetention(
+        max_per_task=50, max_age=timedelta(days=30), max_archived=None
+    )
+
+
+def test_retention_defaults(monkeypatch):
+    """Without configuration the default policy applies."""
+    for name in ["ACTIVITY_MAX_PER_TASK", "ACTIVITY_MAX_AGE_DAYS", "ACTIVITY_MAX_ARCHIVED"]:
+        monkeypatch.delenv(name, raising=False)
+    assert activity_retention() == ActivityRetention()
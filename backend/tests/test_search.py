@@ -0,0 +1,125 @@
+import itertools
+import threading
+
+from app.routers.auth import issue_token
+from app.storage.search import MAX_PREFIX_MATCHES, SearchIndex, tokenize
+
+AUTH_TOKEN = issue_token("admin")
+AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+
+
+def _create(client, *titles):
+    return [
+        client.post("/tasks", json={"title": title}, headers=AUTH_HEADERS).json()["id"]
+        for title in titles
+    ]
+
+
+def _search(client, q, **params):
+    response = client.get("/tasks/search", params={"q": q, **params}, headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    return response
+
+
+def test_search_matches_words_case_insensitively(client):
+    """GET /tasks/search?q= finds tasks by any word in the title, ignoring case."""
+    groceries, _ = _create(client, "Buy GROCERIES today", "Walk the dog")
+    assert [t["id"] for t in _search(client, "groceries").json()] == [groceries]
+
+
+def test_search_requires_every_term(client):
+    """All query words must appear in the title."""
+    both, _ = _create(client, "Buy milk and bread", "Buy milk")
+    assert [t["id"] for t in _search(client, "milk bread").json()] == [both]
+
+
+def test_search_prefix_matching(client):
+    """Query words match as prefixes; one-letter words only match whole words."""
+    report, _ = _create(client, "Write quarterly report", "Reply to email")
+    assert [t["id"] for t in _search(client, "quart rep").json()] == [report]
+    assert _search(client, "q").json() == []
+
+
+def test_search_ranks_whole_words_first(client):
+    """Whole-word matches outrank prefix matches."""
+    prefix_only, exact = _create(client, "Plant tomatoes", "Plan the trip")
+    assert [t["id"] for t in _search(client, "plan").json()] == [exact, prefix_only]
+
+
+def test_search_follows_updates_and_deletes(client):
+    """Renamed and deleted tasks are reflected in search immediately."""
+    renamed, deleted = _create(client, "Old name", "Doomed name")
+    client.patch(f"/tasks/{renamed}", json={"title": "Fresh title"}, headers=AUTH_HEADERS)
+    client.delete(f"/tasks/{deleted}", headers=AUTH_HEADERS)
+
+    assert _search(client, "name").json() == []
+    assert [t["id"] for t in _search(client, "fresh").json()] == [renamed]
+
+
+def test_search_paginates(client):
+    """Search results page with limit and X-Next-Cursor without repeats."""
+    created = _create(client, *(f"Report {i}" for i in range(7)))
+    seen, params = [], {"limit": 3}
+    while True:
+        response = _search(client, "report", **params)
+        seen.extend(t["id"] for t in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert sorted(seen) == sorted(created)
+    assert len(seen) == len(set(seen))
+
+
+def test_search_validation(client):
+    """Missing query is 422, a malformed cursor is 400."""
+    response = client.get("/tasks/search", headers=AUTH_HEADERS)
+    assert response.status_code == 422
+    response = client.get(
+        "/tasks/search", params={"q": "x", "cursor": "garbage"}, headers=AUTH_HEADERS
+    )
+    assert response.status_code == 400
+
+
+def test_search_index_forgets_unused_tokens():
+    """Removing the last task with a token drops it from the vocabulary."""
+    index = SearchIndex()
+    index.add("a", "Alpha beta")
+    index.add("b", "Beta gamma")
+    index.remove("a", "Alpha beta")
+    assert index.search("alpha") == {}
+    assert set(index.search("beta")) == {"b"}
+    assert index._vocabulary == sorted(set(tokenize("beta gamma")))
+
+
+def test_prefix_expansion_is_bounded():
+    """A prefix reads at most MAX_PREFIX_MATCHES tokens, first in vocabulary order."""
+    index = SearchIndex()
+    index.add_many((f"t{i}", f"ab{i:04d}") for i in range(MAX_PREFIX_MATCHES * 3))
+    index.add("exact", "ab")
+    matched = index.search("ab")
+    assert "exact" in matched
+    assert len(matched) == MAX_PREFIX_MATCHES + 1
+    assert set(index.search("ab0000")) == {"t0"}
+
+
+def test_search_runs_while_writers_change_its_postings():
+    """Writers only wait for a search to copy its postings, never corrupt its scoring."""
+    index = SearchIndex()
+    index.add_many((f"t{i}", f"common word {i}") for i in range(20_000))
+    stop = threading.Event()
+
+    def write():
+        for i in itertools.count(20_000):
+            if stop.is_set():
+                return
+            index.add(f"t{i}", f"common word {i}")
+            index.remove(f"t{i - 20_000}", f"common word {i - 20_000}")
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(20):
+            assert index.search("common wo")
+    finally:
+        stop.set()
+        writer.join()
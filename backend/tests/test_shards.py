@@ -0,0 +1,186 @@
+import asyncio
+import json
+import os
+import threading
+
+from app.routers.auth import issue_token, token_signer
+from app.storage import (
+    DurableMemoryStorage,
+    InMemoryStorage,
+    ShardedStorage,
+    SQLiteStorage,
+    create_storage,
+    max_idle_shards,
+    shard_name,
+)
+from app.storage.sqlite import ASYNC_THREADS
+
+ADMIN_HEADERS = {"Authorization": f"Bearer {issue_token('admin')}"}
+OTHER_HEADERS = {"Authorization": f"Bearer {issue_token('bob')}"}
+
+
+def test_users_see_only_their_own_tasks(client, shards):
+    """Listing, stats, search and activity only cover the caller's shard."""
+    mine = client.post("/tasks", json={"title": "Admin report"}, headers=ADMIN_HEADERS).json()
+    client.post("/tasks/bulk", json=[{"title": "Bob report"}] * 2, headers=OTHER_HEADERS)
+
+    listed = client.get("/tasks", headers=ADMIN_HEADERS).json()
+    assert [task["id"] for task in listed] == [mine["id"]]
+    assert client.get("/tasks/stats", headers=OTHER_HEADERS).json()["total"] == 2
+    found = client.get("/tasks/search", params={"q": "report"}, headers=ADMIN_HEADERS).json()
+    assert [task["id"] for task in found] == [mine["id"]]
+    feed = client.get("/activity", headers=OTHER_HEADERS).json()
+    assert len(feed) == 2 and mine["id"] not in {log["task_id"] for log in feed}
+    assert sorted(shards.owners()) == ["admin", "bob"]
+
+
+def test_other_users_tasks_are_not_found(client):
+    """A task id from another shard is a 404, for reads and writes alike."""
+    task = client.post("/tasks", json={"title": "Private"}, headers=ADMIN_HEADERS).json()
+    path = f"/tasks/{task['id']}"
+    assert client.get(path, headers=OTHER_HEADERS).status_code == 404
+    assert client.get(f"{path}/activity", headers=OTHER_HEADERS).status_code == 404
+    assert client.patch(path, json={"title": "Mine"}, headers=OTHER_HEADERS).status_code == 404
+    assert client.delete(path, headers=OTHER_HEADERS).status_code == 404
+    assert client.get(path, headers=ADMIN_HEADERS).json()["title"] == "Private"
+
+
+def test_token_without_subject_rejected(client):
+    token = token_signer.issue("")
+    response = client.get("/tasks", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_shards_are_built_once_on_first_use():
+    built = []
+
+    def factory(owner: str) -> InMemoryStorage:
+        built.append(owner)
+        return InMemoryStorage()
+
+    sharded = ShardedStorage(factory)
+    assert sharded.owners() == []
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(sharded.shard("alice")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert built == ["alice"]
+    assert all(result is results[0] for result in results)
+    assert sharded.shard("bob") is not results[0]
+
+
+def test_shard_names_are_safe_and_distinct():
+    assert shard_name("admin").startswith("admin-")
+    assert "/" not in shard_name("../etc/passwd")
+    assert shard_name("a/b") != shard_name("a_b")
+
+
+def test_create_storage_per_owner(monkeypatch, tmp_path):
+    """Each owner's shard gets its own database file or data directory."""
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "tasks.db"))
+    backend = create_storage("bob")
+    backend.close()
+    assert os.path.exists(tmp_path / f"tasks-{shard_name('bob')}.db")
+
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.setenv("MEMORY_DATA_DIR", str(tmp_path / "data"))
+    backend = create_storage("bob")
+    assert isinstance(backend, DurableMemoryStorage)
+    assert backend.directory == str(tmp_path / "data" / shard_name("bob"))
+    backend.close()
+
+
+
+def test_idle_shards_past_the_cap_are_closed(tmp_path):
+    """Building a shard closes the least recently used idle ones; leased ones stay open."""
+    closed = []
+
+    def factory(owner: str) -> SQLiteStorage:
+        backend = SQLiteStorage(str(tmp_path / f"{owner}.db"))
+        close = backend.close
+        backend.close = lambda: (closed.append(owner), close())
+        return backend
+
+    sharded = ShardedStorage(factory, max_idle=1)
+    held = sharded.acquire("held")
+    sharded.acquire("alice").create_task("Kept on disk")
+    sharded.release("alice")
+    sharded.acquire("bob")
+    sharded.release("bob")
+    # Idle: alice, then bob; building carol leaves one besides her
+    sharded.shard("carol")
+    assert closed == ["alice", "bob"]
+    assert sorted(sharded.owners()) == ["carol", "held"]
+    assert sharded.get("held") is held
+
+    reopened = sharded.acquire("alice")
+    assert [task.title for task in reopened.get_all_tasks()] == ["Kept on disk"]
+    sharded.release("alice")
+    sharded.shard("dave")
+    assert closed == ["alice", "bob", "carol", "alice"]
+    sharded.release("held")
+    sharded.close()
+
+
+def test_requests_release_their_shard(client, shards):
+    """Every request's lease ends with it, streamed responses' once the body is sent."""
+    client.post("/tasks", json={"title": "Task"}, headers=ADMIN_HEADERS)
+    client.get("/tasks/export", headers=ADMIN_HEADERS)
+    client.get(
+        "/tasks/events",
+        params={"timeout": 0},
+        headers={**ADMIN_HEADERS, "Accept": "text/event-stream"},
+    )
+    client.get("/metrics")
+    assert shards._leases == {}
+    assert list(shards._idle) == ["admin"]
+
+
+def test_import_keeps_its_shard_open_while_streaming(client, shards):
+    """Idle shards closed while an import's body streams never include the importer's."""
+    shards.max_idle = 0
+
+    def body():
+        for i in range(3):
+            yield json.dumps({"title": f"Task {i}"}).encode() + b"\n"
+            # Another user's first request closes every shard nobody holds
+            shards.shard(f"other-{i}")
+
+    headers = {**ADMIN_HEADERS, "Content-Type": "application/x-ndjson"}
+    response = client.post("/tasks/import", content=body(), headers=headers)
+    assert response.status_code == 200
+    assert json.loads(response.text.splitlines()[-1])["imported"] == 3
+    assert client.get("/tasks/stats", headers=ADMIN_HEADERS).json()["total"] == 3
+    assert shards._leases == {}
+
+
+def test_sqlite_shards_share_one_executor(tmp_path):
+    """However many SQLite shards are open, their async calls share ASYNC_THREADS threads."""
+    backends = [SQLiteStorage(str(tmp_path / f"{i}.db")) for i in range(ASYNC_THREADS + 4)]
+
+    async def use_all() -> None:
+        await asyncio.gather(*(backend.aio.create_task("Task") for backend in backends))
+
+    asyncio.run(use_all())
+    threads = [thread for thread in threading.enumerate() if thread.name.startswith("sqlite")]
+    assert 0 < len(threads) <= ASYNC_THREADS
+    for backend in backends:
+        backend.close()
+        assert backend._connections == []
+
+
+def test_max_idle_shards_only_for_persistent_backends(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.delenv("MEMORY_DATA_DIR", raising=False)
+    assert max_idle_shards() is None
+    monkeypatch.setenv("MEMORY_DATA_DIR", str(tmp_path))
+    assert max_idle_shards() == 64
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("SHARDS_MAX_IDLE", "5")
+    assert max_idle_shards() == 5
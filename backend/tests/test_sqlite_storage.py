@@ -0,0 +1,121 @@
+import multiprocessing
+
+import pytest
+
+from app.storage import InMemoryStorage, SQLiteStorage, create_storage, sqlite
+
+
+def test_sqlite_data_survives_reopen(tmp_path):
+    """Tasks, activity and counters are read back from disk by a new instance."""
+    path = str(tmp_path / "tasks.db")
+    first = SQLiteStorage(path)
+    task = first.create_task("Persist me")
+    first.complete_task(task.id)
+    first.close()
+
+    second = SQLiteStorage(path, check_consistency=True)
+    reloaded = second.get_task(task.id)
+    assert reloaded is not None
+    assert reloaded.title == "Persist me"
+    assert reloaded.completed is True
+    assert reloaded.created_at == task.created_at
+    assert [log.action for log in second.get_task_activity(task.id)] == ["created", "completed"]
+    assert second.get_stats().completed == 1
+    second.close()
+
+
+def test_sqlite_delete_archives_activity(tmp_path):
+    """Deleting a task keeps its activity rows, flagged as archived."""
+    storage = SQLiteStorage(str(tmp_path / "tasks.db"))
+    task = storage.create_task("Short lived")
+    assert storage.delete_task(task.id) is True
+    assert storage.get_task_activity(task.id) is None
+
+    archived = storage._conn().execute(
+        "SELECT action FROM activity WHERE task_id = ? AND archived = 1 ORDER BY seq",
+        (task.id,),
+    ).fetchall()
+    assert [action for (action,) in archived] == ["created", "deleted"]
+    storage.close()
+
+
+@pytest.mark.parametrize(
+    "statement, params",
+    [
+        (sqlite._SELECT_ACTIVITY, ("id", 0)),
+        (sqlite._QUERY_TASK_ACTIVITY, ("id", 0, 9, 0, 9, None, 10)),
+        (sqlite._PRUNE_TASK_ACTIVITY, ("id", 0, "id", 10)),
+    ],
+)
+def test_sqlite_task_activity_uses_task_index(tmp_path, statement, params):
+    """A task's activity is found through its task_id, not by scanning every unarchived row."""
+    storage = SQLiteStorage(str(tmp_path / "tasks.db"))
+    plan = storage._conn().execute(f"EXPLAIN QUERY PLAN {statement}", params).fetchall()
+    searches = [detail for *_, detail in plan if detail.startswith(("SEARCH", "SCAN"))]
+    assert searches and all("idx_activity_task_id" in detail for detail in searches)
+    storage.close()
+
+
+def test_create_storage_from_env(tmp_path, monkeypatch):
+    """STORAGE_BACKEND selects the backend; unknown names are rejected."""
+    monkeypatch.delenv("STORAGE_BACKEND", raising=False)
+    assert isinstance(create_storage(), InMemoryStorage)
+
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "env.db"))
+    backend = create_storage()
+    assert isinstance(backend, SQLiteStorage)
+    backend.close()
+
+    monkeypatch.setenv("STORAGE_BACKEND", "postgres")
+    with pytest.raises(ValueError):
+        create_storage()
+
+
+def _toggle_shared_task(path: str, task_id: str, rounds: int) -> None:
+    storage = SQLiteStorage(path)
+    for _ in range(rounds):
+        storage.complete_task(task_id)
+        storage.update_task(task_id, completed=False)
+        storage.create_task("worker task")
+    storage.close()
+
+
+def test_sqlite_concurrent_processes_lose_no_updates(tmp_path):
+    """Writers in separate processes keep counters and activity exact."""
+    path = str(tmp_path / "tasks.db")
+    storage = SQLiteStorage(path, check_consistency=True)
+    shared = storage.create_task("Shared")
+
+    workers, rounds = 4, 25
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_toggle_shared_task, args=(path, shared.id, rounds))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    stats = storage.get_stats()
+    assert stats.total == 1 + workers * rounds
+    assert stats.completed == 0
+    logs = storage.get_task_activity(shared.id)
+    assert [log.action for log in logs].count("completed") == workers * rounds
+    # Replaying the history must never see a transition from a stale state
+    status = "pending"
+    for log in logs[1:]:
+        assert log.old_value == status
+        status = log.new_value
+    assert status == "pending"
+    storage.close()
+
+
+def test_memory_backend_rejects_multiple_workers(monkeypatch):
+    """The in-memory backend cannot be shared between worker processes."""
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    with pytest.raises(ValueError, match="sqlite"):
+        create_storage()
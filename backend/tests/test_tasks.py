@@ -1,4 +1,6 @@
-AUTH_TOKEN = "mock-jwt-token-12345"
+from app.routers.auth import issue_token
+
+AUTH_TOKEN = issue_token("admin")
 AUTH_HEADERS = {"Authorization": f"Bearer {AUTH_TOKEN}"}
 
 
@@ -349,3 +351,169 @@ def test_stats_fields_structure(client):
     assert isinstance(data["total"], int)
     assert isinstance(data["completed"], int)
     assert isinstance(data["pending"], int)
+
+
+# Cursor pagination tests
+def test_list_tasks_paginated(client):
+    """GET /tasks?limit=N walks every task once using X-Next-Cursor."""
+    created = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()["id"]
+        for i in range(5)
+    ]
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/tasks", params=params, headers=AUTH_HEADERS)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(task["id"] for task in page)
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params = {"limit": 2, "cursor": next_cursor}
+
+    assert seen == created
+
+
+def test_list_tasks_cursor_survives_delete(client):
+    """A cursor stays valid after the task it points at is deleted."""
+    ids = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()["id"]
+        for i in range(3)
+    ]
+    response = client.get("/tasks", params={"limit": 1}, headers=AUTH_HEADERS)
+    cursor = response.headers["X-Next-Cursor"]
+
+    client.delete(f"/tasks/{ids[0]}", headers=AUTH_HEADERS)
+
+    response = client.get("/tasks", params={"limit": 5, "cursor": cursor}, headers=AUTH_HEADERS)
+    assert [task["id"] for task in response.json()] == ids[1:]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_list_tasks_invalid_cursor(client):
+    """GET /tasks with a malformed cursor returns 400."""
+    response = client.get("/tasks", params={"cursor": "not-a-cursor"}, headers=AUTH_HEADERS)
+    assert response.status_code == 400
+    assert "cursor" in response.json()["detail"].lower()
+
+
+def test_list_tasks_limit_out_of_range(client):
+    """GET /tasks with limit=0 returns 422."""
+    response = client.get("/tasks", params={"limit": 0}, headers=AUTH_HEADERS)
+    assert response.status_code == 422
+
+
+def test_stats_track_every_mutation(client):
+    """Stats counters stay in sync with a full recount across all mutations."""
+    ids = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()["id"]
+        for i in range(4)
+    ]
+    client.put(f"/tasks/{ids[0]}/complete", headers=AUTH_HEADERS)
+    client.put(f"/tasks/{ids[0]}/complete", headers=AUTH_HEADERS)  # already completed
+    client.patch(f"/tasks/{ids[1]}", json={"completed": True}, headers=AUTH_HEADERS)
+    client.patch(f"/tasks/{ids[1]}", json={"completed": False}, headers=AUTH_HEADERS)
+    client.patch(f"/tasks/{ids[2]}", json={"completed": True}, headers=AUTH_HEADERS)
+    client.delete(f"/tasks/{ids[2]}", headers=AUTH_HEADERS)
+    client.delete(f"/tasks/{ids[3]}", headers=AUTH_HEADERS)
+
+    response = client.get("/tasks/stats", headers=AUTH_HEADERS)
+    assert response.json() == {"total": 2, "completed": 1, "pending": 1}
+
+
+# Filtering and sorting tests
+def test_list_tasks_filter_completed(client):
+    """GET /tasks?completed= returns only tasks with that status."""
+    ids = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()["id"]
+        for i in range(4)
+    ]
+    client.put(f"/tasks/{ids[1]}/complete", headers=AUTH_HEADERS)
+    client.put(f"/tasks/{ids[3]}/complete", headers=AUTH_HEADERS)
+
+    done = client.get("/tasks", params={"completed": "true"}, headers=AUTH_HEADERS).json()
+    assert [task["id"] for task in done] == [ids[1], ids[3]]
+    pending = client.get("/tasks", params={"completed": "false"}, headers=AUTH_HEADERS).json()
+    assert [task["id"] for task in pending] == [ids[0], ids[2]]
+
+
+def test_list_tasks_created_range(client):
+    """GET /tasks?created_after=&created_before= bounds creation time (exclusive)."""
+    tasks = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()
+        for i in range(3)
+    ]
+    response = client.get(
+        "/tasks",
+        params={"created_after": tasks[0]["created_at"], "created_before": tasks[2]["created_at"]},
+        headers=AUTH_HEADERS,
+    )
+    assert [task["id"] for task in response.json()] == [tasks[1]["id"]]
+
+
+def test_list_tasks_sort_updated_desc_with_updated_since(client):
+    """GET /tasks?sort=-updated_at&updated_since= lists recently touched tasks first."""
+    ids = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()["id"]
+        for i in range(3)
+    ]
+    touched = client.patch(f"/tasks/{ids[0]}", json={"title": "Touched"}, headers=AUTH_HEADERS)
+    since = touched.json()["updated_at"]
+
+    response = client.get("/tasks", params={"sort": "-updated_at"}, headers=AUTH_HEADERS)
+    assert [task["id"] for task in response.json()] == [ids[0], ids[2], ids[1]]
+
+    response = client.get("/tasks", params={"updated_since": since}, headers=AUTH_HEADERS)
+    assert [task["id"] for task in response.json()] == [ids[0]]
+
+
+def test_list_tasks_filtered_pagination(client):
+    """Filters and sort combine with cursor pagination."""
+    ids = [
+        client.post("/tasks", json={"title": f"Task {i}"}, headers=AUTH_HEADERS).json()["id"]
+        for i in range(6)
+    ]
+    seen = []
+    params = {"completed": "false", "sort": "-created_at", "limit": 4}
+    while True:
+        response = client.get("/tasks", params=params, headers=AUTH_HEADERS)
+        seen.extend(task["id"] for task in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == ids[::-1]
+
+
+def test_list_tasks_invalid_sort(client):
+    """GET /tasks with an unknown sort returns 422."""
+    response = client.get("/tasks", params={"sort": "title"}, headers=AUTH_HEADERS)
+    assert response.status_code == 422
+
+
+# Fast-path list serialization tests
+def test_list_responses_match_single_task_encoding(client):
+    """List endpoints encode each task exactly as GET /tasks/{id} does."""
+    task_id = client.post("/tasks", json={"title": "Test task"}, headers=AUTH_HEADERS).json()["id"]
+    client.put(f"/tasks/{task_id}/complete", headers=AUTH_HEADERS)
+    single = client.get(f"/tasks/{task_id}", headers=AUTH_HEADERS).json()
+
+    for path in ["/tasks", "/tasks?limit=10", "/tasks?completed=true", "/tasks/search?q=test"]:
+        response = client.get(path, headers=AUTH_HEADERS)
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == [single]
+
+
+def test_list_responses_keep_schemas_in_openapi(client):
+    """Bypassing response_model validation leaves the documented schemas intact."""
+    paths = client.get("/openapi.json").json()["paths"]
+
+    def item_schema(path):
+        schema = paths[path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        return schema["items"]["$ref"]
+
+    assert item_schema("/tasks") == "#/components/schemas/Task"
+    assert item_schema("/tasks/search") == "#/components/schemas/Task"
+    assert item_schema("/tasks/{task_id}/activity") == "#/components/schemas/ActivityLog"
@@ -1,7 +1,7 @@
 #!/bin/bash
 # ============================================
 # API Validation Script
-# Run backend first: uvicorn app.main:app --port 3001
+# Run backend first: AUTH_DEV_MODE=1 uvicorn app.main:app --port 3001
 # ============================================
 
 BASE_URL="http://localhost:3001"